@@ -0,0 +1,185 @@
+import asyncio
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.api.read_your_writes import READ_ONLY_ROUTES, WRITE_METHODS
+from app.config import get_settings
+from app.database.pool import recent_checkout_wait
+from app.metrics import metrics
+
+settings = get_settings()
+
+OVERLOADED = "Server overloaded, retry later"
+# metrics and docs stay available under overload
+EXEMPT_PATHS = frozenset(
+    {"/metrics", "/internal/metrics", "/docs", "/docs/oauth2-redirect", "/openapi.json"}
+)
+
+in_flight = metrics.labeled_gauge(
+    "admission_in_flight",
+    "Requests admitted and in progress by request class",
+    ("class",),
+)
+queued = metrics.labeled_gauge(
+    "admission_queued",
+    "Requests waiting for admission by request class",
+    ("class",),
+)
+rejected_total = metrics.labeled_counter(
+    "admission_rejected_total",
+    "Requests rejected with 503 by request class and reason",
+    ("class", "reason"),
+)
+queue_seconds = metrics.labeled_histogram(
+    "admission_queue_seconds",
+    "Time admitted requests waited in the queue",
+    ("class",),
+)
+
+
+class ConcurrencyLimit:
+    """
+    At most limit holders at a time, others wait in a FIFO queue of max_queue. A
+    released slot is handed over to the first waiter, so newcomers don't overtake
+    the queue. The waiters are plain futures of the running loop, the limit isn't
+    bound to one event loop.
+    """
+
+    def __init__(self, limit: int, max_queue: int) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for a slot, False when the queue is full or the
+        timeout passes.
+        """
+        if self.try_acquire():
+            return True
+        if self.waiting >= self.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # the slot was handed over just before the client went away
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def register_limit_metrics(name: str, limit: ConcurrencyLimit) -> None:
+    """
+    Publish the requests in progress and queued of limit under the class name.
+    """
+    in_flight.labels(name).callback = lambda: limit.active
+    queued.labels(name).callback = lambda: limit.waiting
+
+
+limits = {
+    "read": ConcurrencyLimit(
+        settings.admission_max_reads, settings.admission_max_queue
+    ),
+    "write": ConcurrencyLimit(
+        settings.admission_max_writes, settings.admission_max_queue
+    ),
+}
+for limit_name, limit in limits.items():
+    register_limit_metrics(limit_name, limit)
+
+
+def request_class(scope: Scope) -> str:
+    if scope["method"] in WRITE_METHODS and scope["path"] not in READ_ONLY_ROUTES:
+        return "write"
+    return "read"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware limiting the requests in progress, with separate budgets for
+    reads and writes (ADMISSION_MAX_READS, ADMISSION_MAX_WRITES). Requests over
+    the budget wait in a bounded queue. When the queue is full, the wait exceeds
+    ADMISSION_QUEUE_TIMEOUT or the database pool is already slow to hand out
+    connections (ADMISSION_MAX_POOL_WAIT), the request is answered with 503 and
+    Retry-After at once, instead of piling up on the pool until clients time out.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.admission_control
+            or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        name = request_class(scope)
+        limit = limits[name]
+        if limit.try_acquire():
+            queue_seconds.labels(name).observe(0.0)
+        else:
+            max_pool_wait = settings.admission_max_pool_wait
+            if max_pool_wait and recent_checkout_wait.value > max_pool_wait:
+                await self.reject(name, "pool_wait", scope, receive, send)
+                return
+            if limit.waiting >= limit.max_queue:
+                await self.reject(name, "queue_full", scope, receive, send)
+                return
+            started = asyncio.get_running_loop().time()
+            if not await limit.acquire(settings.admission_queue_timeout):
+                await self.reject(name, "queue_timeout", scope, receive, send)
+                return
+            queue_seconds.labels(name).observe(
+                asyncio.get_running_loop().time() - started
+            )
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+    async def reject(
+        self, name: str, reason: str, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        rejected_total.labels(name, reason).inc()
+        response = JSONResponse(
+            {"detail": OVERLOADED},
+            status_code=503,
+            headers={"Retry-After": str(settings.admission_retry_after)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+from uuid import UUID
+
+T = TypeVar("T")
+
+
+class EntityCache(Generic[T]):
+    """
+    Bounded in-process LRU cache of validated response models keyed by entity ID.
+    Entries expire after ttl seconds, "not found" results after not_found_ttl.
+    Every worker process has its own cache, so writes made by another worker are
+    visible after at most ttl seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        not_found_ttl: float,
+        enabled: bool = True,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[UUID, tuple[float, T | None]] = OrderedDict()
+
+    def get(self, key: UUID) -> tuple[bool, T | None]:
+        """
+        Return (hit, value), value is None for a cached "not found" result.
+        """
+        if not self.enabled:
+            return False, None
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: UUID, value: T) -> None:
+        self._store(key, value, self.ttl)
+
+    def set_not_found(self, key: UUID) -> None:
+        self._store(key, None, self.not_found_ttl)
+
+    def invalidate(self, key: UUID) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _store(self, key: UUID, value: T | None, ttl: float) -> None:
+        if not self.enabled or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
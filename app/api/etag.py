@@ -0,0 +1,98 @@
+"""
+Weak ETags of single entities, derived from the entity ID and its version, the
+updated_at timestamp or created_at for a row that was never updated.
+
+The version is encoded into the tag in microseconds, so a conditional request can
+be checked against one narrow "SELECT updated_at" or turned into the WHERE clause
+of an UPDATE without reading the entity first.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, TypeVar
+from uuid import UUID
+
+from fastapi import Response
+
+from app.api.serialization import fast_response
+
+T = TypeVar("T")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+NOT_MODIFIED_RESPONSES: dict[int | str, dict[str, Any]] = {
+    304: {"description": "Not modified, the ETag in If-None-Match is current"}
+}
+PRECONDITION_FAILED_RESPONSES: dict[int | str, dict[str, Any]] = {
+    412: {
+        "description": "Precondition failed, the ETag in If-Match is outdated "
+        "or, for If-Match: *, the entity doesn't exist"
+    }
+}
+
+
+def entity_version(created_at: datetime, updated_at: datetime | None) -> datetime:
+    return updated_at or created_at
+
+
+def entity_etag(entity_id: UUID, version: datetime) -> str:
+    if version.tzinfo is None:
+        version = version.replace(tzinfo=timezone.utc)
+    return f'W/"{entity_id.hex}.{(version - EPOCH) // MICROSECOND:x}"'
+
+
+def parse_etags(header: str) -> list[str]:
+    """
+    Split an If-Match or If-None-Match header into its entity tags, the weak
+    indicator is dropped as both headers are compared weakly.
+    """
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Whether etag is one of the tags of header, "*" matches any existing entity.
+    """
+    tags = parse_etags(header)
+    return "*" in tags or parse_etags(etag)[0] in tags
+
+
+def etag_versions(header: str, entity_id: UUID) -> list[datetime] | None:
+    """
+    Versions of entity_id listed in an If-Match header, None for "*", which matches
+    any version of an existing entity. Tags of other entities or in a foreign
+    format are skipped, so they never match.
+    """
+    versions = []
+    for tag in parse_etags(header):
+        if tag == "*":
+            return None
+        tag_id, _, microseconds = tag.strip('"').partition(".")
+        try:
+            if UUID(hex=tag_id) == entity_id:
+                versions.append(EPOCH + int(microseconds, 16) * MICROSECOND)
+        except ValueError:
+            continue
+    return versions
+
+
+def etag_response(
+    response_model: Any, content: T, etag: str, response: Response
+) -> T | Response:
+    """
+    fast_response of content with an ETag header, it is set on the raw Response or
+    on the response FastAPI builds from content.
+    """
+    result = fast_response(response_model, content)
+    (result if isinstance(result, Response) else response).headers["ETag"] = etag
+    return result
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
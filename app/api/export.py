@@ -0,0 +1,70 @@
+import csv
+import io
+from enum import Enum
+from typing import Any, AsyncIterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from app.api.models import BaseModel
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+async def _ndjson_lines(
+    partitions: AsyncIterator[Sequence[Any]], model: type[BaseModel]
+) -> AsyncIterator[str]:
+    async for partition in partitions:
+        yield "".join(
+            model.model_validate(row).model_dump_json(by_alias=True) + "\n"
+            for row in partition
+        )
+
+
+async def _csv_lines(
+    partitions: AsyncIterator[Sequence[Any]], model: type[BaseModel]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    fields = {name: field.alias or name for name, field in model.model_fields.items()}
+    writer = csv.DictWriter(buffer, fieldnames=list(fields.values()))
+    writer.writeheader()
+    async for partition in partitions:
+        writer.writerows(
+            model.model_validate(row).model_dump(mode="json", by_alias=True)
+            for row in partition
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(
+    partitions: AsyncIterator[Sequence[Any]],
+    model: type[BaseModel],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """
+    Stream rows fetched partition by partition, only one partition is held in memory.
+    """
+    if export_format == ExportFormat.CSV:
+        content = _csv_lines(partitions, model)
+    else:
+        content = _ndjson_lines(partitions, model)
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'
+        },
+    )
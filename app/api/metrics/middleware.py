@@ -0,0 +1,106 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.database.timing import QueryStats, request_queries
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# requests matching no route are counted under one label, raw paths of scanners
+# and typos would create a metric per path
+UNMATCHED_ROUTE = "unmatched"
+
+requests_total = metrics.labeled_counter(
+    "http_requests_total",
+    "Requests by method, route template and response status",
+    ("method", "route", "status"),
+)
+request_seconds = metrics.labeled_histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ("method", "route"),
+)
+request_db_seconds = metrics.labeled_histogram(
+    "http_request_db_seconds",
+    "Time spent executing database statements per request",
+    ("method", "route"),
+)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that handled the request, e.g. /tasks/{task_id},
+    set in the scope by the router.
+    """
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or UNMATCHED_ROUTE
+
+
+def server_timing(queries: QueryStats, started: float) -> str:
+    return (
+        f'db;dur={queries.seconds * 1000:.2f};desc="{queries.statements} statements", '
+        f"app;dur={(time.perf_counter() - started) * 1000:.2f}"
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware counting the SQL statements of every request, and recording
+    the count, the status, the latency and the database time of requests per
+    route template (REQUEST_METRICS). With SERVER_TIMING the statements executed
+    until the response starts are reported in the Server-Timing header, requests
+    over SQL_STATEMENT_BUDGET statements are logged.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        queries = QueryStats()
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(queries, started))
+            await send(message)
+
+        token = request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_queries.reset(token)
+            method, route = scope["method"], route_template(scope)
+            if settings.request_metrics:
+                requests_total.labels(method, route, str(status)).inc()
+                request_seconds.labels(method, route).observe(elapsed)
+                request_db_seconds.labels(method, route).observe(queries.seconds)
+            budget = settings.sql_statement_budget
+            if budget and queries.statements > budget:
+                statement, executions = queries.most_repeated() or ("", 0)
+                logger.warning(
+                    "Request over SQL statement budget, method=%s, route=%s, "
+                    "statements=%s, budget=%s, db_ms=%.1f, most_repeated=%s x %r",
+                    method,
+                    route,
+                    queries.statements,
+                    budget,
+                    queries.seconds * 1000,
+                    executions,
+                    statement[:200],
+                )
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import metrics
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(tags=["Internal"])
+
+
+@router.get("/internal/metrics")
+async def get_metrics() -> dict[str, Any]:
+    return metrics.snapshot()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.exposition(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, TypeVar
+from uuid import UUID
+
+from fastapi import Query
+from pydantic import Field
+
+from app.api.models import BaseModel
+
+T = TypeVar("T")
+
+INVALID_CURSOR = (400, "Invalid cursor")
+
+
+class KeysetParams(BaseModel):
+    cursor: str | None = Query(None, description="Opaque cursor of the next page")
+    size: int = Query(50, ge=1, le=100, description="Page size")
+    include_total: bool = Query(
+        False,
+        alias="includeTotal",
+        validation_alias="includeTotal",
+        description="Count all rows (slow on big tables)",
+    )
+
+
+class KeysetPage(BaseModel, Generic[T]):
+    items: List[T] = Field([])
+    size: int = Field(...)
+    next_cursor: str | None = Field(None, alias="nextCursor")
+    total: int | None = Field(None)
+
+
+def encode_cursor(created_at: datetime, entity_id: UUID) -> str:
+    """
+    Encode the (created_at, id) keyset position of the last returned row.
+    """
+    raw = json.dumps([created_at.isoformat(), str(entity_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    Decode a cursor created by encode_cursor, raises ValueError when malformed.
+    """
+    try:
+        created_at, entity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(entity_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed cursor: {cursor}") from e
+
+
+def encode_rank_cursor(rank: float, entity_id: UUID) -> str:
+    """
+    Encode the (rank, id) position of the last returned row of a ranked search.
+    """
+    raw = json.dumps([rank, str(entity_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, UUID]:
+    """
+    Decode a cursor created by encode_rank_cursor, raises ValueError when malformed.
+    """
+    try:
+        rank, entity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), UUID(entity_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed cursor: {cursor}") from e
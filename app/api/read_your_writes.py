@@ -0,0 +1,54 @@
+import math
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.metrics.middleware import route_template
+from app.config import get_settings
+from app.database import database
+from app.database.replicas import PRIMARY_COOKIE, primary_until
+
+settings = get_settings()
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# routes taking a body through POST that only read
+READ_ONLY_ROUTES = frozenset({"/tasks/batch-get", "/users/batch-get"})
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware pinning the reads of a client to the primary after it wrote:
+    successful write requests get a cookie, valid for DB_READ_YOUR_WRITES_SECONDS,
+    that get_read_db follows instead of picking a read replica. Without replicas
+    no cookie is set.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        window = settings.db_read_your_writes_seconds
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not len(database.replicas)
+            or window <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and route_template(scope) not in READ_ONLY_ROUTES
+            ):
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{PRIMARY_COOKIE}={primary_until(window)}; "
+                    f"Max-Age={math.ceil(window)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
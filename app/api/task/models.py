@@ -1,6 +1,9 @@
 from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List
 from uuid import UUID
 
+from fastapi import Query
 from pydantic import Field
 
 from app.api.models import BaseModel
@@ -34,3 +37,86 @@ class TaskWithoutUser(BaseModel):
     task_id: UUID = Field(..., alias="taskId")
     created_at: datetime = Field(..., alias="createdAt")
     updated_at: datetime | None = Field(None, alias="updatedAt")
+
+
+class TaskBulkItemError(BaseModel):
+    index: int = Field(...)
+    detail: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class TaskBulkCreateResponse(BaseModel):
+    created: List[Task] = Field(default_factory=list)
+    errors: List[TaskBulkItemError] = Field(default_factory=list)
+
+
+class TaskBulkDeleteResponse(BaseModel):
+    deleted: int = Field(...)
+
+
+class TaskBatchGet(BaseModel):
+    task_ids: List[UUID] = Field(..., alias="taskIds", min_length=1)
+
+
+class TaskBatchGetItem(BaseModel):
+    task_id: UUID = Field(..., alias="taskId")
+    found: bool = Field(...)
+    task: Task | None = Field(None)
+
+
+class TaskBatchGetResponse(BaseModel):
+    items: List[TaskBatchGetItem] = Field(default_factory=list)
+
+
+class TaskSort(str, Enum):
+    CREATED_AT = "createdAt"
+    CREATED_AT_DESC = "-createdAt"
+    UPDATED_AT = "updatedAt"
+    UPDATED_AT_DESC = "-updatedAt"
+    NAME = "name"
+    NAME_DESC = "-name"
+
+
+class TaskFilters(BaseModel):
+    user_id: UUID | None = Query(None, alias="userId", validation_alias="userId")
+    created_after: datetime | None = Query(
+        None, alias="createdAfter", validation_alias="createdAfter"
+    )
+    created_before: datetime | None = Query(
+        None, alias="createdBefore", validation_alias="createdBefore"
+    )
+    updated_since: datetime | None = Query(
+        None,
+        alias="updatedSince",
+        validation_alias="updatedSince",
+        description="Tasks updated, or created when never updated, since",
+    )
+    name_prefix: str | None = Query(
+        None,
+        alias="namePrefix",
+        validation_alias="namePrefix",
+        min_length=1,
+        max_length=36,
+        description="Case sensitive prefix of the name",
+    )
+    sort: TaskSort = Query(
+        TaskSort.CREATED_AT, description="Sort key, prefixed with - for descending"
+    )
+
+    @property
+    def has_predicates(self) -> bool:
+        return any(
+            value is not None
+            for value in (
+                self.user_id,
+                self.created_after,
+                self.created_before,
+                self.updated_since,
+                self.name_prefix,
+            )
+        )
+
+
+class TaskStats(BaseModel):
+    task_count: int = Field(..., alias="taskCount")
+    last_created_at: datetime | None = Field(None, alias="lastCreatedAt")
+    last_updated_at: datetime | None = Field(None, alias="lastUpdatedAt")
@@ -1,43 +1,217 @@
-from typing import Annotated
+import json
+from datetime import datetime
+from typing import Annotated, Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page, Params as PaginationParams
-from sqlalchemy.orm import Session
 
+from app.api.etag import (
+    NOT_MODIFIED_RESPONSES,
+    PRECONDITION_FAILED_RESPONSES,
+    etag_matches,
+    etag_response,
+    not_modified,
+)
+from app.api.export import ExportFormat
+from app.api.pagination import KeysetPage, KeysetParams
+from app.api.serialization import fast_response
 from app.api.task import service
-from app.api.task.models import Task, TaskCreate, TaskUpdate
-from app.database.database import get_db
+from app.api.task.models import (
+    Task,
+    TaskBatchGet,
+    TaskBatchGetResponse,
+    TaskBulkCreateResponse,
+    TaskBulkDeleteResponse,
+    TaskCreate,
+    TaskFilters,
+    TaskStats,
+    TaskUpdate,
+)
+from app.config import get_settings
+from app.database.database import DbSession, get_db, get_read_db
 
 router = APIRouter(prefix="/tasks", tags=["Task Management"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+INVALID_BULK_BODY = (400, "Body must be a JSON array or NDJSON")
+TOO_MANY_ITEMS = (413, "Too many items")
+
+
+def parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return service.InvalidJson(f"Invalid JSON: {e}")
+
+
+async def read_bulk_body(request: Request) -> list[Any]:
+    """
+    Read the items of a bulk request sent as a JSON array or as NDJSON stream.
+    Malformed NDJSON lines are passed on as service.InvalidJson items.
+    """
+    max_items = get_settings().bulk_max_items
+    items: list[Any] = []
+    try:
+        if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+            buffer = b""
+            async for chunk in request.stream():
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                items.extend(parse_ndjson_line(line) for line in lines if line.strip())
+                if len(items) > max_items:
+                    raise HTTPException(*TOO_MANY_ITEMS)
+            if buffer.strip():
+                items.append(parse_ndjson_line(buffer))
+        else:
+            items = json.loads(await request.body())
+            if not isinstance(items, list):
+                raise HTTPException(*INVALID_BULK_BODY)
+    except ValueError:
+        raise HTTPException(*INVALID_BULK_BODY)
+    if len(items) > max_items:
+        raise HTTPException(*TOO_MANY_ITEMS)
+    return items
+
 
 @router.post("/", response_model=Task)
 async def create_task(
-    task: TaskCreate, db: Annotated[Session, Depends(get_db)]
+    task: TaskCreate, db: Annotated[DbSession, Depends(get_db)]
 ) -> Task:
     return await service.create_task(task, db)
 
 
-@router.get("/{task_id}", response_model=Task)
-async def get_task(task_id: UUID, db: Annotated[Session, Depends(get_db)]) -> Task:
-    return await service.get_task(task_id, db)
+@router.post(
+    "/bulk",
+    response_model=TaskBulkCreateResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/TaskCreate"},
+                    }
+                },
+                NDJSON_MEDIA_TYPE: {
+                    "schema": {"$ref": "#/components/schemas/TaskCreate"}
+                },
+            },
+            "required": True,
+        }
+    },
+)
+async def create_tasks_bulk(
+    raw_tasks: Annotated[list[Any], Depends(read_bulk_body)],
+    db: Annotated[DbSession, Depends(get_db)],
+) -> TaskBulkCreateResponse:
+    return await service.create_tasks_bulk(raw_tasks, db)
+
+
+@router.post("/batch-get", response_model=TaskBatchGetResponse)
+async def get_tasks_batch(
+    batch: TaskBatchGet, db: Annotated[DbSession, Depends(get_read_db)]
+) -> TaskBatchGetResponse | Response:
+    return fast_response(
+        TaskBatchGetResponse, await service.get_tasks_batch(batch.task_ids, db)
+    )
+
+
+@router.get("/keyset", response_model=KeysetPage[Task])
+async def get_tasks_keyset(
+    params: KeysetParams = Depends(), db: DbSession = Depends(get_read_db)
+) -> KeysetPage[Task] | Response:
+    return fast_response(KeysetPage[Task], await service.get_tasks_keyset(params, db))
+
+
+@router.get("/stats", response_model=TaskStats)
+async def get_task_stats(
+    db: Annotated[DbSession, Depends(get_read_db)]
+) -> TaskStats | Response:
+    return fast_response(TaskStats, await service.get_task_stats(db))
+
+
+@router.get("/search", response_model=KeysetPage[Task])
+async def search_tasks(
+    q: str = Query(
+        ...,
+        min_length=1,
+        max_length=256,
+        description='Words to find in name and description, "phrase", OR, -word',
+    ),
+    params: KeysetParams = Depends(),
+    db: DbSession = Depends(get_read_db),
+) -> KeysetPage[Task] | Response:
+    return fast_response(KeysetPage[Task], await service.search_tasks(q, params, db))
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_tasks(
+    db: Annotated[DbSession, Depends(get_read_db)],
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    user_id: UUID | None = Query(None, alias="userId"),
+    created_after: datetime | None = Query(None, alias="createdAfter"),
+    created_before: datetime | None = Query(None, alias="createdBefore"),
+) -> StreamingResponse:
+    return await service.export_tasks(
+        export_format,
+        db,
+        user_id=user_id,
+        created_after=created_after,
+        created_before=created_before,
+    )
+
+
+@router.get("/{task_id}", response_model=Task, responses=NOT_MODIFIED_RESPONSES)
+async def get_task(
+    task_id: UUID,
+    response: Response,
+    db: Annotated[DbSession, Depends(get_read_db)],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Task | Response:
+    if if_none_match is not None:
+        etag = await service.get_task_etag(task_id, db)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    task = await service.get_task(task_id, db)
+    return etag_response(Task, task, service.task_etag(task), response)
 
 
 @router.get("/", response_model=Page[Task])
 async def get_tasks(
-    pagination: PaginationParams = Depends(), db: Session = Depends(get_db)
-) -> Page[Task]:
-    return await service.get_tasks(pagination, db)
+    pagination: PaginationParams = Depends(),
+    filters: TaskFilters = Depends(),
+    db: DbSession = Depends(get_read_db),
+) -> Page[Task] | Response:
+    return fast_response(Page[Task], await service.get_tasks(pagination, db, filters))
 
 
-@router.put("/{task_id}", response_model=Task)
+@router.put("/{task_id}", response_model=Task, responses=PRECONDITION_FAILED_RESPONSES)
 async def update_task(
-    task_id: UUID, new_task: TaskUpdate, db: Annotated[Session, Depends(get_db)]
+    task_id: UUID,
+    new_task: TaskUpdate,
+    response: Response,
+    db: Annotated[DbSession, Depends(get_db)],
+    if_match: Annotated[str | None, Header()] = None,
 ) -> Task:
-    return await service.update_task(task_id=task_id, new_task=new_task, db=db)
+    task = await service.update_task(
+        task_id=task_id, new_task=new_task, db=db, if_match=if_match
+    )
+    response.headers["ETag"] = service.task_etag(task)
+    return task
 
 
 @router.delete("/{task_id}", response_model=UUID)
-async def delete_task(task_id: UUID, db: Annotated[Session, Depends(get_db)]) -> int:
+async def delete_task(task_id: UUID, db: Annotated[DbSession, Depends(get_db)]) -> int:
     return await service.delete_task(task_id, db)
+
+
+@router.delete("/", response_model=TaskBulkDeleteResponse)
+async def delete_tasks(
+    db: Annotated[DbSession, Depends(get_db)],
+    user_id: UUID | None = Query(None, alias="userId"),
+    created_before: datetime | None = Query(None, alias="createdBefore"),
+) -> TaskBulkDeleteResponse:
+    return await service.delete_tasks(
+        db, user_id=user_id, created_before=created_before
+    )
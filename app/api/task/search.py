@@ -0,0 +1,137 @@
+"""
+In-process inverted index of task names and descriptions, the GET /tasks/search
+backend with SEARCH_BACKEND=memory. It is meant for tests and local experiments
+with a single process, not for production: the database is still Postgres (the
+schema, the migrations and the other queries need it), and every process has its
+own index built from the database on the first search and kept up to date by the
+writes of that process only, so with several workers a search misses the tasks
+written through the others until it restarts.
+
+Words are matched exactly (no stemming, no stop words) and all words of the query
+must match. Tasks are ranked like ts_rank with the default weights, a word counts
+1.0 in the name and 0.4 in the description.
+"""
+import re
+from collections import defaultdict
+from typing import Iterable
+from uuid import UUID
+
+from app.api.pagination import KeysetParams, decode_rank_cursor, encode_rank_cursor
+from app.api.task.models import Task
+
+WORD = re.compile(r"\w+")
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD.findall(text.lower())
+
+
+class TaskSearchIndex:
+    def __init__(self) -> None:
+        self.ready = False
+        self._postings: defaultdict[str, dict[UUID, float]] = defaultdict(dict)
+        self._terms: dict[UUID, set[str]] = {}
+        # changes made while the tasks of the build are read, None for removed tasks
+        self._pending: dict[UUID, Task | None] | None = None
+
+    def add(self, task: Task) -> None:
+        """
+        Index a new task or re-index a changed one. Changes made before the build
+        starts are skipped, the build reads them from the database.
+        """
+        if self._pending is not None:
+            self._pending[task.task_id] = task
+        elif self.ready:
+            self._index(task)
+
+    def remove(self, task_id: UUID) -> None:
+        if self._pending is not None:
+            self._pending[task_id] = None
+        self._unindex(task_id)
+
+    def begin_build(self) -> None:
+        """
+        Start recording the changes, to be called before the tasks of build are
+        read, so the writes made meanwhile aren't lost.
+        """
+        if self._pending is None and not self.ready:
+            self._pending = {}
+
+    def build(self, tasks: Iterable[Task]) -> None:
+        """
+        Index tasks and then the changes recorded since begin_build, which are at
+        least as new. A concurrent second build is ignored.
+        """
+        if self.ready:
+            return
+        for task in tasks:
+            self._index(task)
+        for task_id, change in (self._pending or {}).items():
+            if change is None:
+                self._unindex(task_id)
+            else:
+                self._index(change)
+        self._pending = None
+        self.ready = True
+
+    def clear(self) -> None:
+        self.ready = False
+        self._pending = None
+        self._postings.clear()
+        self._terms.clear()
+
+    def search(self, text_query: str) -> list[tuple[float, UUID]]:
+        """
+        (rank, task_id) of the tasks matching all words of text_query, ordered like
+        the database search by rank and task_id descending.
+        """
+        terms = set(tokenize(text_query))
+        if not terms:
+            return []
+        postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+        ranks = dict(postings[0])
+        for term_postings in postings[1:]:
+            ranks = {
+                task_id: rank + term_postings[task_id]
+                for task_id, rank in ranks.items()
+                if task_id in term_postings
+            }
+        return sorted(
+            ((rank, task_id) for task_id, rank in ranks.items()), reverse=True
+        )
+
+    def search_page(
+        self, text_query: str, params: KeysetParams
+    ) -> tuple[list[tuple[float, UUID]], str | None, int | None]:
+        """
+        One keyset page of search, with the cursor of the next page and the total
+        when requested. Raises ValueError for a malformed cursor.
+        """
+        hits = self.search(text_query)
+        total = len(hits) if params.include_total else None
+        if params.cursor:
+            last = decode_rank_cursor(params.cursor)
+            hits = [hit for hit in hits if hit < last]
+        page = hits[: params.size]
+        next_cursor = encode_rank_cursor(*page[-1]) if len(hits) > params.size else None
+        return page, next_cursor, total
+
+    def _index(self, task: Task) -> None:
+        self._unindex(task.task_id)
+        weights: defaultdict[str, float] = defaultdict(float)
+        for term in tokenize(task.name):
+            weights[term] += NAME_WEIGHT
+        for term in tokenize(task.description):
+            weights[term] += DESCRIPTION_WEIGHT
+        for term, weight in weights.items():
+            self._postings[term][task.task_id] = weight
+        self._terms[task.task_id] = set(weights)
+
+    def _unindex(self, task_id: UUID) -> None:
+        for term in self._terms.pop(task_id, ()):
+            postings = self._postings[term]
+            postings.pop(task_id, None)
+            if not postings:
+                del self._postings[term]
@@ -1,82 +1,392 @@
 import logging
+from datetime import datetime
+from typing import Any
 from uuid import UUID
 
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page, Params as PaginationParams
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
 
-from app.api.task.models import Task, TaskCreate, TaskUpdate
+from app.api.cache import EntityCache
+from app.api.etag import entity_etag, entity_version, etag_versions
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import INVALID_CURSOR, KeysetPage, KeysetParams
+from app.api.serialization import validate_rows
+from app.api.task.models import (
+    Task,
+    TaskBatchGetItem,
+    TaskBatchGetResponse,
+    TaskBulkCreateResponse,
+    TaskBulkDeleteResponse,
+    TaskBulkItemError,
+    TaskCreate,
+    TaskFilters,
+    TaskStats,
+    TaskUpdate,
+)
+from app.api.task.search import TaskSearchIndex
+from app.config import get_settings
+from app.database.database import DbSession, on_replica
 from app.database.task import crud
 
 logger = logging.getLogger(__name__)
 
 TASK_NOT_FOUND = (404, "Task not found")
+TASK_MODIFIED = (412, "Task was modified, the ETag in If-Match is outdated")
+TASK_MISSING = (412, "Task not found, If-Match: * requires it to exist")
+TOO_MANY_IDS = (413, "Too many IDs, at most {} per request")
 
+settings = get_settings()
+task_cache: EntityCache[Task] = EntityCache(
+    max_entries=settings.cache_max_entries,
+    ttl=settings.cache_ttl_seconds,
+    not_found_ttl=settings.cache_not_found_ttl_seconds,
+    enabled=settings.cache_enabled,
+)
+search_index = TaskSearchIndex()
+USER_NOT_FOUND = "User not found"
+MISSING_DELETE_FILTER = (400, "At least one of userId, createdBefore is required")
+FILTERS_NOT_SELECTIVE = (
+    400,
+    "Filters would scan about {} tasks, add userId or narrow the date range",
+)
 
-async def create_task(task: TaskCreate, db: Session) -> Task:
+
+async def create_task(task: TaskCreate, db: DbSession) -> Task:
     """
     Service function to create a new task.
     """
     try:
-        db_task = crud.create_task(task, db)
+        db_task = await crud.create_task(task, db)
+    except Exception as e:
+        logger.error("Failed to add row to table, data=%s, error=%s", task, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    created_task = Task.model_validate(db_task)
+    search_index.add(created_task)
+    return created_task
+
+
+class InvalidJson:
+    """
+    Line of an NDJSON bulk request that isn't valid JSON, reported as an error at
+    its index instead of rejecting the whole stream.
+    """
+
+    def __init__(self, error: str) -> None:
+        self.error = error
+
+
+async def create_tasks_bulk(
+    raw_tasks: list[Any], db: DbSession
+) -> TaskBulkCreateResponse:
+    """
+    Service function to create many tasks at once. Invalid items are reported
+    by their index and don't prevent the valid ones from being created.
+    """
+    response = TaskBulkCreateResponse()
+    indexes: list[int] = []
+    tasks: list[TaskCreate] = []
+    for index, raw_task in enumerate(raw_tasks):
+        if isinstance(raw_task, InvalidJson):
+            invalid = {"loc": [], "msg": raw_task.error, "type": "json_invalid"}
+            response.errors.append(TaskBulkItemError(index=index, detail=[invalid]))
+            continue
+        try:
+            tasks.append(TaskCreate.model_validate(raw_task))
+            indexes.append(index)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False)
+            detail = [dict(error) for error in errors]
+            response.errors.append(TaskBulkItemError(index=index, detail=detail))
+
+    try:
+        db_tasks = await crud.create_tasks_bulk(
+            tasks, db, batch_size=get_settings().bulk_batch_size
+        )
     except Exception as e:
-        error_str = f"Failed to add row to table, data={task.model_dump()}, error={e}"
-        logger.error(error_str)
+        logger.error("Failed to add rows to table, count=%s, error=%s", len(tasks), e)
         raise HTTPException(status_code=500, detail=str(e))
-    return Task.model_validate(db_task)
+
+    for index, db_task in zip(indexes, db_tasks):
+        if db_task is None:
+            not_found = {"loc": ["userId"], "msg": USER_NOT_FOUND, "type": "not_found"}
+            response.errors.append(TaskBulkItemError(index=index, detail=[not_found]))
+        else:
+            task = Task.model_validate(db_task)
+            search_index.add(task)
+            response.created.append(task)
+    response.errors.sort(key=lambda error: error.index)
+    return response
 
 
-async def get_task(task_id: UUID, db: Session) -> Task:
+def task_etag(task: Task) -> str:
+    return entity_etag(task.task_id, entity_version(task.created_at, task.updated_at))
+
+
+async def get_task_etag(task_id: UUID, db: DbSession) -> str:
+    """
+    Service function to retrieve the ETag of a task from its version only, without
+    loading the task. A cached task of another version is dropped.
+    """
+    version = await crud.get_task_version(task_id, db)
+    if version is None:
+        if not on_replica(db):
+            task_cache.set_not_found(task_id)
+        raise HTTPException(*TASK_NOT_FOUND)
+    etag = entity_etag(task_id, version)
+    hit, cached_task = task_cache.get(task_id)
+    if hit and (cached_task is None or task_etag(cached_task) != etag):
+        task_cache.invalidate(task_id)
+    return etag
+
+
+async def get_task(task_id: UUID, db: DbSession) -> Task:
     """
-    Service function to retrieve a task by ID.
+    Service function to retrieve a task by ID. Rows read from a replica aren't
+    cached, the cache would serve them to clients pinned to the primary.
     """
-    db_task = crud.get_task(task_id, db)
+    hit, cached_task = task_cache.get(task_id)
+    if hit:
+        if cached_task is None:
+            raise HTTPException(*TASK_NOT_FOUND)
+        return cached_task
+
+    db_task = await crud.get_task(task_id, db)
     if db_task:
         try:
-            return Task.model_validate(db_task[0])
+            task = Task.model_validate(db_task[0])
+            if not on_replica(db):
+                task_cache.set(task_id, task)
+            return task
         except Exception as e:
-            error_str = f"Failed to get Task, task_id={task_id}, error={e}"
-            logger.error(error_str)
+            logger.error("Failed to get Task, task_id=%s, error=%s", task_id, e)
             raise HTTPException(status_code=500, detail=str(e))
+    if not on_replica(db):
+        task_cache.set_not_found(task_id)
     raise HTTPException(*TASK_NOT_FOUND)
 
 
-async def get_tasks(pagination: PaginationParams, db: Session) -> Page[Task]:
+async def get_tasks_batch(task_ids: list[UUID], db: DbSession) -> TaskBatchGetResponse:
+    """
+    Service function to retrieve many tasks by ID, the cached ones from the cache
+    and all others in one query. Items follow the order of task_ids, missing tasks
+    are reported as not found.
+    """
+    max_ids = settings.batch_get_max_ids
+    if len(task_ids) > max_ids:
+        raise HTTPException(TOO_MANY_IDS[0], TOO_MANY_IDS[1].format(max_ids))
+
+    tasks: dict[UUID, Task | None] = {}
+    for task_id in task_ids:
+        hit, cached_task = task_cache.get(task_id)
+        if hit:
+            tasks[task_id] = cached_task
+    missing = [task_id for task_id in dict.fromkeys(task_ids) if task_id not in tasks]
+    if missing:
+        fill_cache = not on_replica(db)
+        for task in validate_rows(Task, await crud.get_tasks_by_ids(missing, db)):
+            tasks[task.task_id] = task
+            if fill_cache:
+                task_cache.set(task.task_id, task)
+        for task_id in missing:
+            if task_id not in tasks:
+                tasks[task_id] = None
+                if fill_cache:
+                    task_cache.set_not_found(task_id)
+
+    return TaskBatchGetResponse(
+        items=[
+            TaskBatchGetItem(
+                taskId=task_id, found=tasks[task_id] is not None, task=tasks[task_id]
+            )
+            for task_id in task_ids
+        ]
+    )
+
+
+async def get_tasks(
+    pagination: PaginationParams, db: DbSession, filters: TaskFilters | None = None
+) -> Page[Task]:
+    """
+    Service function to retrieve a filtered and sorted list of tasks with optional
+    pagination. Filters the database would answer by reading more than
+    tasks_max_scan_rows rows of a sequential scan are rejected.
+    """
+    filters = filters or TaskFilters()
+    if filters.has_predicates:
+        max_rows = settings.tasks_max_scan_rows
+        scanned = await crud.estimate_tasks_scan(filters, db, min_table_rows=max_rows)
+        if scanned > max_rows:
+            logger.warning(
+                "Rejected Tasks filters, filters=%s, rows=%s", filters, scanned
+            )
+            raise HTTPException(
+                FILTERS_NOT_SELECTIVE[0], FILTERS_NOT_SELECTIVE[1].format(int(scanned))
+            )
+    return await crud.get_tasks(pagination, db, filters)
+
+
+async def get_task_stats(db: DbSession) -> TaskStats:
+    """
+    Service function to retrieve the counters of all tasks.
+    """
+    return await crud.get_task_stats(db)
+
+
+async def get_tasks_keyset(params: KeysetParams, db: DbSession) -> KeysetPage[Task]:
+    """
+    Service function to retrieve a list of tasks with keyset pagination.
+    """
+    try:
+        return await crud.get_tasks_keyset(params, db)
+    except ValueError as e:
+        logger.error("Failed to get Tasks page, cursor=%s, error=%s", params.cursor, e)
+        raise HTTPException(*INVALID_CURSOR)
+
+
+async def search_tasks(
+    text_query: str, params: KeysetParams, db: DbSession
+) -> KeysetPage[Task]:
+    """
+    Service function to search tasks by name and description, the best matches first.
+    """
+    try:
+        if settings.search_backend == "memory":
+            return await search_tasks_in_process(text_query, params, db)
+        return await crud.search_tasks(text_query, params, db)
+    except ValueError as e:
+        logger.error("Failed to search Tasks, cursor=%s, error=%s", params.cursor, e)
+        raise HTTPException(*INVALID_CURSOR)
+
+
+async def search_tasks_in_process(
+    text_query: str, params: KeysetParams, db: DbSession
+) -> KeysetPage[Task]:
     """
-    Service function to retrieve a list of tasks with optional pagination.
+    Service function to search tasks in the in-process index, built from all tasks
+    on the first search.
     """
-    return crud.get_tasks(pagination, db)
+    if not search_index.ready:
+        search_index.begin_build()
+        tasks: list[Task] = []
+        async for partition in crud.stream_tasks(
+            db, batch_size=settings.export_batch_size
+        ):
+            tasks.extend(validate_rows(Task, partition))
+        search_index.build(tasks)
 
+    hits, next_cursor, total = search_index.search_page(text_query, params)
+    db_tasks = await crud.get_tasks_by_ids([task_id for _, task_id in hits], db)
+    tasks_by_id = {task.task_id: task for task in validate_rows(Task, db_tasks)}
+    return KeysetPage[Task](
+        items=[tasks_by_id[task_id] for _, task_id in hits if task_id in tasks_by_id],
+        size=params.size,
+        nextCursor=next_cursor,
+        total=total,
+    )
 
-async def update_task(task_id: UUID, new_task: TaskUpdate, db: Session) -> Task:
+
+async def export_tasks(
+    export_format: ExportFormat,
+    db: DbSession,
+    user_id: UUID | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> StreamingResponse:
+    """
+    Service function to stream all tasks matching the filters.
+    """
+    partitions = crud.stream_tasks(
+        db,
+        batch_size=get_settings().export_batch_size,
+        user_id=user_id,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return export_response(partitions, Task, export_format, filename="tasks")
+
+
+async def update_task(
+    task_id: UUID, new_task: TaskUpdate, db: DbSession, if_match: str | None = None
+) -> Task:
     """
-    Service function to update task information.
+    Service function to update task information. With if_match, the task is only
+    updated when its current ETag is listed in it, with "*" when it exists.
     """
+    versions = None if if_match is None else etag_versions(if_match, task_id)
     try:
-        updated_user = crud.update_task(task_id=task_id, new_task=new_task, db=db)
+        db_task = await crud.update_task(
+            task_id=task_id, new_task=new_task, db=db, versions=versions
+        )
     except Exception as e:
-        error_str = f"Failed to update Task, task_id={task_id}, error={e}"
-        logger.error(error_str)
+        logger.error("Failed to update Task, task_id=%s, error=%s", task_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    if updated_user:
-        logger.info(f"Updated user, user_id={task_id}, new_user={new_task}")
-        return await get_task(task_id, db)
+    task_cache.invalidate(task_id)
+    if db_task:
+        logger.info("Updated task, task_id=%s, new_task=%s", task_id, new_task)
+        task = Task.model_validate(db_task)
+        task_cache.set(task_id, task)
+        search_index.add(task)
+        return task
+    if if_match is not None and versions is None:
+        # If-Match: * only holds for an existing task
+        raise HTTPException(*TASK_MISSING)
+    if versions is not None and await crud.get_task_version(task_id, db) is not None:
+        raise HTTPException(*TASK_MODIFIED)
     raise HTTPException(*TASK_NOT_FOUND)
 
 
-async def delete_task(task_id: UUID, db: Session) -> UUID:
+async def delete_task(task_id: UUID, db: DbSession) -> UUID:
     """
     Service function to delete a task by ID.
     """
-    existing_task = await get_task(task_id, db)
-    if existing_task is None:
+    try:
+        deleted_task_id = await crud.delete_task(task_id, db)
+    except Exception as e:
+        logger.error("Failed to delete Task, task_id=%s, error=%s", task_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    task_cache.invalidate(task_id)
+    search_index.remove(task_id)
+    if deleted_task_id is None:
         raise HTTPException(*TASK_NOT_FOUND)
+    return task_id
+
 
+async def delete_tasks(
+    db: DbSession,
+    user_id: UUID | None = None,
+    created_before: datetime | None = None,
+) -> TaskBulkDeleteResponse:
+    """
+    Service function to delete all tasks matching the filters.
+    """
+    if user_id is None and created_before is None:
+        raise HTTPException(*MISSING_DELETE_FILTER)
+
+    deleted = 0
     try:
-        crud.delete_task(task_id, db)
+        async for task_ids in crud.delete_tasks(
+            db,
+            batch_size=get_settings().delete_batch_size,
+            user_id=user_id,
+            created_before=created_before,
+        ):
+            for task_id in task_ids:
+                task_cache.invalidate(task_id)
+                search_index.remove(task_id)
+            deleted += len(task_ids)
     except Exception as e:
-        error_str = f"Failed to delete Task, task_id={task_id}, error={e}"
-        logger.error(error_str)
+        logger.error(
+            "Failed to delete Tasks, user_id=%s, created_before=%s, deleted=%s, "
+            "error=%s",
+            user_id,
+            created_before,
+            deleted,
+            e,
+        )
         raise HTTPException(status_code=500, detail=str(e))
-    return task_id
+    logger.info("Deleted tasks, user_id=%s, count=%s", user_id, deleted)
+    return TaskBulkDeleteResponse(deleted=deleted)
@@ -7,7 +7,7 @@ from pydantic import EmailStr, Field, field_validator
 from pydantic.types import SecretStr
 
 from app.api.models import BaseModel
-from app.api.task.models import Task, TaskWithoutUser
+from app.api.task.models import Task, TaskStats, TaskWithoutUser
 
 
 class BaseUser(BaseModel):
@@ -30,11 +30,29 @@ class User(UserResponse):
     tasks: List[Task] | None = Field(None)
 
 
+class UserBatchGet(BaseModel):
+    user_ids: List[UUID] = Field(..., alias="userIds", min_length=1)
+
+
+class UserBatchGetItem(BaseModel):
+    user_id: UUID = Field(..., alias="userId")
+    found: bool = Field(...)
+    user: UserResponse | None = Field(None)
+
+
+class UserBatchGetResponse(BaseModel):
+    items: List[UserBatchGetItem] = Field(default_factory=list)
+
+
 class UserTasks(BaseModel):
     user_id: UUID = Field(..., alias="userId")
     tasks: List[TaskWithoutUser] = Field([])
 
 
+class UserTaskStats(TaskStats):
+    user_id: UUID = Field(..., alias="userId")
+
+
 class UserCreate(BaseUser):
     username: str = Field(..., min_length=6, max_length=30)
     email: EmailStr = Field(...)
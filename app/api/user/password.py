@@ -0,0 +1,138 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.metrics import metrics
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+T = TypeVar("T")
+
+hash_seconds = metrics.histogram(
+    "password_hash_seconds",
+    "Time to hash or verify a password, including the wait for a worker",
+)
+rejected_hashes = metrics.counter(
+    "password_hash_rejected_total", "Password hashes rejected because the pool was full"
+)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    scrypt password hashing in a dedicated, bounded thread pool. hashlib.scrypt
+    releases the GIL, so hashes run in parallel while the event loop keeps serving
+    other requests. At most max_pending hashes run or wait for a worker at once,
+    further ones raise PasswordHasherBusy instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, max_pending: int, n: int, r: int, p: int) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.n = n
+        self.r = r
+        self.p = p
+        self.pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def queued(self) -> int:
+        return max(self.pending - self.workers, 0)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, encoded: str) -> bool:
+        return await self._run(self.verify_sync, password, encoded)
+
+    def hash_sync(self, password: str) -> str:
+        """
+        Hash password into "scrypt$n$r$p$salt$key", the cost is kept with the hash
+        so the parameters can change without invalidating stored passwords.
+        """
+        salt = os.urandom(SALT_BYTES)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return "$".join(
+            [
+                "scrypt",
+                str(self.n),
+                str(self.r),
+                str(self.p),
+                base64.b64encode(salt).decode(),
+                base64.b64encode(key).decode(),
+            ]
+        )
+
+    def verify_sync(self, password: str, encoded: str) -> bool:
+        try:
+            scheme, n, r, p, salt, key = encoded.split("$")
+            if scheme != "scrypt":
+                return False
+            derived = self._derive(
+                password, base64.b64decode(salt), int(n), int(r), int(p)
+            )
+            return hmac.compare_digest(derived, base64.b64decode(key))
+        except ValueError:
+            return False
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.max_pending:
+            rejected_hashes.inc()
+            raise PasswordHasherBusy(f"{self.pending} password hashes in progress")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="password-hasher"
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            self.pending -= 1
+            hash_seconds.observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            # scrypt needs about 128 * r * n bytes, OpenSSL refuses more than 32MB
+            # unless allowed explicitly
+            maxmem=256 * r * (n + p),
+            dklen=KEY_BYTES,
+        )
+
+
+def register_hasher_metrics(hasher: PasswordHasher) -> None:
+    """
+    Publish the queue depth of hasher.
+    """
+    metrics.gauge(
+        "password_hash_pending",
+        "Password hashes running or waiting for a worker",
+        lambda: hasher.pending,
+    )
+    metrics.gauge(
+        "password_hash_queued",
+        "Password hashes waiting for a worker",
+        lambda: hasher.queued,
+    )
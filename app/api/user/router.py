@@ -1,52 +1,140 @@
+from datetime import datetime
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page, Params as PaginationParams
-from sqlalchemy.orm import Session
 
+from app.api.etag import (
+    NOT_MODIFIED_RESPONSES,
+    PRECONDITION_FAILED_RESPONSES,
+    etag_matches,
+    etag_response,
+    not_modified,
+)
+from app.api.export import ExportFormat
+from app.api.pagination import KeysetPage, KeysetParams
+from app.api.serialization import fast_response
+from app.api.task.models import TaskWithoutUser
 from app.api.user import service
-from app.api.user.models import User, UserCreate, UserResponse, UserTasks, UserUpdate
-from app.database.database import get_db
+from app.api.user.models import (
+    User,
+    UserBatchGet,
+    UserBatchGetResponse,
+    UserCreate,
+    UserResponse,
+    UserTaskStats,
+    UserTasks,
+    UserUpdate,
+)
+from app.database.database import DbSession, get_db, get_read_db
 
 router = APIRouter(prefix="/users", tags=["User Management"])
 
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
-    user: UserCreate, db: Annotated[Session, Depends(get_db)]
+    user: UserCreate, db: Annotated[DbSession, Depends(get_db)]
 ) -> UserResponse:
     return await service.create_user(user, db)
 
 
-@router.get("/{user_id}", response_model=UserResponse)
+@router.post("/batch-get", response_model=UserBatchGetResponse)
+async def get_users_batch(
+    batch: UserBatchGet, db: Annotated[DbSession, Depends(get_read_db)]
+) -> UserBatchGetResponse | Response:
+    return fast_response(
+        UserBatchGetResponse, await service.get_users_batch(batch.user_ids, db)
+    )
+
+
+@router.get("/keyset", response_model=KeysetPage[UserResponse])
+async def get_users_keyset(
+    params: KeysetParams = Depends(), db: DbSession = Depends(get_read_db)
+) -> KeysetPage[UserResponse] | Response:
+    return fast_response(
+        KeysetPage[UserResponse], await service.get_users_keyset(params, db)
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(
+    db: Annotated[DbSession, Depends(get_read_db)],
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    created_after: datetime | None = Query(None, alias="createdAfter"),
+    created_before: datetime | None = Query(None, alias="createdBefore"),
+) -> StreamingResponse:
+    return await service.export_users(
+        export_format, db, created_after=created_after, created_before=created_before
+    )
+
+
+@router.get("/{user_id}", response_model=UserResponse, responses=NOT_MODIFIED_RESPONSES)
 async def get_user(
-    user_id: UUID, db: Annotated[Session, Depends(get_db)]
-) -> UserResponse:
-    return await service.get_user(user_id, db)
+    user_id: UUID,
+    response: Response,
+    db: Annotated[DbSession, Depends(get_read_db)],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> UserResponse | Response:
+    if if_none_match is not None:
+        etag = await service.get_user_etag(user_id, db)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    user = await service.get_user(user_id, db)
+    return etag_response(UserResponse, user, service.user_etag(user), response)
+
+
+@router.get("/{user_id}/tasks", response_model=KeysetPage[TaskWithoutUser])
+async def get_user_tasks_keyset(
+    user_id: UUID,
+    params: KeysetParams = Depends(),
+    db: DbSession = Depends(get_read_db),
+) -> KeysetPage[TaskWithoutUser] | Response:
+    return fast_response(
+        KeysetPage[TaskWithoutUser],
+        await service.get_user_tasks_keyset(user_id, params, db),
+    )
+
+
+@router.get("/{user_id}/stats", response_model=UserTaskStats)
+async def get_user_task_stats(
+    user_id: UUID, db: Annotated[DbSession, Depends(get_read_db)]
+) -> UserTaskStats | Response:
+    return fast_response(UserTaskStats, await service.get_user_task_stats(user_id, db))
 
 
-@router.get("/tasks/{user_id}", response_model=UserTasks)
+@router.get("/tasks/{user_id}", response_model=UserTasks, deprecated=True)
 async def get_user_tasks(
-    user_id: UUID, db: Annotated[Session, Depends(get_db)]
-) -> UserTasks:
-    return await service.get_user_tasks(user_id, db)
+    user_id: UUID, db: Annotated[DbSession, Depends(get_read_db)]
+) -> UserTasks | Response:
+    return fast_response(UserTasks, await service.get_user_tasks(user_id, db))
 
 
 @router.get("/", response_model=Page[UserResponse])
 async def get_users(
-    pagination: PaginationParams = Depends(), db: Session = Depends(get_db)
-) -> Page[UserResponse]:
-    return await service.get_users(pagination, db)
+    pagination: PaginationParams = Depends(), db: DbSession = Depends(get_read_db)
+) -> Page[UserResponse] | Response:
+    return fast_response(Page[UserResponse], await service.get_users(pagination, db))
 
 
-@router.put("/{user_id}", response_model=UserResponse)
+@router.put(
+    "/{user_id}", response_model=UserResponse, responses=PRECONDITION_FAILED_RESPONSES
+)
 async def update_user(
-    user_id: UUID, new_user: UserUpdate, db: Annotated[Session, Depends(get_db)]
+    user_id: UUID,
+    new_user: UserUpdate,
+    response: Response,
+    db: Annotated[DbSession, Depends(get_db)],
+    if_match: Annotated[str | None, Header()] = None,
 ) -> UserResponse:
-    return await service.update_user(user_id=user_id, new_user=new_user, db=db)
+    user = await service.update_user(
+        user_id=user_id, new_user=new_user, db=db, if_match=if_match
+    )
+    response.headers["ETag"] = service.user_etag(user)
+    return user
 
 
 @router.delete("/{user_id}", response_model=UUID)
-async def delete_user(user_id: UUID, db: Annotated[Session, Depends(get_db)]) -> UUID:
+async def delete_user(user_id: UUID, db: Annotated[DbSession, Depends(get_db)]) -> UUID:
     return await service.delete_user(user_id, db)
@@ -1,109 +1,294 @@
 import logging
+from datetime import datetime
 from uuid import UUID
 
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page, Params as PaginationParams
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
 
+from app.api.cache import EntityCache
+from app.api.etag import entity_etag, entity_version, etag_versions
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import INVALID_CURSOR, KeysetPage, KeysetParams
+from app.api.serialization import validate_rows
+from app.api.task.models import TaskWithoutUser
 from app.api.user.models import (
     BaseUser,
     User,
+    UserBatchGetItem,
+    UserBatchGetResponse,
     UserCreate,
     UserResponse,
+    UserTaskStats,
     UserTasks,
     UserUpdate,
 )
+from app.api.user.password import (
+    PasswordHasher,
+    PasswordHasherBusy,
+    register_hasher_metrics,
+)
+from app.config import get_settings
+from app.database.database import DbSession, on_replica
 from app.database.user import crud
 
 logger = logging.getLogger(__name__)
 
 USER_NOT_FOUND = (404, "User not found")
+USER_MODIFIED = (412, "User was modified, the ETag in If-Match is outdated")
+USER_MISSING = (412, "User not found, If-Match: * requires it to exist")
+PASSWORD_HASHER_BUSY = (503, "Too many signups in progress, retry later")
+TOO_MANY_IDS = (413, "Too many IDs, at most {} per request")
+
+settings = get_settings()
+user_cache: EntityCache[UserResponse] = EntityCache(
+    max_entries=settings.cache_max_entries,
+    ttl=settings.cache_ttl_seconds,
+    not_found_ttl=settings.cache_not_found_ttl_seconds,
+    enabled=settings.cache_enabled,
+)
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    n=settings.password_hash_n,
+    r=settings.password_hash_r,
+    p=settings.password_hash_p,
+)
+register_hasher_metrics(password_hasher)
 
 
-async def create_user(user: UserCreate, db: Session) -> UserResponse:
+async def create_user(user: UserCreate, db: DbSession) -> UserResponse:
     """
     Service function to create a new user.
     """
     try:
-        db_user = crud.create_user(user, db)
+        password_hash = await password_hasher.hash(user.password.get_secret_value())
+    except PasswordHasherBusy as e:
+        logger.warning("Rejected user creation, error=%s", e)
+        raise HTTPException(
+            *PASSWORD_HASHER_BUSY,
+            headers={"Retry-After": str(settings.password_hash_retry_after)},
+        )
+    try:
+        db_user = await crud.create_user(user, password_hash, db)
     except IntegrityError as ie:
-        error_str = f"Failed to add row to table, data={user.model_dump()}, error={ie}"
-        logger.error(error_str)
+        logger.error("Failed to add row to table, data=%s, error=%s", user, ie)
         raise HTTPException(status_code=409, detail=str(ie))
     except Exception as e:
-        error_str = f"Failed to add row to table, data={user.model_dump()}, error={e}"
-        logger.error(error_str)
+        logger.error("Failed to add row to table, data=%s, error=%s", user, e)
         raise HTTPException(status_code=500, detail=str(e))
     return UserResponse.model_validate(db_user)
 
 
-async def get_user(user_id: UUID, db: Session) -> UserResponse:
+def user_etag(user: UserResponse) -> str:
+    return entity_etag(user.user_id, entity_version(user.created_at, user.updated_at))
+
+
+async def get_user_etag(user_id: UUID, db: DbSession) -> str:
     """
-    Service function to retrieve a user by ID.
+    Service function to retrieve the ETag of a user from its version only, without
+    loading the user. A cached user of another version is dropped.
+    """
+    version = await crud.get_user_version(user_id, db)
+    if version is None:
+        if not on_replica(db):
+            user_cache.set_not_found(user_id)
+        raise HTTPException(*USER_NOT_FOUND)
+    etag = entity_etag(user_id, version)
+    hit, cached_user = user_cache.get(user_id)
+    if hit and (cached_user is None or user_etag(cached_user) != etag):
+        user_cache.invalidate(user_id)
+    return etag
+
+
+async def get_user(user_id: UUID, db: DbSession) -> UserResponse:
     """
-    db_user = crud.get_user(user_id, db)
+    Service function to retrieve a user by ID. Rows read from a replica aren't
+    cached, the cache would serve them to clients pinned to the primary.
+    """
+    hit, cached_user = user_cache.get(user_id)
+    if hit:
+        if cached_user is None:
+            raise HTTPException(*USER_NOT_FOUND)
+        return cached_user
+
+    db_user = await crud.get_user(user_id, db)
     if db_user:
         try:
-            return UserResponse.model_validate(db_user[0])
+            user = UserResponse.model_validate(db_user[0])
+            if not on_replica(db):
+                user_cache.set(user_id, user)
+            return user
         except Exception as e:
-            error_str = f"Failed to get User, user_id={user_id}, error={e}"
-            logger.error(error_str)
+            logger.error("Failed to get User, user_id=%s, error=%s", user_id, e)
             raise HTTPException(status_code=500, detail=str(e))
+    if not on_replica(db):
+        user_cache.set_not_found(user_id)
     raise HTTPException(*USER_NOT_FOUND)
 
 
-async def get_user_tasks(user_id: UUID, db: Session) -> UserTasks:
+async def get_users_batch(user_ids: list[UUID], db: DbSession) -> UserBatchGetResponse:
+    """
+    Service function to retrieve many users by ID, the cached ones from the cache
+    and all others in one query. Items follow the order of user_ids, missing users
+    are reported as not found.
+    """
+    max_ids = settings.batch_get_max_ids
+    if len(user_ids) > max_ids:
+        raise HTTPException(TOO_MANY_IDS[0], TOO_MANY_IDS[1].format(max_ids))
+
+    users: dict[UUID, UserResponse | None] = {}
+    for user_id in user_ids:
+        hit, cached_user = user_cache.get(user_id)
+        if hit:
+            users[user_id] = cached_user
+    missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in users]
+    if missing:
+        db_users = await crud.get_users_by_ids(missing, db)
+        fill_cache = not on_replica(db)
+        for user in validate_rows(UserResponse, db_users):
+            users[user.user_id] = user
+            if fill_cache:
+                user_cache.set(user.user_id, user)
+        for user_id in missing:
+            if user_id not in users:
+                users[user_id] = None
+                if fill_cache:
+                    user_cache.set_not_found(user_id)
+
+    return UserBatchGetResponse(
+        items=[
+            UserBatchGetItem(
+                userId=user_id, found=users[user_id] is not None, user=users[user_id]
+            )
+            for user_id in user_ids
+        ]
+    )
+
+
+async def get_user_task_stats(user_id: UUID, db: DbSession) -> UserTaskStats:
+    """
+    Service function to retrieve the task counters of a user.
+    """
+    stats = await crud.get_user_task_stats(user_id, db)
+    if stats is None:
+        raise HTTPException(*USER_NOT_FOUND)
+    return stats
+
+
+async def get_user_tasks(user_id: UUID, db: DbSession) -> UserTasks:
     """
     Service function to retrieve a user by ID.
     """
-    db_user_tasks = crud.get_user(user_id, db)
+    db_user_tasks = await crud.get_user_tasks(user_id, db)
     if db_user_tasks:
         try:
             return UserTasks.model_validate(db_user_tasks[0])
         except Exception as e:
-            error_str = f"Failed to get User tasks, user_id={user_id}, error={e}"
-            logger.error(error_str)
+            logger.error("Failed to get User tasks, user_id=%s, error=%s", user_id, e)
             raise HTTPException(status_code=500, detail=str(e))
     raise HTTPException(*USER_NOT_FOUND)
 
 
-async def get_users(pagination: PaginationParams, db: Session) -> Page[UserResponse]:
+async def get_user_tasks_keyset(
+    user_id: UUID, params: KeysetParams, db: DbSession
+) -> KeysetPage[TaskWithoutUser]:
+    """
+    Service function to retrieve a page of user tasks with keyset pagination.
+    """
+    try:
+        page = await crud.get_user_tasks_keyset(user_id, params, db)
+    except ValueError as e:
+        logger.error(
+            "Failed to get User tasks page, cursor=%s, error=%s", params.cursor, e
+        )
+        raise HTTPException(*INVALID_CURSOR)
+    # the user is looked up only when its first page is empty
+    if not page.items and not params.cursor and not await crud.get_user(user_id, db):
+        raise HTTPException(*USER_NOT_FOUND)
+    return page
+
+
+async def get_users(pagination: PaginationParams, db: DbSession) -> Page[UserResponse]:
     """
     Service function to retrieve a list of users with optional pagination.
     """
-    return crud.get_users(pagination, db)
+    return await crud.get_users(pagination, db)
+
+
+async def get_users_keyset(
+    params: KeysetParams, db: DbSession
+) -> KeysetPage[UserResponse]:
+    """
+    Service function to retrieve a list of users with keyset pagination.
+    """
+    try:
+        return await crud.get_users_keyset(params, db)
+    except ValueError as e:
+        logger.error("Failed to get Users page, cursor=%s, error=%s", params.cursor, e)
+        raise HTTPException(*INVALID_CURSOR)
+
+
+async def export_users(
+    export_format: ExportFormat,
+    db: DbSession,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> StreamingResponse:
+    """
+    Service function to stream all users matching the filters.
+    """
+    partitions = crud.stream_users(
+        db,
+        batch_size=get_settings().export_batch_size,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return export_response(partitions, UserResponse, export_format, filename="users")
 
 
-async def update_user(user_id: UUID, new_user: UserUpdate, db: Session) -> UserResponse:
+async def update_user(
+    user_id: UUID, new_user: UserUpdate, db: DbSession, if_match: str | None = None
+) -> UserResponse:
     """
-    Service function to update user information.
+    Service function to update user information. With if_match, the user is only
+    updated when its current ETag is listed in it, with "*" when it exists.
     """
+    versions = None if if_match is None else etag_versions(if_match, user_id)
     try:
-        updated_user = crud.update_user(user_id=user_id, new_user=new_user, db=db)
+        db_user = await crud.update_user(
+            user_id=user_id, new_user=new_user, db=db, versions=versions
+        )
     except Exception as e:
-        error_str = f"Failed to update User, user_id={user_id}, error={e}"
-        logger.error(error_str)
+        logger.error("Failed to update User, user_id=%s, error=%s", user_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    if updated_user:
-        logger.info(f"Updated user, user_id={user_id}, new_user={new_user}")
-        return await get_user(user_id, db)
+    user_cache.invalidate(user_id)
+    if db_user:
+        logger.info("Updated user, user_id=%s, new_user=%s", user_id, new_user)
+        user = UserResponse.model_validate(db_user)
+        user_cache.set(user_id, user)
+        return user
+    if if_match is not None and versions is None:
+        # If-Match: * only holds for an existing user
+        raise HTTPException(*USER_MISSING)
+    if versions is not None and await crud.get_user_version(user_id, db) is not None:
+        raise HTTPException(*USER_MODIFIED)
     raise HTTPException(*USER_NOT_FOUND)
 
 
-async def delete_user(user_id: UUID, db: Session) -> UUID:
+async def delete_user(user_id: UUID, db: DbSession) -> UUID:
     """
     Service function to delete a user by ID.
     """
-    existing_user = await get_user(user_id, db)
-    if existing_user is None:
-        raise HTTPException(*USER_NOT_FOUND)
-
     try:
-        crud.delete_user(user_id, db)
+        deleted_user_id = await crud.delete_user(user_id, db)
     except Exception as e:
-        error_str = f"Failed to delete User, user_id={user_id}, error={e}"
-        logger.error(error_str)
+        logger.error("Failed to delete User, user_id=%s, error=%s", user_id, e)
         raise HTTPException(status_code=500, detail=str(e))
+
+    user_cache.invalidate(user_id)
+    if deleted_user_id is None:
+        raise HTTPException(*USER_NOT_FOUND)
     return user_id
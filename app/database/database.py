@@ -1,10 +1,43 @@
-from typing import Generator
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Sequence,
+    TypeAlias,
+    TypeVar,
+)
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, Executable, Result, ScalarResult, create_engine
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
-from sqlalchemy_utils import create_database, database_exists
+from sqlalchemy.pool import Pool
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
 
 from app.config import get_settings
+from app.database.migrate import Migration, pending_migrations
+from app.database.pool import (
+    TimedAsyncAdaptedQueuePool,
+    TimedQueuePool,
+    register_pool_metrics,
+)
+from app.database.replicas import (
+    PRIMARY_COOKIE,
+    ReplicaSet,
+    Selection,
+    pinned_to_primary,
+)
+from app.database.timing import time_queries
+from app.log import sample_sql
+
+T = TypeVar("T")
 
 settings = get_settings()
 
@@ -15,24 +48,252 @@ db_port: str = settings.db_port
 db_database: str = settings.db_database
 
 db_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_database}"
+async_db_string = (
+    f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_database}"
+)
+
+pool_options: dict[str, Any] = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_pool_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
+engine = create_engine(url=db_string, poolclass=TimedQueuePool, **pool_options)
+async_engine = create_async_engine(
+    url=async_db_string, poolclass=TimedAsyncAdaptedQueuePool, **pool_options
+)
+
+
+def instrument(sync_engine: Engine, asyncio_engine: AsyncEngine) -> Callable[[], Pool]:
+    """
+    Sample and time the SQL statements of both engines of one database, returns
+    the getter of the pool of the active one for register_pool_metrics.
+    """
+    for instrumented in (sync_engine, asyncio_engine.sync_engine):
+        sample_sql(instrumented, settings.db_echo_sample_rate)
+        time_queries(instrumented)
+    return lambda: asyncio_engine.pool if settings.db_async else sync_engine.pool
 
-engine = create_engine(url=db_string, echo=True)
 
-if not database_exists(engine.url):
-    create_database(engine.url)
+def create_replicas(
+    urls: list[str], selection: Selection, **options: Any
+) -> ReplicaSet:
+    """
+    Engines of the read replicas at urls, with the pool options (overridden by
+    options), the SQL sampling and timing and the pool metrics of the primary.
+    """
+    replica_set = ReplicaSet(urls, selection, **(pool_options | options))
+    for index, engines in enumerate(
+        zip(replica_set.engines, replica_set.async_engines)
+    ):
+        register_pool_metrics(instrument(*engines), replica=str(index))
+    return replica_set
+
+
+register_pool_metrics(instrument(engine, async_engine))
+replicas = create_replicas(
+    settings.db_read_replicas, settings.db_read_replica_selection
+)
 
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+class ThreadedScalarResult:
+    """
+    Synchronous ScalarResult exposed through the AsyncScalarResult partitions API.
+    """
+
+    def __init__(self, result: ScalarResult[Any]) -> None:
+        self.result = result
+
+    async def partitions(self, size: int | None = None) -> AsyncIterator[Sequence[Any]]:
+        partitions = self.result.partitions(size)
+        while partition := await run_in_threadpool(next, partitions, None):
+            yield partition
+
+
+class ThreadedSession:
+    """
+    Synchronous Session exposed through the awaitable subset of the AsyncSession API
+    used by crud operations. Every blocking call runs in the threadpool, so the sync
+    driver never stalls the event loop.
+    """
+
+    def __init__(self, sync_session: Session) -> None:
+        self.sync_session = sync_session
+
+    @property
+    def info(self) -> dict[Any, Any]:
+        return self.sync_session.info
+
+    def add(self, instance: object) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances: list[Any]) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(
+        self, statement: Executable, *args: Any, **kwargs: Any
+    ) -> Result[Any]:
+        return await run_in_threadpool(
+            self.sync_session.execute, statement, *args, **kwargs
+        )
+
+    async def scalar(self, statement: Executable, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(
+            self.sync_session.scalar, statement, *args, **kwargs
+        )
+
+    async def stream_scalars(
+        self, statement: Executable, *args: Any, **kwargs: Any
+    ) -> ThreadedScalarResult:
+        result = await run_in_threadpool(
+            self.sync_session.scalars, statement, *args, **kwargs
+        )
+        return ThreadedScalarResult(result)
+
+    async def refresh(
+        self, instance: object, attribute_names: list[str] | None = None
+    ) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = None
+DbSession: TypeAlias = AsyncSession | ThreadedSession
+
+
+def open_session(replica: int | None = None) -> DbSession:
+    """
+    Session of the active engine on the primary, or on replicas.engines[replica].
+    """
+    if replica is None:
+        if settings.db_async:
+            return AsyncSessionLocal()
+        return ThreadedSession(SessionLocal())
+    info = {"replica": replica}
+    if settings.db_async:
+        return AsyncSession(
+            bind=replicas.async_engines[replica], expire_on_commit=False, info=info
+        )
+    return ThreadedSession(
+        Session(bind=replicas.engines[replica], expire_on_commit=False, info=info)
+    )
+
+
+def on_replica(db: DbSession) -> bool:
+    """
+    Whether db reads one of the replicas, whose rows may lag behind the primary.
+    """
+    return "replica" in db.info
+
+
+async def get_db() -> AsyncGenerator[DbSession, None]:
+    db: DbSession | None = None
     try:
-        db = SessionLocal()
+        db = open_session()
         yield db
     finally:
         if db is not None:
-            db.close()
+            await db.close()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[DbSession, None]:
+    """
+    Session of a read-only route, on one of the read replicas, or on the primary
+    when there are none or the client wrote recently (read-your-writes cookie).
+    """
+    replica = None
+    if len(replicas) and not pinned_to_primary(request.cookies.get(PRIMARY_COOKIE)):
+        replica = replicas.choose(settings.db_async)
+    db: DbSession | None = None
+    try:
+        db = open_session(replica)
+        yield db
+    finally:
+        if db is not None:
+            await db.close()
+
+
+async def prewarm_pool() -> None:
+    """
+    Open pool_size connections of the active engine, so the first requests after
+    startup don't pay for connecting.
+    """
+    if settings.db_async:
+        async_connections = []
+        try:
+            for _ in range(settings.db_pool_size):
+                async_connections.append(await async_engine.connect())
+        finally:
+            for async_connection in async_connections:
+                await async_connection.close()
+    else:
+        await run_in_threadpool(_prewarm_sync_pool)
+
+
+def _prewarm_sync_pool() -> None:
+    connections = []
+    try:
+        for _ in range(settings.db_pool_size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def check_schema() -> None:
+    """
+    Fail the startup when migrations are pending, instead of the first requests
+    failing on a missing table or column.
+    """
+    if settings.db_async:
+        async with async_engine.connect() as async_connection:
+            pending = await async_connection.run_sync(pending_migrations)
+    else:
+        pending = await run_in_threadpool(_pending_migrations_sync)
+    if pending:
+        versions = ", ".join(f"{m.version:04d} {m.name}" for m in pending)
+        raise RuntimeError(
+            f"Pending migrations {versions}, run python -m app.database.migrate"
+        )
+
+
+def _pending_migrations_sync() -> list[Migration]:
+    with engine.connect() as connection:
+        return pending_migrations(connection)
+
+
+async def dispose_pool() -> None:
+    """
+    Close all pooled connections of both engines and of the replicas.
+    """
+    await async_engine.dispose()
+    await run_in_threadpool(engine.dispose)
+    for replica_engine, async_replica_engine in zip(
+        replicas.engines, replicas.async_engines
+    ):
+        await async_replica_engine.dispose()
+        await run_in_threadpool(replica_engine.dispose)
+
 
+# type of an array of IDs bound as one parameter, id = ANY(:ids)
+UUID_ARRAY = ARRAY(UUID(as_uuid=True))
 
 # SqlAlchemy ORM model
 Base = declarative_base()
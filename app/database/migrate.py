@@ -0,0 +1,197 @@
+"""
+Versioned, forward-only schema migrations.
+
+Every module of app.database.migrations named v<version>_<name> defines
+upgrade(connection). Pending migrations are applied in version order, each one
+in its own transaction together with its row in the schema_migrations table.
+A module with TRANSACTIONAL = False runs in autocommit mode instead, for
+statements that can't run in a transaction, e.g. CREATE INDEX CONCURRENTLY, and
+must be safe to rerun, its row is recorded after it succeeded.
+
+    python -m app.database.migrate           # apply pending migrations
+    python -m app.database.migrate status    # list applied and pending ones
+"""
+import argparse
+import importlib
+import logging
+import pkgutil
+from types import ModuleType
+from typing import NamedTuple
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from app.database import migrations
+
+logger = logging.getLogger(__name__)
+
+# arbitrary key of the advisory lock serializing concurrent migration runs
+MIGRATIONS_LOCK_ID = 4_210_001
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    module: ModuleType
+
+
+def load_migrations() -> list[Migration]:
+    """
+    Discover migration modules sorted by their version.
+    """
+    found = []
+    for module_info in pkgutil.iter_modules(migrations.__path__):
+        prefix, _, name = module_info.name.partition("_")
+        if not prefix.startswith("v") or not prefix[1:].isdigit():
+            continue
+        module = importlib.import_module(f"{migrations.__name__}.{module_info.name}")
+        found.append(Migration(int(prefix[1:]), name, module))
+    found.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicated migration versions: {versions}")
+    return found
+
+
+def _ensure_migrations_table(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
+
+
+def applied_versions(connection: Connection) -> set[int]:
+    _ensure_migrations_table(connection)
+    return set(
+        connection.execute(text("SELECT version FROM schema_migrations")).scalars()
+    )
+
+
+def pending_migrations(connection: Connection) -> list[Migration]:
+    """
+    Migrations not applied to the database of connection, read only.
+    """
+    done: set[int] = set()
+    if inspect(connection).has_table("schema_migrations"):
+        done = set(
+            connection.execute(text("SELECT version FROM schema_migrations")).scalars()
+        )
+    return [
+        migration for migration in load_migrations() if migration.version not in done
+    ]
+
+
+def create_index_concurrently(connection: Connection, name: str, on: str) -> None:
+    """
+    Build index name ON on without blocking writes to the table. A build that
+    failed halfway leaves an invalid index behind, it is dropped and built again.
+    """
+    valid = connection.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if valid is False:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {on}"))
+
+
+def ensure_database(engine: Engine) -> None:
+    """
+    Create the database of engine when it doesn't exist yet.
+    """
+    # imported here, sqlalchemy_utils adds ~0.1 s to every import of the app
+    from sqlalchemy_utils import create_database, database_exists
+
+    if not database_exists(engine.url):
+        logger.info("Creating database %s", engine.url.database)
+        create_database(engine.url)
+
+
+def _record(connection: Connection, migration: Migration) -> None:
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+def upgrade(engine: Engine) -> list[Migration]:
+    """
+    Apply all pending migrations, returns the applied ones.
+    """
+    applied: list[Migration] = []
+    with engine.connect() as connection:
+        is_postgres = connection.dialect.name == "postgresql"
+        if is_postgres:
+            connection.execute(
+                text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID}
+            )
+            connection.commit()
+        try:
+            with connection.begin():
+                done = applied_versions(connection)
+            for migration in load_migrations():
+                if migration.version in done:
+                    continue
+                logger.info(
+                    "Applying migration %s %s", migration.version, migration.name
+                )
+                if getattr(migration.module, "TRANSACTIONAL", True):
+                    with connection.begin():
+                        migration.module.upgrade(connection)
+                        _record(connection, migration)
+                else:
+                    isolation_level = connection.get_isolation_level()
+                    connection.execution_options(isolation_level="AUTOCOMMIT")
+                    try:
+                        migration.module.upgrade(connection)
+                        connection.commit()
+                    finally:
+                        connection.execution_options(isolation_level=isolation_level)
+                    with connection.begin():
+                        _record(connection, migration)
+                applied.append(migration)
+        finally:
+            if is_postgres:
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID}
+                )
+                connection.commit()
+    return applied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"])
+    args = parser.parse_args()
+
+    from app.config import get_settings
+    from app.database.database import engine
+    from app.log import configure_logging
+
+    configure_logging(get_settings())
+
+    if args.command == "status":
+        with engine.connect() as connection:
+            pending = pending_migrations(connection)
+        for migration in load_migrations():
+            state = "pending" if migration in pending else "applied"
+            print(f"{migration.version:04d} {migration.name:<32} {state}")
+        return
+
+    ensure_database(engine)
+    applied = upgrade(engine)
+    for migration in applied:
+        print(f"Applied {migration.version:04d} {migration.name}")
+    if not applied:
+        print("Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Users and tasks tables as created by Base.metadata.create_all before migrations.
+"""
+from sqlalchemy import Connection, text
+
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id UUID NOT NULL,
+                username VARCHAR,
+                email VARCHAR,
+                password VARCHAR,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE,
+                PRIMARY KEY (user_id),
+                UNIQUE (username),
+                UNIQUE (email)
+            )
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id UUID NOT NULL,
+                name VARCHAR,
+                description VARCHAR,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE,
+                user_id UUID,
+                PRIMARY KEY (task_id),
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+            """
+        )
+    )
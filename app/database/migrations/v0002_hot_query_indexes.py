@@ -0,0 +1,21 @@
+"""
+Indexes of the user tasks lookup and of the (created_at, id) keyset pagination,
+built concurrently, so writes to tasks and users go on while they are built.
+"""
+from sqlalchemy import Connection
+
+from app.database.migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+def upgrade(connection: Connection) -> None:
+    create_index_concurrently(
+        connection, "ix_tasks_user_id_created_at", "tasks (user_id, created_at)"
+    )
+    create_index_concurrently(
+        connection, "ix_tasks_created_at_task_id", "tasks (created_at, task_id)"
+    )
+    create_index_concurrently(
+        connection, "ix_users_created_at_user_id", "users (created_at, user_id)"
+    )
@@ -0,0 +1,21 @@
+"""
+Extend the user tasks index with task_id, so the (created_at, task_id) keyset
+pages of a single user are read in index order without sorting. Built and the
+old index dropped concurrently, writes to tasks aren't blocked.
+"""
+from sqlalchemy import Connection, text
+
+from app.database.migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+def upgrade(connection: Connection) -> None:
+    create_index_concurrently(
+        connection,
+        "ix_tasks_user_id_created_at_task_id",
+        "tasks (user_id, created_at, task_id)",
+    )
+    connection.execute(
+        text("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_user_id_created_at")
+    )
@@ -0,0 +1,29 @@
+"""
+Full-text search over tasks: a generated tsvector of the name (weight A) and the
+description (weight B) with a GIN index, queried by GET /tasks/search.
+
+Adding the stored column rewrites tasks and holds its ACCESS EXCLUSIVE lock until
+the migration commits, reads and writes of tasks wait for the rewrite and the
+index build; run it in a maintenance window on a large table.
+"""
+from sqlalchemy import Connection, text
+
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+            ) STORED
+            """
+        )
+    )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector "
+            "ON tasks USING gin (search_vector)"
+        )
+    )
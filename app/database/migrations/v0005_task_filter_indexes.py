@@ -0,0 +1,22 @@
+"""
+Indexes of the GET /tasks filters and sort keys not covered yet: the task version
+(updated_at, or created_at when never updated) and the name compared bytewise,
+which also serves LIKE 'prefix%' in any database collation. Built concurrently,
+writes to tasks aren't blocked.
+"""
+from sqlalchemy import Connection
+
+from app.database.migrate import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+def upgrade(connection: Connection) -> None:
+    create_index_concurrently(
+        connection,
+        "ix_tasks_version_task_id",
+        "tasks ((coalesce(updated_at, created_at)), task_id)",
+    )
+    create_index_concurrently(
+        connection, "ix_tasks_name_task_id", 'tasks ((name COLLATE "C"), task_id)'
+    )
@@ -0,0 +1,151 @@
+"""
+Task counters per user and in total, kept up to date by statement level triggers
+on tasks in the transaction of the change, so reading them is a primary key lookup
+instead of an aggregate over tasks. Every insert, update or delete statement
+applies its changes grouped by user, a bulk insert of 1000 tasks is one upsert per
+user.
+
+The total is split over TASK_STATS_SLOTS rows, each statement adds to a random one,
+so concurrent writers rarely wait for the lock of the same counter row.
+
+last_created_at and last_updated_at are the times tasks were last created and
+updated, they are not moved back when tasks are deleted.
+"""
+from sqlalchemy import Connection, text
+
+TASK_STATS_SLOTS = 16
+
+# (user_id, tasks, created, updated) changes of one statement, grouped by user
+CHANGES = {
+    "insert": """
+        SELECT user_id, count(*) AS tasks, max(created_at) AS created,
+            max(updated_at) AS updated
+        FROM new_tasks GROUP BY user_id
+    """,
+    "update": """
+        SELECT user_id, sum(tasks) AS tasks, NULL::timestamptz AS created,
+            max(updated) AS updated
+        FROM (
+            SELECT user_id, 1 AS tasks, updated_at AS updated FROM new_tasks
+            UNION ALL
+            SELECT user_id, -1, NULL FROM old_tasks
+        ) AS changes
+        GROUP BY user_id
+    """,
+    "delete": """
+        SELECT user_id, -count(*) AS tasks, NULL::timestamptz AS created,
+            NULL::timestamptz AS updated
+        FROM old_tasks GROUP BY user_id
+    """,
+}
+TRANSITION_TABLES = {
+    "insert": "NEW TABLE AS new_tasks",
+    "update": "NEW TABLE AS new_tasks OLD TABLE AS old_tasks",
+    "delete": "OLD TABLE AS old_tasks",
+}
+
+APPLY_CHANGES = """
+    WITH changes AS ({changes}),
+    user_changes AS (
+        INSERT INTO user_task_stats AS stats
+            (user_id, task_count, last_created_at, last_updated_at)
+        SELECT user_id, tasks, created, updated FROM changes
+        WHERE user_id IS NOT NULL
+        -- the same lock order in every transaction, concurrent bulk statements
+        -- over many users don't deadlock
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            task_count = stats.task_count + excluded.task_count,
+            last_created_at = greatest(stats.last_created_at, excluded.last_created_at),
+            last_updated_at = greatest(stats.last_updated_at, excluded.last_updated_at)
+    )
+    INSERT INTO task_stats AS stats
+        (slot, task_count, last_created_at, last_updated_at)
+    SELECT floor(random() * {slots}), sum(tasks), max(created), max(updated)
+    FROM changes
+    HAVING count(*) > 0
+    ON CONFLICT (slot) DO UPDATE SET
+        task_count = stats.task_count + excluded.task_count,
+        last_created_at = greatest(stats.last_created_at, excluded.last_created_at),
+        last_updated_at = greatest(stats.last_updated_at, excluded.last_updated_at)
+"""
+
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS user_task_stats (
+                user_id UUID PRIMARY KEY REFERENCES users (user_id) ON DELETE CASCADE,
+                task_count BIGINT NOT NULL DEFAULT 0,
+                last_created_at TIMESTAMP WITH TIME ZONE,
+                last_updated_at TIMESTAMP WITH TIME ZONE
+            )
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS task_stats (
+                slot SMALLINT PRIMARY KEY,
+                task_count BIGINT NOT NULL DEFAULT 0,
+                last_created_at TIMESTAMP WITH TIME ZONE,
+                last_updated_at TIMESTAMP WITH TIME ZONE
+            )
+            """
+        )
+    )
+
+    for operation, changes in CHANGES.items():
+        apply_changes = APPLY_CHANGES.format(changes=changes, slots=TASK_STATS_SLOTS)
+        connection.execute(
+            text(
+                f"""
+                CREATE OR REPLACE FUNCTION task_stats_after_{operation}()
+                RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    {apply_changes};
+                    RETURN NULL;
+                END
+                $$
+                """
+            )
+        )
+        connection.execute(
+            text(f"DROP TRIGGER IF EXISTS task_stats_after_{operation} ON tasks")
+        )
+        connection.execute(
+            text(
+                f"""
+                CREATE TRIGGER task_stats_after_{operation}
+                AFTER {operation.upper()} ON tasks
+                REFERENCING {TRANSITION_TABLES[operation]}
+                FOR EACH STATEMENT EXECUTE FUNCTION task_stats_after_{operation}()
+                """
+            )
+        )
+
+    # counters of the tasks created before the triggers; CREATE TRIGGER locks tasks
+    # against writes until this transaction commits, so no change is counted twice
+    # or missed
+    connection.execute(text("DELETE FROM user_task_stats"))
+    connection.execute(text("DELETE FROM task_stats"))
+    connection.execute(
+        text(
+            """
+            INSERT INTO user_task_stats
+                (user_id, task_count, last_created_at, last_updated_at)
+            SELECT user_id, count(*), max(created_at), max(updated_at)
+            FROM tasks WHERE user_id IS NOT NULL GROUP BY user_id
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            INSERT INTO task_stats (slot, task_count, last_created_at, last_updated_at)
+            SELECT 0, count(*), max(created_at), max(updated_at) FROM tasks
+            """
+        )
+    )
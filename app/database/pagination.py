@@ -0,0 +1,60 @@
+from typing import Any, Sequence, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Column, Select, func, literal, select, tuple_
+
+from app.api.pagination import KeysetPage, KeysetParams, decode_cursor, encode_cursor
+from app.api.serialization import validate_rows
+from app.database.database import DbSession
+
+M = TypeVar("M", bound=BaseModel)
+
+
+async def keyset_paginate(
+    db: DbSession,
+    query: Select[Any],
+    created_at: Column[Any],
+    entity_id: Column[Any],
+    params: KeysetParams,
+    model: type[M],
+) -> KeysetPage[M]:
+    """
+    Paginate query by the (created_at, id) keyset instead of OFFSET. Rows inserted
+    concurrently never shift the following pages, the total is counted only on demand.
+    """
+    page_query = query
+    if params.cursor:
+        last_created_at, last_id = decode_cursor(params.cursor)
+        page_query = page_query.where(
+            tuple_(created_at, entity_id)
+            > tuple_(
+                literal(last_created_at, created_at.type),
+                literal(last_id, entity_id.type),
+            )
+        )
+    page_query = page_query.order_by(created_at, entity_id).limit(params.size + 1)
+    result = await db.execute(page_query)
+    # a query of a single ORM entity returns its objects, a query of columns rows
+    # with attributes named after the columns
+    rows: Sequence[Any] = (
+        result.scalars().all() if len(query.column_descriptions) == 1 else result.all()
+    )
+
+    total = None
+    if params.include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    next_cursor = None
+    if len(rows) > params.size:
+        rows = rows[: params.size]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last, created_at.key), getattr(last, entity_id.key)
+        )
+
+    return KeysetPage[model](  # type: ignore[valid-type]
+        items=validate_rows(model, rows),
+        size=params.size,
+        nextCursor=next_cursor,
+        total=total,
+    )
@@ -0,0 +1,68 @@
+"""
+Query plan estimates, used to refuse queries the planner would answer by reading a
+whole big table.
+"""
+import json
+from typing import Any, Iterator
+
+from sqlalchemy import ClauseElement, Executable, Select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+
+from app.database.database import DbSession
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN (FORMAT JSON) of a statement, with the bound parameters of the statement.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select[Any]) -> None:
+        self.statement = statement
+
+
+@compiles(Explain)  # type: ignore[misc, no-untyped-call]
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _plan_nodes(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def table_rows_estimate(table_name: str, db: DbSession) -> float:
+    """
+    Row count of table_name as of its last ANALYZE, 0 when it was never analyzed.
+    """
+    reltuples = await db.scalar(
+        text("SELECT reltuples FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+        {"name": table_name},
+    )
+    return max(float(reltuples or 0), 0.0)
+
+
+async def sequential_scan_rows(
+    query: Select[Any], table_name: str, db: DbSession, min_table_rows: float = 0
+) -> float:
+    """
+    Estimated rows of table_name read by sequential scans when query runs, 0 when
+    the planner reaches the table through indexes. The query is only planned, not
+    executed, and not even planned when the table has at most min_table_rows rows.
+    """
+    table_rows = await table_rows_estimate(table_name, db)
+    if table_rows <= min_table_rows:
+        return 0.0
+    plan = (await db.execute(Explain(query))).scalar_one()
+    # psycopg2 decodes the json result, asyncpg returns it as text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = sum(
+        1
+        for node in _plan_nodes(plan[0]["Plan"])
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table_name
+    )
+    return table_rows * scans
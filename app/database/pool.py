@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import exc
+from sqlalchemy.pool import (
+    AsyncAdaptedQueuePool,
+    Pool,
+    PoolProxiedConnection,
+    QueuePool,
+)
+
+from app.metrics import metrics
+
+checkout_seconds = metrics.histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection, including pre-ping",
+)
+checkout_timeouts = metrics.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout seconds",
+)
+
+
+class RecentWait:
+    """
+    Exponentially weighted average of the recent checkout waits. Without checkouts
+    it decays by half every half_life seconds, so slow checkouts stop counting
+    once requests are shed and the pool is left alone.
+    """
+
+    def __init__(self, weight: float = 0.2, half_life: float = 1.0) -> None:
+        self.weight = weight
+        self.half_life = half_life
+        self._average = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            average = self._decayed(time.monotonic())
+            self._average = average + self.weight * (seconds - average)
+            self._updated = time.monotonic()
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._average = 0.0
+
+    def _decayed(self, now: float) -> float:
+        decay: float = 0.5 ** ((now - self._updated) / self.half_life)
+        return self._average * decay
+
+
+recent_checkout_wait = RecentWait()
+metrics.gauge(
+    "db_pool_checkout_recent_seconds",
+    "Average wait of the recent checkouts, decaying while there are none",
+    lambda: recent_checkout_wait.value,
+)
+
+
+def _timed_checkout(
+    connect: Callable[[], PoolProxiedConnection]
+) -> PoolProxiedConnection:
+    started = time.perf_counter()
+    try:
+        return connect()
+    except exc.TimeoutError:
+        checkout_timeouts.inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        checkout_seconds.observe(elapsed)
+        recent_checkout_wait.observe(elapsed)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool of the sync engine publishing its checkout wait time.
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        return _timed_checkout(super().connect)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool of the async engine publishing its checkout wait time.
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        return _timed_checkout(super().connect)
+
+
+def register_pool_metrics(
+    get_pool: Callable[[], Pool], replica: str | None = None
+) -> None:
+    """
+    Publish the state of the pool returned by get_pool, it is read at collection
+    time so a pool recreated by engine.dispose() is followed. The pool of a read
+    replica is published as db_replica_pool_* with the replica label.
+    """
+
+    def queue_pool() -> QueuePool | None:
+        pool = get_pool()
+        return pool if isinstance(pool, QueuePool) else None
+
+    def in_use() -> float:
+        pool = queue_pool()
+        return pool.checkedout() if pool else 0
+
+    def idle() -> float:
+        pool = queue_pool()
+        return pool.checkedin() if pool else 0
+
+    def overflow() -> float:
+        # QueuePool.overflow() starts at -pool_size, only the positive part are
+        # connections opened above pool_size
+        pool = queue_pool()
+        return max(pool.overflow(), 0) if pool else 0
+
+    def size() -> float:
+        pool = queue_pool()
+        return pool.size() if pool else 0
+
+    gauges: list[tuple[str, str, Callable[[], float]]] = [
+        ("size", "Connections kept open by the pool", size),
+        ("in_use", "Connections checked out of the pool", in_use),
+        ("idle", "Open connections waiting in the pool", idle),
+        ("overflow", "Connections opened above pool_size", overflow),
+    ]
+    for name, description, callback in gauges:
+        if replica is None:
+            metrics.gauge(f"db_pool_{name}", description, callback)
+        else:
+            metrics.labeled_gauge(
+                f"db_replica_pool_{name}", description, ("replica",)
+            ).labels(replica).callback = callback
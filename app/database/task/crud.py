@@ -1,66 +1,373 @@
-from typing import Any
-from uuid import UUID
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Sequence
+from uuid import UUID, uuid4
 
 from fastapi_pagination import Page, Params as PaginationParams
 from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import CursorResult, Row, delete, select, update
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    REAL,
+    ColumnElement,
+    Executable,
+    Row,
+    Select,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
 
-from app.api.task.models import Task, TaskCreate, TaskUpdate
-from app.database.task.models import TaskTable
+from app.api.pagination import (
+    KeysetPage,
+    KeysetParams,
+    decode_rank_cursor,
+    encode_rank_cursor,
+)
+from app.api.serialization import validate_rows
+from app.api.task.models import (
+    Task,
+    TaskCreate,
+    TaskFilters,
+    TaskSort,
+    TaskStats,
+    TaskUpdate,
+)
+from app.database.database import DbSession, UUID_ARRAY
+from app.database.pagination import keyset_paginate
+from app.database.plan import sequential_scan_rows
+from app.database.task.models import TaskStatsTable, TaskTable
+from app.database.user.models import UserTable
 
+# the version the ETag of a task is derived from
+TASK_VERSION = func.coalesce(TaskTable.updated_at, TaskTable.created_at)
+# name compared bytewise, the prefix filter and sort can use an index in any
+# database collation
+TASK_NAME = TaskTable.name.collate("C")
+TASK_SORT_KEYS: dict[str, ColumnElement[Any]] = {
+    TaskSort.CREATED_AT.value: TaskTable.created_at,
+    TaskSort.UPDATED_AT.value: TASK_VERSION,
+    TaskSort.NAME.value: TASK_NAME,
+}
+# text search configuration of the search_vector column
+SEARCH_CONFIG = "english"
 
-def create_task(task: TaskCreate, db: Session) -> TaskTable:
+
+async def create_task(task: TaskCreate, db: DbSession) -> TaskTable:
     """
     Create a new task using one of crud operations.
     """
     row = TaskTable(**task.model_dump())
     db.add(row)
-    db.commit()
+    await db.commit()
+    # load server side defaults (created_at) eagerly, lazy loads are not allowed
+    # on the async session
+    await db.refresh(row, ["created_at", "updated_at"])
     return row
 
 
-def get_task(task_id: UUID, db: Session) -> Row[tuple[TaskTable]] | None:
+async def create_tasks_bulk(
+    tasks: list[TaskCreate], db: DbSession, batch_size: int
+) -> list[TaskTable | None]:
+    """
+    Create many tasks in one transaction with multi-row INSERT ... RETURNING
+    statements of batch_size rows. The result is aligned with tasks, tasks of
+    not existing users are skipped and reported as None. The users are locked
+    FOR KEY SHARE until the commit, a concurrent delete of one of them waits
+    instead of failing the inserts on the foreign key.
+    """
+    if not tasks:
+        return []
+
+    user_ids = list({task.user_id for task in tasks})
+    existing_user_ids = set(
+        (
+            await db.execute(
+                select(UserTable.user_id)
+                .where(UserTable.user_id.in_(user_ids))
+                .with_for_update(read=True, key_share=True)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    rows = [
+        {"task_id": uuid4(), **task.model_dump()}
+        for task in tasks
+        if task.user_id in existing_user_ids
+    ]
+    created: dict[Any, TaskTable] = {}
+    for start in range(0, len(rows), batch_size):
+        query = (
+            insert(TaskTable)
+            .values(rows[start : start + batch_size])
+            .returning(TaskTable)
+        )
+        for row in (await db.execute(query)).scalars():
+            created[row.task_id] = row
+    await db.commit()
+
+    task_ids = iter(row["task_id"] for row in rows)
+    return [
+        created[next(task_ids)] if task.user_id in existing_user_ids else None
+        for task in tasks
+    ]
+
+
+async def get_task(task_id: UUID, db: DbSession) -> Row[tuple[TaskTable]] | None:
     """
     Retrieve a task by ID using one of crud operations.
     """
     query = select(TaskTable).where(TaskTable.task_id == task_id)
-    return db.execute(query).fetchone()
+    return (await db.execute(query)).fetchone()
+
+
+def filter_tasks(query: Select[Any], filters: TaskFilters) -> Select[Any]:
+    """
+    Add the predicates of filters to query, each of them can use an index of tasks.
+    """
+    if filters.user_id is not None:
+        query = query.where(TaskTable.user_id == filters.user_id)
+    if filters.created_after is not None:
+        query = query.where(TaskTable.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        query = query.where(TaskTable.created_at < filters.created_before)
+    if filters.updated_since is not None:
+        query = query.where(TASK_VERSION >= filters.updated_since)
+    if filters.name_prefix is not None:
+        escaped = re.sub(r"([\\%_])", r"\\\1", filters.name_prefix)
+        query = query.where(TASK_NAME.like(f"{escaped}%", escape="\\"))
+    return query
 
 
-def get_tasks(pagination: PaginationParams, db: Session) -> Page[Task]:
+def sort_tasks(query: Select[Any], sort: TaskSort) -> Select[Any]:
     """
-    Retrieve a list of tasks with optional pagination using one of crud operations.
+    Order query by the sort key with task_id as tie-breaker, matching the column
+    order of the index of the key.
     """
-    paginate_task: Page[Task] = paginate(db, select(TaskTable), pagination)
+    column = TASK_SORT_KEYS[sort.value.lstrip("-")]
+    if sort.value.startswith("-"):
+        return query.order_by(column.desc(), TaskTable.task_id.desc())
+    return query.order_by(column, TaskTable.task_id)
+
+
+async def get_tasks(
+    pagination: PaginationParams, db: DbSession, filters: TaskFilters | None = None
+) -> Page[Task]:
+    """
+    Retrieve a filtered and sorted list of tasks with optional pagination using one
+    of crud operations.
+    """
+    filters = filters or TaskFilters()
+    paginate_task: Page[Task] = await db.run_sync(
+        paginate,
+        sort_tasks(filter_tasks(select(TaskTable), filters), filters.sort),
+        pagination,
+        transformer=lambda rows: validate_rows(Task, rows),
+    )
     return paginate_task
 
 
-def update_task(
-    task_id: UUID, new_task: TaskUpdate, db: Session
-) -> CursorResult[int] | None:
+async def estimate_tasks_scan(
+    filters: TaskFilters, db: DbSession, min_table_rows: float
+) -> float:
     """
-    Update task information using one of crud operations.
+    Estimated rows read by a sequential scan of tasks to find the tasks matching
+    filters, 0 when they are found through indexes or the table is small.
     """
-    old_task = db.query(TaskTable).filter(TaskTable.task_id == task_id).first()
-    if old_task:
-        query = (
-            update(TaskTable)
-            .where(TaskTable.task_id == task_id)
-            .values(**new_task.model_dump(exclude_unset=True))
+    query = filter_tasks(select(TaskTable), filters)
+    return await sequential_scan_rows(query, "tasks", db, min_table_rows)
+
+
+async def get_task_stats(db: DbSession) -> TaskStats:
+    """
+    Retrieve the counters of all tasks using one of crud operations, a sum over the
+    few rows of task_stats.
+    """
+    query = select(
+        func.coalesce(func.sum(TaskStatsTable.task_count), 0).label("task_count"),
+        func.max(TaskStatsTable.last_created_at).label("last_created_at"),
+        func.max(TaskStatsTable.last_updated_at).label("last_updated_at"),
+    )
+    return TaskStats.model_validate((await db.execute(query)).one())
+
+
+async def get_tasks_keyset(params: KeysetParams, db: DbSession) -> KeysetPage[Task]:
+    """
+    Retrieve a list of tasks with keyset pagination using one of crud operations.
+    """
+    return await keyset_paginate(
+        db, select(TaskTable), TaskTable.created_at, TaskTable.task_id, params, Task
+    )
+
+
+async def search_tasks(
+    text_query: str, params: KeysetParams, db: DbSession
+) -> KeysetPage[Task]:
+    """
+    Retrieve a page of tasks matching a web search style query (words, "phrases",
+    OR, -word) ordered by relevance using one of crud operations. Matches are found
+    through the GIN index of search_vector, the next page continues after the
+    (rank, task_id) position of the cursor.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, text_query)
+    rank = func.ts_rank(TaskTable.search_vector, tsquery)
+    matches = select(TaskTable).where(TaskTable.search_vector.bool_op("@@")(tsquery))
+
+    query = matches.add_columns(rank.label("rank"))
+    if params.cursor:
+        last_rank, last_id = decode_rank_cursor(params.cursor)
+        # ts_rank is a real, comparing it with the cursor as a double would never
+        # match the rank of the last row exactly
+        query = query.where(
+            tuple_(rank, TaskTable.task_id)
+            < tuple_(
+                cast(literal(last_rank), REAL),
+                literal(last_id, TaskTable.task_id.type),
+            )
         )
-        cursor = db.execute(query)
-        db.commit()
-        return cursor
+    query = query.order_by(rank.desc(), TaskTable.task_id.desc()).limit(params.size + 1)
+    rows = (await db.execute(query)).all()
+
+    total = None
+    if params.include_total:
+        total = await db.scalar(select(func.count()).select_from(matches.subquery()))
+
+    next_cursor = None
+    if len(rows) > params.size:
+        rows = rows[: params.size]
+        next_cursor = encode_rank_cursor(rows[-1].rank, rows[-1][0].task_id)
+
+    return KeysetPage[Task](
+        items=validate_rows(Task, [row[0] for row in rows]),
+        size=params.size,
+        nextCursor=next_cursor,
+        total=total,
+    )
+
+
+async def get_tasks_by_ids(
+    task_ids: Sequence[UUID], db: DbSession
+) -> Sequence[TaskTable]:
+    """
+    Retrieve the tasks of task_ids in one query using one of crud operations, in no
+    particular order, missing tasks are left out. The IDs are bound as one array,
+    so the statement is the same for any number of them.
+    """
+    if not task_ids:
+        return []
+    query = select(TaskTable).where(
+        TaskTable.task_id == any_(bindparam("task_ids", list(task_ids), UUID_ARRAY))
+    )
+    return (await db.execute(query)).scalars().all()
+
+
+async def stream_tasks(
+    db: DbSession,
+    batch_size: int,
+    user_id: UUID | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> AsyncIterator[Sequence[TaskTable]]:
+    """
+    Stream filtered tasks in partitions of batch_size rows from a server side cursor.
+    """
+    query = select(TaskTable).order_by(TaskTable.created_at, TaskTable.task_id)
+    if user_id is not None:
+        query = query.where(TaskTable.user_id == user_id)
+    if created_after is not None:
+        query = query.where(TaskTable.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(TaskTable.created_at < created_before)
+
+    result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_task_version(task_id: UUID, db: DbSession) -> datetime | None:
+    """
+    Retrieve only the version of a task, updated_at or created_at when it was never
+    updated, using one of crud operations.
+    """
+    query = select(TASK_VERSION).where(TaskTable.task_id == task_id)
+    version: datetime | None = (await db.execute(query)).scalar_one_or_none()
+    return version
+
+
+async def update_task(
+    task_id: UUID,
+    new_task: TaskUpdate,
+    db: DbSession,
+    versions: list[datetime] | None = None,
+) -> TaskTable | None:
+    """
+    Update task information using one of crud operations. The existence check,
+    the update and reading of the new row are one UPDATE ... RETURNING statement.
+    With versions, only a task currently at one of them is updated.
+    """
+    condition = TaskTable.task_id == task_id
+    if versions is not None:
+        condition = condition & TASK_VERSION.in_(versions)
+    values = new_task.model_dump(exclude_unset=True)
+    query: Executable
+    if values:
+        query = update(TaskTable).where(condition).values(**values).returning(TaskTable)
     else:
-        return None
+        query = select(TaskTable).where(condition)
+    row: TaskTable | None = (await db.execute(query)).scalar_one_or_none()
+    await db.commit()
+    return row
 
 
-def delete_task(task_id: UUID, db: Session) -> CursorResult[Any] | None:
+async def delete_task(task_id: UUID, db: DbSession) -> UUID | None:
     """
-    Delete a task by ID using one of crud operations.
+    Delete a task by ID using one of crud operations. Returns the ID of the
+    deleted task or None when it didn't exist.
     """
-    query = delete(TaskTable).where(TaskTable.task_id == task_id)
-    cursor = db.execute(query)
-    db.commit()
-    return cursor
+    query = (
+        delete(TaskTable)
+        .where(TaskTable.task_id == task_id)
+        .returning(TaskTable.task_id)
+    )
+    deleted_id: UUID | None = (await db.execute(query)).scalar_one_or_none()
+    await db.commit()
+    return deleted_id
+
+
+async def delete_tasks(
+    db: DbSession,
+    batch_size: int,
+    user_id: UUID | None = None,
+    created_before: datetime | None = None,
+) -> AsyncIterator[Sequence[UUID]]:
+    """
+    Delete filtered tasks in chunks of batch_size rows using one of crud operations.
+    Every chunk is committed on its own, so no transaction holds row locks or
+    writes WAL for the whole set. Yields IDs of the tasks deleted by every chunk.
+    """
+    chunk = select(TaskTable.task_id).limit(batch_size)
+    if user_id is not None:
+        chunk = chunk.where(TaskTable.user_id == user_id)
+    if created_before is not None:
+        chunk = chunk.where(TaskTable.created_at < created_before)
+    query = (
+        delete(TaskTable)
+        .where(TaskTable.task_id.in_(chunk.scalar_subquery()))
+        .returning(TaskTable.task_id)
+        .execution_options(synchronize_session=False)
+    )
+
+    while True:
+        task_ids = (await db.execute(query)).scalars().all()
+        await db.commit()
+        if task_ids:
+            yield task_ids
+        if len(task_ids) < batch_size:
+            break
@@ -1,8 +1,19 @@
+from typing import Any
 from uuid import uuid4
 
-from sqlalchemy import Column, ForeignKey, String, TIMESTAMP, func
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Computed,
+    ForeignKey,
+    Index,
+    SmallInteger,
+    String,
+    TIMESTAMP,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import Mapped, deferred, relationship
 
 from app.database.database import Base
 
@@ -11,6 +22,14 @@ from app.database.database import Base
 # and that's when we process base classes.
 class TaskTable(Base):  # type: ignore
     __tablename__ = "tasks"
+    # created by app/database/migrations
+    __table_args__ = (
+        Index(
+            "ix_tasks_user_id_created_at_task_id", "user_id", "created_at", "task_id"
+        ),
+        Index("ix_tasks_created_at_task_id", "created_at", "task_id"),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     task_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True)
     name = Column(String())
@@ -20,5 +39,50 @@ class TaskTable(Base):  # type: ignore
     )
     updated_at = Column(TIMESTAMP(timezone=True), default=None, onupdate=func.now())
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"))
+    # generated by the database for full-text search, never loaded with the task
+    search_vector: Mapped[Any] = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('english', coalesce(name, '')), 'A') "
+                "|| setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        ),
+        raiseload=True,
+    )
 
     user = relationship("UserTable", back_populates="tasks")
+
+
+# expression indexes, they need the mapped columns; created by app/database/migrations
+Index(
+    "ix_tasks_version_task_id",
+    func.coalesce(TaskTable.updated_at, TaskTable.created_at),
+    TaskTable.task_id,
+)
+Index("ix_tasks_name_task_id", TaskTable.name.collate("C"), TaskTable.task_id)
+
+
+# counters maintained by the triggers of app/database/migrations/v0006_task_stats.py
+class UserTaskStatsTable(Base):  # type: ignore
+    __tablename__ = "user_task_stats"
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    task_count = Column(BigInteger, nullable=False, default=0)
+    last_created_at = Column(TIMESTAMP(timezone=True))
+    last_updated_at = Column(TIMESTAMP(timezone=True))
+
+
+class TaskStatsTable(Base):  # type: ignore
+    __tablename__ = "task_stats"
+
+    # the total is the sum of all slots
+    slot = Column(SmallInteger, primary_key=True)
+    task_count = Column(BigInteger, nullable=False, default=0)
+    last_created_at = Column(TIMESTAMP(timezone=True))
+    last_updated_at = Column(TIMESTAMP(timezone=True))
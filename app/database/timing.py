@@ -0,0 +1,79 @@
+"""
+Number of database statements and the time spent in them, summed per request. The
+middleware of app/api/metrics starts a QueryStats for every request, the engine
+events add each statement executed in the context of that request, also from the
+threadpool of ThreadedSession and the greenlets of the async engine, which both
+run in a copy of the request context.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import Engine, event
+
+QUERY_STARTED = "query_started"
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    seconds: float = 0.0
+    # executions of each statement text, the same SELECT run for every row of a
+    # result is the N+1 pattern
+    texts: Counter[str] = field(default_factory=Counter)
+
+    def most_repeated(self) -> tuple[str, int] | None:
+        repeated = self.texts.most_common(1)
+        return repeated[0] if repeated else None
+
+
+request_queries: ContextVar[QueryStats | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def time_queries(engine: Engine) -> None:
+    """
+    Add the statements executed by engine and their duration to the QueryStats of
+    the current request.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start(
+        _: Any, __: Any, statement: str, ___: Any, context: Any, *args: Any
+    ) -> None:
+        stats = request_queries.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.texts[statement] += 1
+            setattr(context, QUERY_STARTED, time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop(_: Any, __: Any, ___: str, ____: Any, context: Any, *args: Any) -> None:
+        stats = request_queries.get()
+        started = getattr(context, QUERY_STARTED, None)
+        if stats is not None and started is not None:
+            stats.seconds += time.perf_counter() - started
+
+
+@contextmanager
+def capture_statements(*engines: Engine) -> Iterator[list[str]]:
+    """
+    SQL statements executed by engines while the block runs, from any request or
+    thread, e.g. to assert the number of statements of an endpoint in tests.
+    """
+    executed: list[str] = []
+
+    def before_cursor_execute(_: Any, __: Any, statement: str, *args: Any) -> None:
+        executed.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield executed
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
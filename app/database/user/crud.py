@@ -1,76 +1,214 @@
-from typing import Any
+from datetime import datetime
+from typing import AsyncIterator, Sequence
 from uuid import UUID
 
 from fastapi_pagination import Page, Params as PaginationParams
 from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import CursorResult, Row, delete, select, update
-from sqlalchemy.orm import Session, lazyload
+from sqlalchemy import (
+    Executable,
+    Row,
+    any_,
+    bindparam,
+    delete,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.orm import selectinload
 
-from app.api.user.models import UserCreate, UserResponse, UserUpdate
+from app.api.pagination import KeysetPage, KeysetParams
+from app.api.serialization import validate_rows
+from app.api.task.models import TaskWithoutUser
+from app.api.user.models import UserCreate, UserResponse, UserTaskStats, UserUpdate
+from app.database.database import DbSession, UUID_ARRAY
+from app.database.pagination import keyset_paginate
+from app.database.task.models import TaskTable, UserTaskStatsTable
 from app.database.user.models import UserTable
 
+# the version the ETag of a user is derived from
+USER_VERSION = func.coalesce(UserTable.updated_at, UserTable.created_at)
 
-def create_user(user: UserCreate, db: Session) -> UserTable:
+
+async def create_user(user: UserCreate, password_hash: str, db: DbSession) -> UserTable:
     """
-    Create a new user using one of crud operations.
+    Create a new user with an already hashed password using one of crud operations.
     """
-    row = UserTable(
-        email=user.email,
-        username=user.username,
-        password=user.password.get_secret_value(),
-    )
+    row = UserTable(email=user.email, username=user.username, password=password_hash)
     db.add(row)
-    db.commit()
+    await db.commit()
+    # load server side defaults (created_at) eagerly, lazy loads are not allowed
+    # on the async session
+    await db.refresh(row, ["created_at", "updated_at"])
     return row
 
 
-def get_user(user_id: UUID, db: Session) -> Row[tuple[UserTable]] | None:
+async def get_user(user_id: UUID, db: DbSession) -> Row[tuple[UserTable]] | None:
     """
     Retrieve a user by ID using one of crud operations.
     """
+    query = select(UserTable).where(UserTable.user_id == user_id)
+    return (await db.execute(query)).first()
+
+
+async def get_users_by_ids(
+    user_ids: Sequence[UUID], db: DbSession
+) -> Sequence[UserTable]:
+    """
+    Retrieve the users of user_ids in one query using one of crud operations, in no
+    particular order, missing users are left out.
+    """
+    if not user_ids:
+        return []
+    query = select(UserTable).where(
+        UserTable.user_id == any_(bindparam("user_ids", list(user_ids), UUID_ARRAY))
+    )
+    return (await db.execute(query)).scalars().all()
+
+
+async def get_user_task_stats(user_id: UUID, db: DbSession) -> UserTaskStats | None:
+    """
+    Retrieve the task counters of a user using one of crud operations, a primary key
+    lookup of the user and its user_task_stats row. None when the user doesn't exist.
+    """
+    query = (
+        select(
+            UserTable.user_id,
+            func.coalesce(UserTaskStatsTable.task_count, 0).label("task_count"),
+            UserTaskStatsTable.last_created_at,
+            UserTaskStatsTable.last_updated_at,
+        )
+        .outerjoin(UserTaskStatsTable, UserTaskStatsTable.user_id == UserTable.user_id)
+        .where(UserTable.user_id == user_id)
+    )
+    row = (await db.execute(query)).first()
+    return UserTaskStats.model_validate(row) if row else None
+
+
+async def get_user_tasks(user_id: UUID, db: DbSession) -> Row[tuple[UserTable]] | None:
+    """
+    Retrieve a user by ID together with its tasks using one of crud operations.
+    """
     query = (
         select(UserTable)
-        .options(lazyload(UserTable.tasks))
+        .options(selectinload(UserTable.tasks))
         .where(UserTable.user_id == user_id)
     )
-    return db.execute(query).first()
+    return (await db.execute(query)).first()
 
 
-def get_users(pagination: PaginationParams, db: Session) -> Page[UserResponse]:
+async def get_user_tasks_keyset(
+    user_id: UUID, params: KeysetParams, db: DbSession
+) -> KeysetPage[TaskWithoutUser]:
+    """
+    Retrieve a page of user tasks with keyset pagination using one of crud operations.
+    Only the columns of TaskWithoutUser are selected, no ORM objects are built.
+    """
+    query = select(
+        TaskTable.task_id,
+        TaskTable.name,
+        TaskTable.description,
+        TaskTable.created_at,
+        TaskTable.updated_at,
+    ).where(TaskTable.user_id == user_id)
+    return await keyset_paginate(
+        db, query, TaskTable.created_at, TaskTable.task_id, params, TaskWithoutUser
+    )
+
+
+async def get_users(pagination: PaginationParams, db: DbSession) -> Page[UserResponse]:
     """
     Retrieve a list of users with optional pagination using one of crud operations.
     """
-    paginate_user: Page[UserResponse] = paginate(
-        db, select(UserTable).options(lazyload(UserTable.tasks)), pagination
+    paginate_user: Page[UserResponse] = await db.run_sync(
+        paginate,
+        select(UserTable),
+        pagination,
+        transformer=lambda rows: validate_rows(UserResponse, rows),
     )
     return paginate_user
 
 
-def update_user(
-    user_id: UUID, new_user: UserUpdate, db: Session
-) -> CursorResult[int] | None:
+async def get_users_keyset(
+    params: KeysetParams, db: DbSession
+) -> KeysetPage[UserResponse]:
     """
-    Update user information using one of crud operations.
+    Retrieve a list of users with keyset pagination using one of crud operations.
     """
-    old_user = db.query(UserTable).filter(UserTable.user_id == user_id).first()
-    if old_user:
-        query = (
-            update(UserTable)
-            .where(UserTable.user_id == user_id)
-            .values(**new_user.model_dump(exclude_unset=True))
-        )
-        cursor = db.execute(query)
-        db.commit()
-        return cursor
+    return await keyset_paginate(
+        db,
+        select(UserTable),
+        UserTable.created_at,
+        UserTable.user_id,
+        params,
+        UserResponse,
+    )
+
+
+async def stream_users(
+    db: DbSession,
+    batch_size: int,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> AsyncIterator[Sequence[UserTable]]:
+    """
+    Stream filtered users in partitions of batch_size rows from a server side cursor.
+    """
+    query = select(UserTable).order_by(UserTable.created_at, UserTable.user_id)
+    if created_after is not None:
+        query = query.where(UserTable.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(UserTable.created_at < created_before)
+
+    result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def get_user_version(user_id: UUID, db: DbSession) -> datetime | None:
+    """
+    Retrieve only the version of a user, updated_at or created_at when it was never
+    updated, using one of crud operations.
+    """
+    query = select(USER_VERSION).where(UserTable.user_id == user_id)
+    version: datetime | None = (await db.execute(query)).scalar_one_or_none()
+    return version
+
+
+async def update_user(
+    user_id: UUID,
+    new_user: UserUpdate,
+    db: DbSession,
+    versions: list[datetime] | None = None,
+) -> UserTable | None:
+    """
+    Update user information using one of crud operations. The existence check,
+    the update and reading of the new row are one UPDATE ... RETURNING statement.
+    With versions, only a user currently at one of them is updated.
+    """
+    condition = UserTable.user_id == user_id
+    if versions is not None:
+        condition = condition & USER_VERSION.in_(versions)
+    values = new_user.model_dump(exclude_unset=True)
+    query: Executable
+    if values:
+        query = update(UserTable).where(condition).values(**values).returning(UserTable)
     else:
-        return None
+        query = select(UserTable).where(condition)
+    row: UserTable | None = (await db.execute(query)).scalar_one_or_none()
+    await db.commit()
+    return row
 
 
-def delete_user(user_id: UUID, db: Session) -> CursorResult[Any] | None:
+async def delete_user(user_id: UUID, db: DbSession) -> UUID | None:
     """
-    Delete a user by ID using one of crud operations.
+    Delete a user by ID using one of crud operations. Returns the ID of the
+    deleted user or None when it didn't exist.
     """
-    query = delete(UserTable).where(UserTable.user_id == user_id)
-    cursor = db.execute(query)
-    db.commit()
-    return cursor
+    query = (
+        delete(UserTable)
+        .where(UserTable.user_id == user_id)
+        .returning(UserTable.user_id)
+    )
+    deleted_id: UUID | None = (await db.execute(query)).scalar_one_or_none()
+    await db.commit()
+    return deleted_id
@@ -1,6 +1,6 @@
 from uuid import uuid4
 
-from sqlalchemy import Column, String, TIMESTAMP, func
+from sqlalchemy import Column, Index, String, TIMESTAMP, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,8 @@ from app.database.database import Base
 # and that's when we process base classes.
 class UserTable(Base):  # type: ignore
     __tablename__ = "users"
+    # created by app/database/migrations/v0002_hot_query_indexes.py
+    __table_args__ = (Index("ix_users_created_at_user_id", "created_at", "user_id"),)
 
     user_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True)
     username = Column(String(), unique=True)
@@ -21,4 +23,6 @@ class UserTable(Base):  # type: ignore
     )
     updated_at = Column(TIMESTAMP(timezone=True), default=None, onupdate=func.now())
 
-    tasks = relationship("TaskTable", back_populates="user", lazy="selectin")
+    # tasks of a user are unbounded, they are never loaded implicitly, only through
+    # an explicit loader option or the paginated user tasks query
+    tasks = relationship("TaskTable", back_populates="user", lazy="raise")
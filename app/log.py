@@ -0,0 +1,121 @@
+"""
+Logging pipeline of the application.
+
+Records are put on a bounded in-memory queue by the calling thread and formatted
+and written by a background listener thread, so request handlers never wait for
+stderr. Records arriving while the queue is full are dropped and counted.
+SQL statements are logged through a sampling engine hook instead of echo=True.
+"""
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from sqlalchemy import Engine, event
+
+from app.config import Settings
+from app.metrics import metrics
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+sql_logger = logging.getLogger("app.sql")
+
+dropped_records = metrics.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+_listener: QueueListener | None = None
+_handler: logging.Handler | None = None
+
+
+class StderrHandler(logging.StreamHandler):  # type: ignore[type-arg]
+    """
+    StreamHandler writing to the current sys.stderr, also when it is replaced after
+    the handler was created (e.g. by pytest capturing).
+    """
+
+    def __init__(self) -> None:
+        logging.Handler.__init__(self)
+
+    @property  # type: ignore[override]
+    def stream(self) -> Any:
+        return sys.stderr
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler which never blocks and leaves formatting to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the stock prepare() formats the message on the calling thread, records
+        # are passed as they are and formatted by the listener instead
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+def configure_logging(settings: Settings) -> None:
+    """
+    Install the handler of the root logger and the levels from settings. Calling it
+    again replaces the previous configuration.
+    """
+    global _listener, _handler
+
+    stop_logging()
+
+    stream_handler = StderrHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    handler: logging.Handler = stream_handler
+    if settings.log_queue_size > 0:
+        log_queue: queue.Queue[logging.LogRecord] = queue.Queue(settings.log_queue_size)
+        handler = DroppingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    _handler = handler
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+    for name, level in settings.log_levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def stop_logging() -> None:
+    """
+    Flush queued records and remove the handler installed by configure_logging.
+    """
+    global _listener, _handler
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+def sample_sql(engine: Engine, sample_rate: float) -> None:
+    """
+    Log sample_rate of the statements executed by engine to the app.sql logger.
+    """
+    if sample_rate <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def log_statement(
+        _: Any, __: Any, statement: str, parameters: Any, *args: Any
+    ) -> None:
+        if random.random() < sample_rate and sql_logger.isEnabledFor(logging.INFO):
+            sql_logger.info("%s %r", statement, parameters)
+
+
+atexit.register(stop_logging)
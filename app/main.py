@@ -1,9 +1,34 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
+from app.api.admission import AdmissionControlMiddleware
+from app.api.metrics.middleware import RequestMetricsMiddleware
+from app.api.metrics.router import router as metrics_router
+from app.api.read_your_writes import ReadYourWritesMiddleware
 from app.api.task.router import router as task_router
 from app.api.user.router import router as user_router
-from app.database.database import Base
-from app.database.database import engine
+from app.api.user.service import password_hasher
+from app.config import get_settings
+from app.database.database import check_schema, dispose_pool, prewarm_pool
+from app.log import configure_logging
+
+configure_logging(get_settings())
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # the database is first touched here, importing the app needs no connection
+    settings = get_settings()
+    if settings.db_schema_check:
+        await check_schema()
+    if settings.db_pool_prewarm:
+        await prewarm_pool()
+    yield
+    await dispose_pool()
+    password_hasher.shutdown()
+
 
 app = FastAPI(
     title="Task Management API",
@@ -11,11 +36,13 @@ app = FastAPI(
     version="0.1.0",
     openapi_url="/openapi.json",
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(user_router)
 app.include_router(task_router)
-
-
-Base.metadata.create_all(engine)
+app.include_router(metrics_router)
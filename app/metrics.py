@@ -0,0 +1,335 @@
+import bisect
+import math
+import threading
+from typing import Any, Callable, Generic, TypeVar, cast
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Counter:
+    """
+    Monotonically increasing value, e.g. number of pool checkout timeouts.
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> float:
+        return self._value
+
+    def samples(self, labels: dict[str, str]) -> list[str]:
+        return [f"{self.name}{_labels(labels)} {_number(self.value)}"]
+
+
+class Gauge:
+    """
+    Value that goes up and down. A gauge with a callback reads the value only when
+    the metrics are collected, e.g. the number of checked out pool connections.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        callback: Callable[[], float] | None = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        if self.callback is not None:
+            return self.callback()
+        return self._value
+
+    def snapshot(self) -> float:
+        return self.value
+
+    def samples(self, labels: dict[str, str]) -> list[str]:
+        return [f"{self.name}{_labels(labels)} {_number(self.value)}"]
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets of upper bounds.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._bucket_counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            if index < len(self.buckets):
+                self._bucket_counts[index] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self._bucket_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "max": self.max,
+                "buckets": buckets,
+            }
+
+    def samples(self, labels: dict[str, str]) -> list[str]:
+        snapshot = self.snapshot()
+        lines = [
+            f"{self.name}_bucket{_labels(labels | {'le': _number(float(bound))})} "
+            f"{count}"
+            for bound, count in snapshot["buckets"].items()
+        ]
+        lines.append(
+            f"{self.name}_bucket{_labels(labels | {'le': '+Inf'})} {snapshot['count']}"
+        )
+        lines.append(f"{self.name}_sum{_labels(labels)} {_number(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+C = TypeVar("C", Counter, Gauge, Histogram)
+
+
+class LabeledMetric(Generic[C]):
+    """
+    Metrics of one name told apart by the values of labelnames, e.g. request
+    latency per route. A child metric is created on the first use of its values,
+    so the values must come from a small set (route templates, not raw paths).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...],
+        factory: Callable[[], C],
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.type_name = factory().type_name
+        self._factory: Callable[[], C] = factory
+        self._children: dict[tuple[str, ...], C] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> C:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} has labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self) -> list[tuple[dict[str, str], C]]:
+        return [
+            (dict(zip(self.labelnames, values)), child)
+            for values, child in list(self._children.items())
+        ]
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [
+            {"labels": labels, "value": child.snapshot()}
+            for labels, child in self.children()
+        ]
+
+    def samples(self, labels: dict[str, str]) -> list[str]:
+        return [
+            line
+            for child_labels, child in self.children()
+            for line in child.samples(labels | child_labels)
+        ]
+
+
+Metric = (
+    Counter
+    | Gauge
+    | Histogram
+    | LabeledMetric[Counter]
+    | LabeledMetric[Gauge]
+    | LabeledMetric[Histogram]
+)
+M = TypeVar(
+    "M",
+    Counter,
+    Gauge,
+    Histogram,
+    LabeledMetric[Counter],
+    LabeledMetric[Gauge],
+    LabeledMetric[Histogram],
+)
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of named metrics. Metrics are created once at import of
+    the module that updates them, asking again for the same name returns the same
+    metric.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter(name, description))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        callback: Callable[[], float] | None = None,
+    ) -> Gauge:
+        gauge = self._register(Gauge(name, description, callback))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, description, buckets))
+
+    def labeled_counter(
+        self, name: str, description: str, labelnames: tuple[str, ...]
+    ) -> LabeledMetric[Counter]:
+        return self._register(
+            LabeledMetric(
+                name, description, labelnames, lambda: Counter(name, description)
+            )
+        )
+
+    def labeled_gauge(
+        self, name: str, description: str, labelnames: tuple[str, ...]
+    ) -> LabeledMetric[Gauge]:
+        return self._register(
+            LabeledMetric(
+                name, description, labelnames, lambda: Gauge(name, description)
+            )
+        )
+
+    def labeled_histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> LabeledMetric[Histogram]:
+        return self._register(
+            LabeledMetric(
+                name,
+                description,
+                labelnames,
+                lambda: Histogram(name, description, buckets),
+            )
+        )
+
+    def get(self, name: str) -> Metric | None:
+        return self._metrics.get(name)
+
+    def collect(self) -> list[Metric]:
+        return list(self._metrics.values())
+
+    def snapshot(self) -> dict[str, Any]:
+        return {metric.name: metric.snapshot() for metric in self.collect()}
+
+    def exposition(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.collect():
+            description = metric.description.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples({}))
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: M) -> M:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+            if (type(existing), existing.type_name) != (
+                type(metric),
+                metric.type_name,
+            ):
+                raise ValueError(f"Metric {metric.name} is already a {type(existing)}")
+            return cast(M, existing)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,306 @@
+"""
+Production entry point. The supervisor process binds the listening socket once
+and runs worker processes serving app.main:app on it with uvicorn:
+
+- SERVER_WORKERS workers, one per available CPU by default
+- the connection pool of every worker is sized so all of them together open at
+  most SERVER_DB_CONNECTIONS database connections
+- with more than one worker the in-process cache of get_task / get_user is off
+  unless CACHE_ENABLED is set, a worker would serve entries stale by the writes
+  of the others for up to CACHE_TTL_SECONDS
+- a worker is replaced after SERVER_MAX_REQUESTS requests (plus a random part of
+  SERVER_MAX_REQUESTS_JITTER, so workers don't restart together) and when it dies;
+  it stops accepting connections first, its replacement starts right away and it
+  exits once its connections are done
+- on SIGTERM or SIGINT the workers stop accepting connections and get
+  SERVER_GRACEFUL_TIMEOUT seconds to finish the requests in flight
+
+    python -m app.server --port 8000 --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing.context import SpawnProcess
+from multiprocessing.synchronize import Event
+from types import FrameType
+
+import uvicorn
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import Settings, get_settings
+from app.log import configure_logging
+
+logger = logging.getLogger("app.server")
+
+APP = "app.main:app"
+# exit code of a worker whose lifespan startup failed, e.g. on pending migrations;
+# restarting it would fail the same way
+STARTUP_FAILURE = 3
+# seconds the supervisor waits for a draining worker beyond the graceful timeout
+KILL_MARGIN = 5.0
+
+multiprocessing.allow_connection_pickling()
+spawn = multiprocessing.get_context("spawn")
+
+
+def worker_count(workers: int) -> int:
+    if workers > 0:
+        return workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pool_sizes(settings: Settings, workers: int) -> tuple[int, int]:
+    """
+    pool_size and max_overflow of every worker, the configured ones reduced so
+    workers * (pool_size + max_overflow) <= server_db_connections.
+    """
+    per_worker = settings.server_db_connections // workers
+    if per_worker < 1:
+        raise ValueError(
+            f"{workers} workers need at least {workers} database connections, "
+            f"server_db_connections is {settings.server_db_connections}"
+        )
+    pool_size = min(settings.db_pool_size, per_worker)
+    return pool_size, min(settings.db_pool_max_overflow, per_worker - pool_size)
+
+
+class RecyclingServer(uvicorn.Server):
+    """
+    uvicorn server retiring after max_requests requests (0 never) without
+    dropping any. uvicorn's limit_max_requests exits at the next tick and closes
+    the connections it accepted meanwhile before they sent their request. Here the
+    max_requests-th request stops the worker polling the listening socket at once,
+    so new connections wait on the shared socket for the other workers; the
+    responses from then on carry Connection: close and the worker exits when its
+    last connection is closed, at the latest after timeout_graceful_shutdown.
+    draining is set when it stops accepting, for the supervisor to start the
+    replacement.
+    """
+
+    def __init__(
+        self, config: uvicorn.Config, max_requests: int, draining: Event
+    ) -> None:
+        super().__init__(config)
+        self.max_requests = max_requests
+        self.draining = draining
+        self.requests = 0
+        self.draining_since: float | None = None
+
+    async def startup(self, sockets: list[socket.socket] | None = None) -> None:
+        if self.max_requests > 0:
+            self.config.loaded_app = self.counting_app(self.config.loaded_app)
+        await super().startup(sockets=sockets)
+
+    def counting_app(self, app: ASGIApp) -> ASGIApp:
+        async def counted(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] != "http":
+                await app(scope, receive, send)
+                return
+            self.requests += 1
+            if self.requests >= self.max_requests and self.draining_since is None:
+                self.stop_accepting()
+            if self.draining_since is None:
+                await app(scope, receive, send)
+                return
+
+            async def send_closing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"connection", b"close"),
+                    ]
+                await send(message)
+
+            await app(scope, receive, send_closing)
+
+        return counted
+
+    def stop_accepting(self) -> None:
+        logger.info(
+            "Worker %s served %s requests, draining", os.getpid(), self.requests
+        )
+        # Server.close() would drop the connections accepted in this loop iteration
+        # but not attached to the server yet, they are served like the others. The
+        # listening sockets are only registered as readers by the selector event
+        # loop of asyncio, the workers run on it whatever else is installed
+        loop = asyncio.get_running_loop()
+        for server in self.servers:
+            for sock in server.sockets:
+                loop.remove_reader(sock.fileno())
+        self.draining_since = time.monotonic()
+        self.draining.set()
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.draining_since is not None:
+            timeout = self.config.timeout_graceful_shutdown
+            draining = time.monotonic() - self.draining_since
+            if not self.server_state.connections or (
+                timeout is not None and draining > timeout
+            ):
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def run_worker(
+    config: uvicorn.Config,
+    sockets: list[socket.socket],
+    env: dict[str, str],
+    max_requests: int,
+    draining: Event,
+) -> None:
+    """
+    Body of a worker process, env is applied before the app and its settings are
+    imported.
+    """
+    os.environ.update(env)
+    server = RecyclingServer(config, max_requests, draining)
+    server.run(sockets=sockets)
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+class Supervisor:
+    def __init__(self, settings: Settings, host: str, port: int, workers: int) -> None:
+        self.settings = settings
+        self.workers = workers
+        self.config = uvicorn.Config(APP, host=host, port=port)
+        pool_size, max_overflow = pool_sizes(settings, workers)
+        self.env = {
+            "DB_POOL_SIZE": str(pool_size),
+            "DB_POOL_MAX_OVERFLOW": str(max_overflow),
+        }
+        if workers > 1 and "cache_enabled" not in settings.model_fields_set:
+            self.env["CACHE_ENABLED"] = "false"
+        self.processes: list[SpawnProcess] = []
+        self.draining: dict[SpawnProcess, Event] = {}
+        # replaced workers still finishing their requests
+        self.retiring: list[SpawnProcess] = []
+        self.should_exit = threading.Event()
+        self.exit_code = 0
+
+    def run(self) -> int:
+        sock = self.config.bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_exit)
+        logger.info(
+            "Starting %s workers on %s:%s, pool_size=%s, max_overflow=%s, cache=%s",
+            self.workers,
+            self.config.host,
+            self.config.port,
+            self.env["DB_POOL_SIZE"],
+            self.env["DB_POOL_MAX_OVERFLOW"],
+            self.env.get("CACHE_ENABLED", str(self.settings.cache_enabled).lower()),
+        )
+        self.processes = [self.start_worker(sock) for _ in range(self.workers)]
+        while not self.should_exit.wait(0.5):
+            self.replace_exited(sock)
+        self.drain()
+        sock.close()
+        return self.exit_code
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        self.should_exit.set()
+
+    def start_worker(self, sock: socket.socket) -> SpawnProcess:
+        max_requests = self.settings.server_max_requests
+        if max_requests > 0:
+            max_requests += random.randint(0, self.settings.server_max_requests_jitter)
+        config = uvicorn.Config(
+            APP,
+            host=self.config.host,
+            port=self.config.port,
+            # logging is configured by the app
+            log_config=None,
+            # not uvloop, RecyclingServer.stop_accepting needs the selector loop
+            loop="asyncio",
+            timeout_graceful_shutdown=self.settings.server_graceful_timeout,
+        )
+        draining = spawn.Event()
+        process = spawn.Process(
+            target=run_worker, args=(config, [sock], self.env, max_requests, draining)
+        )
+        process.start()
+        self.draining[process] = draining
+        return process
+
+    def replace_exited(self, sock: socket.socket) -> None:
+        """
+        Start a new worker in place of every worker that exited or is draining
+        after its max requests, the draining ones are joined once they exit.
+        """
+        for process in [p for p in self.retiring if not p.is_alive()]:
+            self.retiring.remove(process)
+            del self.draining[process]
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                if self.draining[process].is_set():
+                    logger.info(
+                        "Worker %s is draining, starting a new one", process.pid
+                    )
+                    self.retiring.append(process)
+                    self.processes[index] = self.start_worker(sock)
+                continue
+            del self.draining[process]
+            if process.exitcode == STARTUP_FAILURE:
+                logger.error("Worker %s failed to start, stopping", process.pid)
+                self.exit_code = STARTUP_FAILURE
+                self.should_exit.set()
+                return
+            logger.info(
+                "Worker %s exited with %s, starting a new one",
+                process.pid,
+                process.exitcode,
+            )
+            self.processes[index] = self.start_worker(sock)
+
+    def drain(self) -> None:
+        """
+        Ask the workers to finish their requests in flight and exit, the ones still
+        running after the graceful timeout are killed.
+        """
+        processes = self.processes + self.retiring
+        logger.info("Stopping %s workers", len(processes))
+        for process in processes:
+            process.terminate()
+        deadline = (
+            time.monotonic() + self.settings.server_graceful_timeout + KILL_MARGIN
+        )
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, killing", process.pid)
+                process.kill()
+                process.join()
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API in worker processes")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.server_workers,
+        help="worker processes, 0 for one per CPU",
+    )
+    args = parser.parse_args()
+
+    configure_logging(settings)
+    supervisor = Supervisor(settings, args.host, args.port, worker_count(args.workers))
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
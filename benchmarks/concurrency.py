@@ -0,0 +1,130 @@
+"""
+Requests/sec of the task read endpoints at increasing client concurrency, for both
+the async (asyncpg) and the sync (psycopg2 in threadpool) database modes.
+
+Every mode runs in its own uvicorn process configured through the DB_ASYNC
+environment variable, the database settings are taken from the environment
+(DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_DATABASE). The entity cache is
+disabled, so every GET /tasks/{task_id} goes through the database.
+
+    python -m benchmarks.concurrency --concurrency 1 50 500 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from uuid import uuid4
+
+import httpx
+
+
+def start_server(port: int, db_async: bool) -> subprocess.Popen[bytes]:
+    env = os.environ | {"DB_ASYNC": str(db_async).lower(), "CACHE_ENABLED": "false"}
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/openapi.json").raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def seed(base_url: str) -> str:
+    suffix = uuid4().hex[:8]
+    user = httpx.post(
+        f"{base_url}/users/",
+        json={
+            "username": f"bench_{suffix}",
+            "email": f"bench_{suffix}@example.com",
+            "password": "bench_password1!",
+        },
+    ).json()
+    task = httpx.post(
+        f"{base_url}/tasks/",
+        json={"name": "bench", "description": "bench", "userId": user["userId"]},
+    ).json()
+    return str(task["taskId"])
+
+
+async def run_level(
+    base_url: str, task_id: str, concurrency: int, duration: float
+) -> tuple[float, int]:
+    paths = [f"/tasks/{task_id}", "/tasks/?size=10"]
+    deadline = time.monotonic() + duration
+    done = 0
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient, offset: int) -> None:
+        nonlocal done, errors
+        i = offset
+        while time.monotonic() < deadline:
+            i += 1
+            try:
+                response = await client.get(paths[i % len(paths)])
+            except httpx.TransportError:
+                errors += 1
+                continue
+            if response.status_code == 200:
+                done += 1
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return done / elapsed, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "app.database.migrate"], check=True)
+
+    print(f"{'mode':<6} {'clients':>8} {'req/s':>10} {'errors':>8}")
+    for db_async in (True, False):
+        process = start_server(args.port, db_async)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            task_id = seed(base_url)
+            for concurrency in args.concurrency:
+                rps, errors = asyncio.run(
+                    run_level(base_url, task_id, concurrency, args.duration)
+                )
+                mode = "async" if db_async else "sync"
+                print(
+                    f"{mode:<6} {concurrency:>8} {rps:>10.1f} {errors:>8}", flush=True
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""
+Load test of every route of the task and user routers: concurrent clients send a
+weighted random mix of requests for a fixed time and the run reports throughput,
+latency percentiles and database statements per request, overall and per
+operation.
+
+The app is served in-process through the ASGI transport (default), statements are
+counted by an engine event listener, or by a running server given with --url, e.g.
+one started by uvicorn against a local Postgres, where statements are not counted.
+The database settings are taken from the environment (DB_USER, DB_PASSWORD,
+DB_HOST, DB_PORT, DB_DATABASE).
+
+    python -m benchmarks --concurrency 1 50 --duration 10
+    python -m benchmarks --mix task.get=10 task.list=5 user.create=1
+    python -m benchmarks --output new.json --compare old.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable
+from uuid import uuid4
+
+import httpx
+
+PASSWORD = "bench_password1!"
+
+# a request of the mix: method, path and keyword arguments of httpx request()
+Request = tuple[str, str, dict[str, Any]]
+
+statement_counter: ContextVar[list[int] | None] = ContextVar(
+    "statement_counter", default=None
+)
+
+
+@dataclass
+class State:
+    """
+    IDs the operations pick their targets from. Tasks and users created during the
+    run are the ones deleted, so the seeded data stays readable: single tasks of
+    scratch_user_id one by one, bulk created tasks of bulk_user_id all at once.
+    """
+
+    rng: random.Random
+    user_ids: list[str]
+    task_ids: list[str]
+    scratch_user_id: str
+    bulk_user_id: str
+    created_task_ids: list[str] = field(default_factory=list)
+    created_user_ids: list[str] = field(default_factory=list)
+    seq: int = 0
+
+    def suffix(self) -> str:
+        self.seq += 1
+        return f"{self.seq}_{uuid4().hex[:8]}"
+
+
+def new_task(state: State, user_id: str) -> dict[str, Any]:
+    return {
+        "name": f"Bench {state.suffix()}",
+        "description": "Benchmark task description",
+        "userId": user_id,
+    }
+
+
+def new_user(state: State) -> dict[str, Any]:
+    suffix = state.suffix()
+    return {
+        "username": f"bench_{suffix}",
+        "email": f"bench_{suffix}@example.com",
+        "password": PASSWORD,
+    }
+
+
+def pop_created(ids: list[str], state: State) -> str | None:
+    return ids.pop(state.rng.randrange(len(ids))) if ids else None
+
+
+def delete_task(state: State) -> Request | None:
+    task_id = pop_created(state.created_task_ids, state)
+    return None if task_id is None else ("DELETE", f"/tasks/{task_id}", {})
+
+
+def delete_user(state: State) -> Request | None:
+    user_id = pop_created(state.created_user_ids, state)
+    return None if user_id is None else ("DELETE", f"/users/{user_id}", {})
+
+
+OPERATIONS: dict[str, Callable[[State], Request | None]] = {
+    "task.create": lambda s: (
+        "POST",
+        "/tasks/",
+        {"json": new_task(s, s.scratch_user_id)},
+    ),
+    "task.create_bulk": lambda s: (
+        "POST",
+        "/tasks/bulk",
+        {"json": [new_task(s, s.bulk_user_id) for _ in range(10)]},
+    ),
+    "task.get": lambda s: ("GET", f"/tasks/{s.rng.choice(s.task_ids)}", {}),
+    "task.batch_get": lambda s: (
+        "POST",
+        "/tasks/batch-get",
+        {"json": {"taskIds": s.rng.sample(s.task_ids, min(20, len(s.task_ids)))}},
+    ),
+    "task.list": lambda s: ("GET", "/tasks/", {"params": {"size": 10}}),
+    "task.list_by_user": lambda s: (
+        "GET",
+        "/tasks/",
+        {"params": {"size": 10, "userId": s.rng.choice(s.user_ids)}},
+    ),
+    "task.keyset": lambda s: ("GET", "/tasks/keyset", {"params": {"size": 10}}),
+    "task.stats": lambda s: ("GET", "/tasks/stats", {}),
+    "task.search": lambda s: ("GET", "/tasks/search", {"params": {"q": "seeded"}}),
+    "task.export": lambda s: (
+        "GET",
+        "/tasks/export",
+        {"params": {"userId": s.rng.choice(s.user_ids)}},
+    ),
+    "task.update": lambda s: (
+        "PUT",
+        f"/tasks/{s.rng.choice(s.task_ids)}",
+        {"json": {"description": f"Updated {s.suffix()}"}},
+    ),
+    "task.delete": delete_task,
+    "task.delete_bulk": lambda s: (
+        "DELETE",
+        "/tasks/",
+        {"params": {"userId": s.bulk_user_id}},
+    ),
+    "user.create": lambda s: ("POST", "/users/", {"json": new_user(s)}),
+    "user.get": lambda s: ("GET", f"/users/{s.rng.choice(s.user_ids)}", {}),
+    "user.batch_get": lambda s: (
+        "POST",
+        "/users/batch-get",
+        {"json": {"userIds": s.rng.sample(s.user_ids, min(20, len(s.user_ids)))}},
+    ),
+    "user.list": lambda s: ("GET", "/users/", {"params": {"size": 10}}),
+    "user.keyset": lambda s: ("GET", "/users/keyset", {"params": {"size": 10}}),
+    "user.export": lambda s: ("GET", "/users/export", {}),
+    "user.tasks": lambda s: (
+        "GET",
+        f"/users/{s.rng.choice(s.user_ids)}/tasks",
+        {"params": {"size": 10}},
+    ),
+    "user.tasks_legacy": lambda s: (
+        "GET",
+        f"/users/tasks/{s.rng.choice(s.user_ids)}",
+        {},
+    ),
+    "user.stats": lambda s: ("GET", f"/users/{s.rng.choice(s.user_ids)}/stats", {}),
+    "user.update": lambda s: (
+        "PUT",
+        f"/users/{s.rng.choice(s.user_ids)}",
+        {"json": {"email": f"bench_{s.suffix()}@example.com"}},
+    ),
+    "user.delete": delete_user,
+}
+
+# reads dominate, the expensive writes (scrypt in user.create, exports) are rare
+DEFAULT_MIX = {
+    "task.create": 5,
+    "task.create_bulk": 1,
+    "task.get": 20,
+    "task.batch_get": 3,
+    "task.list": 10,
+    "task.list_by_user": 5,
+    "task.keyset": 10,
+    "task.stats": 3,
+    "task.search": 5,
+    "task.export": 1,
+    "task.update": 5,
+    "task.delete": 3,
+    "task.delete_bulk": 1,
+    "user.create": 1,
+    "user.get": 10,
+    "user.batch_get": 1,
+    "user.list": 3,
+    "user.keyset": 3,
+    "user.export": 1,
+    "user.tasks": 5,
+    "user.tasks_legacy": 1,
+    "user.stats": 3,
+    "user.update": 2,
+    "user.delete": 1,
+}
+
+
+@dataclass
+class Sample:
+    operation: str
+    status: int
+    seconds: float
+    statements: int | None
+
+
+def parse_mix(items: list[str]) -> dict[str, int]:
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(
+                f"Unknown operation {name!r}, one of {', '.join(OPERATIONS)}"
+            )
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def count_statement(*_: Any) -> None:
+    counter = statement_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+async def seed(client: httpx.AsyncClient, users: int, tasks_per_user: int) -> State:
+    state = State(random.Random(0), [], [], "", "")
+    for _ in range(users + 2):
+        response = await client.post("/users/", json=new_user(state))
+        response.raise_for_status()
+        state.user_ids.append(response.json()["userId"])
+    state.bulk_user_id = state.user_ids.pop()
+    state.scratch_user_id = state.user_ids.pop()
+    for user_id in state.user_ids:
+        body = [
+            {
+                "name": f"Seeded {i}",
+                "description": "Seeded benchmark task",
+                "userId": user_id,
+            }
+            for i in range(tasks_per_user)
+        ]
+        response = await client.post("/tasks/bulk", json=body)
+        response.raise_for_status()
+        state.task_ids.extend(task["taskId"] for task in response.json()["created"])
+    return state
+
+
+def remember_created(state: State, sample: Sample, response_json: Any) -> None:
+    if sample.operation == "task.create":
+        state.created_task_ids.append(response_json["taskId"])
+    elif sample.operation == "user.create":
+        state.created_user_ids.append(response_json["userId"])
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    state: State,
+    mix: dict[str, int],
+    concurrency: int,
+    duration: float,
+) -> tuple[list[Sample], float]:
+    names = list(mix)
+    weights = list(mix.values())
+    deadline = time.monotonic() + duration
+    samples: list[Sample] = []
+
+    async def client_loop() -> None:
+        while time.monotonic() < deadline:
+            operation = state.rng.choices(names, weights)[0]
+            request = OPERATIONS[operation](state)
+            if request is None:
+                # nothing created yet to delete, the mix is drawn again
+                await asyncio.sleep(0)
+                continue
+            method, path, kwargs = request
+            counter = [0]
+            token = statement_counter.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                samples.append(
+                    Sample(operation, 0, time.perf_counter() - started, None)
+                )
+                continue
+            finally:
+                statement_counter.reset(token)
+            sample = Sample(
+                operation,
+                response.status_code,
+                time.perf_counter() - started,
+                counter[0],
+            )
+            samples.append(sample)
+            if response.is_success and method == "POST":
+                remember_created(state, sample, response.json())
+
+    started = time.monotonic()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return samples, time.monotonic() - started
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(
+    samples: list[Sample], elapsed: float, count_statements: bool
+) -> dict[str, Any]:
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    statuses = Counter(str(sample.status) for sample in samples)
+    errors = sum(1 for sample in samples if not 200 <= sample.status < 400)
+    statements = [s.statements for s in samples if s.statements is not None]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": len(samples) / elapsed,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies),
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1],
+        },
+        "statements_per_request": (
+            sum(statements) / len(statements)
+            if count_statements and statements
+            else None
+        ),
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+def summarize_level(
+    samples: list[Sample], elapsed: float, concurrency: int, count_statements: bool
+) -> dict[str, Any]:
+    by_operation: dict[str, list[Sample]] = {}
+    for sample in samples:
+        by_operation.setdefault(sample.operation, []).append(sample)
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "total": summarize(samples, elapsed, count_statements),
+        "operations": {
+            operation: summarize(operation_samples, elapsed, count_statements)
+            for operation, operation_samples in sorted(by_operation.items())
+        },
+    }
+
+
+def print_level(level: dict[str, Any]) -> None:
+    print(f"\nconcurrency {level['concurrency']}")
+    print(
+        f"{'operation':<20} {'requests':>9} {'errors':>7} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'stmts':>6}"
+    )
+    rows = list(level["operations"].items()) + [("total", level["total"])]
+    for operation, stats in rows:
+        latency = stats["latency_ms"]
+        statements = stats["statements_per_request"]
+        print(
+            f"{operation:<20} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{stats['rps']:>9.1f} {latency['p50']:>8.2f} {latency['p90']:>8.2f} "
+            f"{latency['p99']:>8.2f} "
+            f"{'-' if statements is None else f'{statements:.1f}':>6}",
+            flush=True,
+        )
+
+
+def print_comparison(baseline: dict[str, Any], results: dict[str, Any]) -> None:
+    """
+    req/s and p99 of the operations of both runs, levels matched by concurrency.
+    """
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        old_level = baseline_levels.get(level["concurrency"])
+        if old_level is None:
+            continue
+        print(
+            f"\nconcurrency {level['concurrency']} vs {baseline.get('revision')}\n"
+            f"{'operation':<20} {'req/s':>19} {'p99 ms':>21}"
+        )
+        new_rows = level["operations"] | {"total": level["total"]}
+        old_rows = old_level["operations"] | {"total": old_level["total"]}
+        for operation, new in new_rows.items():
+            old = old_rows.get(operation)
+            if old is None:
+                continue
+            old_p99, new_p99 = old["latency_ms"]["p99"], new["latency_ms"]["p99"]
+            print(
+                f"{operation:<20} {old['rps']:>8.1f} -> {new['rps']:>7.1f} "
+                f"{old_p99:>9.2f} -> {new_p99:>8.2f} "
+                f"({(new_p99 - old_p99) / old_p99:+.0%})"
+            )
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace, mix: dict[str, int]) -> dict[str, Any]:
+    # records of the benchmark client itself are not part of the measured requests
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    async with AsyncExitStack() as stack:
+        settings: dict[str, Any] | None = None
+        if args.url:
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport()
+            base_url = args.url
+        else:
+            from sqlalchemy import event
+
+            from app.config import get_settings
+            from app.database.database import async_engine, engine
+            from app.main import app
+
+            for sync_engine in (engine, async_engine.sync_engine):
+                event.listen(sync_engine, "before_cursor_execute", count_statement)
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+            base_url = "http://bench"
+            settings = get_settings().model_dump(
+                include={
+                    "db_async",
+                    "db_pool_size",
+                    "fast_serialization",
+                    "cache_enabled",
+                    "search_backend",
+                }
+            )
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                transport=transport,
+                base_url=base_url,
+                timeout=60,
+                limits=httpx.Limits(max_connections=max(args.concurrency)),
+            )
+        )
+        state = await seed(client, args.users, args.tasks_per_user)
+        await run_level(client, state, mix, 1, args.warmup)
+
+        levels = []
+        for concurrency in args.concurrency:
+            samples, elapsed = await run_level(
+                client, state, mix, concurrency, args.duration
+            )
+            level = summarize_level(samples, elapsed, concurrency, not args.url)
+            print_level(level)
+            levels.append(level)
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": revision(),
+        "target": args.url or "in-process",
+        "settings": settings,
+        "duration": args.duration,
+        "mix": mix,
+        "levels": levels,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds, one client")
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        metavar="OPERATION=WEIGHT",
+        help=f"operations and weights, default all of {', '.join(OPERATIONS)}",
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks-per-user", type=int, default=50)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    args = parser.parse_args()
+
+    if not args.url:
+        subprocess.run([sys.executable, "-m", "app.database.migrate"], check=True)
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    results = asyncio.run(run(args, mix))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Per-request overhead of the logging configuration, measured on GET /tasks/{task_id}
+(cache disabled) served in-process through the ASGI transport.
+
+Every mode runs in its own process with stderr redirected to a file, so the log
+records are really formatted and written:
+
+    legacy   DEBUG root level, synchronous handler, every SQL statement echoed
+             (what logging.basicConfig(DEBUG) with echo=True used to do)
+    default  INFO root level, queue handler, no SQL logging
+    sampled  like default, with 1% of SQL statements logged
+    silent   CRITICAL root level, the baseline the overhead is computed against
+
+The database settings are taken from the environment (DB_USER, DB_PASSWORD,
+DB_HOST, DB_PORT, DB_DATABASE).
+
+    python -m benchmarks.logging_overhead --requests 2000 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+MODES = {
+    "legacy": {
+        "LOG_LEVEL": "DEBUG",
+        "LOG_LEVELS": '{"sqlalchemy.engine": "INFO"}',
+        "LOG_QUEUE_SIZE": "0",
+    },
+    "default": {"LOG_LEVEL": "INFO"},
+    "sampled": {"LOG_LEVEL": "INFO", "DB_ECHO_SAMPLE_RATE": "0.01"},
+    "silent": {"LOG_LEVEL": "CRITICAL"},
+}
+
+
+async def measure(requests: int) -> float:
+    """
+    Mean seconds per request, runs inside the worker process of one mode.
+    """
+    import httpx
+
+    from app.main import app
+
+    # records of the benchmark client itself are not part of the measured overhead
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        suffix = uuid4().hex[:8]
+        user = (
+            await client.post(
+                "/users/",
+                json={
+                    "username": f"bench_{suffix}",
+                    "email": f"bench_{suffix}@example.com",
+                    "password": "bench_password1!",
+                },
+            )
+        ).json()
+        task = (
+            await client.post(
+                "/tasks/",
+                json={
+                    "name": "bench",
+                    "description": "bench",
+                    "userId": user["userId"],
+                },
+            )
+        ).json()
+        path = f"/tasks/{task['taskId']}"
+        for _ in range(min(requests, 100)):
+            await client.get(path)
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(path)).raise_for_status()
+        elapsed = time.perf_counter() - started
+
+        await client.delete(path)
+        await client.delete(f"/users/{user['userId']}")
+    return elapsed / requests
+
+
+def run_mode(mode: str, requests: int) -> tuple[float, int]:
+    env = os.environ | MODES[mode] | {"CACHE_ENABLED": "false"}
+    with tempfile.TemporaryFile() as log_file:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.logging_overhead", "--worker"]
+            + ["--requests", str(requests)],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=log_file,
+            check=True,
+        )
+        log_file.seek(0)
+        log_lines = sum(1 for _ in log_file)
+    return json.loads(result.stdout)["seconds_per_request"], log_lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        seconds = asyncio.run(measure(args.requests))
+        print(json.dumps({"seconds_per_request": seconds}))
+        return
+
+    subprocess.run([sys.executable, "-m", "app.database.migrate"], check=True)
+
+    # modes are interleaved over the rounds and the fastest round of each is kept,
+    # which filters out most of the noise of the database round-trips
+    results: dict[str, tuple[float, int]] = {}
+    for _ in range(args.rounds):
+        for mode in args.modes:
+            seconds, log_lines = run_mode(mode, args.requests)
+            if mode not in results or seconds < results[mode][0]:
+                results[mode] = (seconds, log_lines)
+    baseline = results["silent"][0] if "silent" in results else None
+
+    print(f"{'mode':<8} {'us/request':>11} {'overhead us':>12} {'log lines':>10}")
+    for mode, (seconds, log_lines) in results.items():
+        overhead = (
+            f"{(seconds - baseline) * 1e6:>12.1f}" if baseline is not None else " " * 12
+        )
+        print(f"{mode:<8} {seconds * 1e6:>11.1f} {overhead} {log_lines:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Throughput of GET /tasks/keyset of the app with FAST_SERIALIZATION off and on,
+served in-process through the ASGI transport. get_read_db opens a session
+answering every query with the same in-memory rows, so the route, the service,
+keyset_paginate and the serialization run as in production without a database:
+
+    response_model  FAST_SERIALIZATION=false, FastAPI validates the page again
+                    against response_model and encodes it with jsonable_encoder
+    fast            FAST_SERIALIZATION=true, fast_response dumps the page with
+                    pydantic-core and encodes it with orjson
+
+    python -m benchmarks.serialization --items 100 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import Result
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from app.api import serialization
+from app.database import database
+from app.database.task.models import TaskTable
+from app.main import app
+
+MODES = {"response_model": False, "fast": True}
+
+
+class RowsSession:
+    """
+    Read session whose queries all return rows, the page query of keyset_paginate
+    is the only one GET /tasks/keyset runs.
+    """
+
+    def __init__(self, rows: list[TaskTable]) -> None:
+        self.rows = rows
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Result[Any]:
+        return IteratorResult(
+            SimpleResultMetaData(["TaskTable"]), iter([(row,) for row in self.rows])
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+def task_rows(items: int) -> list[TaskTable]:
+    user_id = uuid4()
+    created_at = datetime(2023, 1, 1)
+    return [
+        TaskTable(
+            task_id=uuid4(),
+            name=f"Task {i}",
+            description="Benchmark task description",
+            user_id=user_id,
+            created_at=created_at + timedelta(seconds=i),
+            updated_at=None,
+        )
+        for i in range(items)
+    ]
+
+
+async def measure(path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for _ in range(min(requests, 100)):
+            await client.get(path)
+        started = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(path)).raise_for_status()
+        return requests / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100, help="page size, 1-100")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    session = RowsSession(task_rows(args.items))
+
+    def open_rows_session(replica: int | None = None) -> Any:
+        return session
+
+    # patched below the dependency, FastAPI resolves overridden dependencies anew
+    # on every request, which would cost more than the serialization
+    database.open_session = open_rows_session
+    path = f"/tasks/keyset?size={args.items}"
+    print(f"{'mode':<15} {'req/s':>10}")
+    results = {}
+    for mode, fast in MODES.items():
+        serialization.settings.fast_serialization = fast
+        results[mode] = asyncio.run(measure(path, args.requests))
+        print(f"{mode:<15} {results[mode]:>10.1f}", flush=True)
+    print(f"speedup {results['fast'] / results['response_model']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
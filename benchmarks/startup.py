@@ -0,0 +1,106 @@
+"""
+Startup time of a worker: the import of app.main in a fresh interpreter, and the
+time from starting a uvicorn process to the first successful GET /tasks/stats, in
+three startup modes:
+
+    default      schema check and pool prewarm in the lifespan startup
+    no-check     DB_SCHEMA_CHECK=false, pool prewarm only
+    lazy         DB_SCHEMA_CHECK=false DB_POOL_PREWARM=false, the first request
+                 opens the first connection
+
+The database settings are taken from the environment (DB_USER, DB_PASSWORD,
+DB_HOST, DB_PORT, DB_DATABASE).
+
+    python -m benchmarks.startup --rounds 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+MODES: dict[str, dict[str, str]] = {
+    "default": {},
+    "no-check": {"DB_SCHEMA_CHECK": "false"},
+    "lazy": {"DB_SCHEMA_CHECK": "false", "DB_POOL_PREWARM": "false"},
+}
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+
+def import_seconds() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        env=os.environ | {"LOG_LEVEL": "WARNING"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_request_seconds(port: int, env: dict[str, str]) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=os.environ | {"LOG_LEVEL": "WARNING"} | env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + 30
+        while time.perf_counter() < deadline:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/tasks/stats")
+                if response.status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with {process.returncode}")
+            time.sleep(0.005)
+        raise RuntimeError(f"Server on port {port} did not answer")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(values: list[float]) -> str:
+    return f"{statistics.median(values) * 1000:>10.0f} {max(values) * 1000:>10.0f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "app.database.migrate"], check=True)
+
+    print(f"{'measure':<24} {'median ms':>10} {'max ms':>10}")
+    imports = [import_seconds() for _ in range(args.rounds)]
+    print(f"{'import app.main':<24} {summary(imports)}", flush=True)
+    for mode, env in MODES.items():
+        firsts = [first_request_seconds(args.port, env) for _ in range(args.rounds)]
+        print(f"{'first request ' + mode:<24} {summary(firsts)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
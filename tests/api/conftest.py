@@ -5,9 +5,18 @@ from uuid import UUID
 import pytest
 from fastapi.testclient import TestClient
 
+from app.api.task.service import search_index, task_cache
+from app.api.user.service import user_cache
 from app.main import app
 
 
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    task_cache.clear()
+    user_cache.clear()
+    search_index.clear()
+
+
 @pytest.fixture()
 def client() -> Generator[TestClient, None, None]:
     with TestClient(app) as client:
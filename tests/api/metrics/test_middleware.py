@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime
+from typing import Any
+from uuid import uuid4
+
+import pytest
+import responses
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pytest_mock import MockFixture
+
+from app.api.metrics import middleware
+from app.api.metrics.middleware import (
+    UNMATCHED_ROUTE,
+    request_db_seconds,
+    request_seconds,
+    requests_total,
+)
+from app.api.task.models import TaskStats
+from app.api.task.service import TASK_NOT_FOUND
+from app.database.timing import request_queries
+
+
+class TestRequestMetricsMiddleware:
+    @responses.activate
+    def test_request__recorded_per_route(
+        self, mocker: MockFixture, client: TestClient, created_at: datetime
+    ) -> None:
+        mocker.patch(
+            "app.api.task.router.service.get_task_stats",
+            return_value=TaskStats.model_validate(
+                {"taskCount": 1, "lastCreatedAt": created_at}
+            ),
+        )
+        ok = requests_total.labels("GET", "/tasks/stats", "200")
+        latency = request_seconds.labels("GET", "/tasks/stats")
+        db_time = request_db_seconds.labels("GET", "/tasks/stats")
+        before = ok.value, latency.count, db_time.count
+
+        response = client.get("/tasks/stats")
+
+        assert response.status_code == 200
+        assert (ok.value, latency.count, db_time.count) == (
+            before[0] + 1,
+            before[1] + 1,
+            before[2] + 1,
+        )
+
+    @responses.activate
+    def test_request__labeled_with_route_template(
+        self, mocker: MockFixture, client: TestClient
+    ) -> None:
+        mocker.patch(
+            "app.api.task.router.service.get_task",
+            side_effect=HTTPException(*TASK_NOT_FOUND),
+        )
+        not_found = requests_total.labels("GET", "/tasks/{task_id}", "404")
+        before = not_found.value
+
+        response = client.get(f"/tasks/{uuid4()}")
+
+        assert response.status_code == 404
+        assert not_found.value == before + 1
+
+    def test_request__unmatched_route(self, client: TestClient) -> None:
+        not_found = requests_total.labels("GET", UNMATCHED_ROUTE, "404")
+        before = not_found.value
+
+        response = client.get("/no/such/path")
+
+        assert response.status_code == 404
+        assert not_found.value == before + 1
+
+    def test_request__exception_is_500(
+        self, mocker: MockFixture, client: TestClient
+    ) -> None:
+        mocker.patch("app.api.task.router.service.get_task", side_effect=RuntimeError())
+        failed = requests_total.labels("GET", "/tasks/{task_id}", "500")
+        before = failed.value
+
+        with TestClient(client.app, raise_server_exceptions=False) as raw_client:
+            response = raw_client.get(f"/tasks/{uuid4()}")
+
+        assert response.status_code == 500
+        assert failed.value == before + 1
+
+    def test_server_timing__enabled(
+        self, mocker: MockFixture, client: TestClient
+    ) -> None:
+        mocker.patch.object(middleware.settings, "server_timing", True)
+        mocker.patch(
+            "app.api.task.router.service.get_task",
+            side_effect=HTTPException(*TASK_NOT_FOUND),
+        )
+
+        response = client.get(f"/tasks/{uuid4()}")
+
+        assert response.headers["Server-Timing"].startswith("db;dur=0.00;desc=")
+        assert '"0 statements", app;dur=' in response.headers["Server-Timing"]
+
+    def test_server_timing__disabled(self, client: TestClient) -> None:
+        response = client.get("/no/such/path")
+
+        assert "Server-Timing" not in response.headers
+
+    def test_statement_budget__exceeded_logged(
+        self,
+        mocker: MockFixture,
+        client: TestClient,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        mocker.patch.object(middleware.settings, "sql_statement_budget", 2)
+
+        async def get_task_stats(_: Any) -> TaskStats:
+            queries = request_queries.get()
+            assert queries is not None
+            for _ in range(3):
+                queries.statements += 1
+                queries.texts["SELECT 1"] += 1
+            return TaskStats.model_validate({"taskCount": 0})
+
+        mocker.patch(
+            "app.api.task.router.service.get_task_stats", side_effect=get_task_stats
+        )
+        with caplog.at_level(logging.WARNING, logger=middleware.__name__):
+            client.get("/tasks/stats")
+
+        assert "statements=3, budget=2" in caplog.text
+        assert "most_repeated=3 x 'SELECT 1'" in caplog.text
@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+
+from app.database.pool import checkout_seconds
+
+
+class TestMetricsRoutes:
+    class TestGetMetrics:
+        def test_get_metrics__ok(self, client: TestClient) -> None:
+            response = client.get("/internal/metrics")
+
+            assert response.status_code == 200
+            snapshot = response.json()
+            assert (
+                snapshot["db_pool_checkout_seconds"]["count"] == checkout_seconds.count
+            )
+            assert {"db_pool_in_use", "db_pool_overflow", "db_pool_idle"} <= set(
+                snapshot
+            )
+
+    class TestGetPrometheusMetrics:
+        def test_get_prometheus_metrics__ok(self, client: TestClient) -> None:
+            client.get("/tasks/stats/unknown")
+            response = client.get("/metrics")
+
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith(
+                "text/plain; version=0.0.4"
+            )
+            lines = response.text.splitlines()
+            assert "# TYPE http_request_duration_seconds histogram" in lines
+            assert "# TYPE db_pool_checkout_seconds histogram" in lines
+            assert any(
+                line.startswith('http_requests_total{method="GET",route="unmatched"')
+                for line in lines
+            )
@@ -4,6 +4,7 @@ from uuid import UUID
 import pytest
 from fastapi_pagination import Page
 
+from app.api.pagination import KeysetPage, encode_cursor
 from app.api.task.models import BaseTask, Task, TaskCreate, TaskUpdate
 from app.database.task.models import TaskTable
 
@@ -56,6 +57,16 @@ def task_page(page: int, size: int, task: Task) -> Page[Task]:
     return Page(page=page, total=1, size=size, pages=1, items=[task])
 
 
+@pytest.fixture
+def task_keyset_page(size: int, task: Task) -> KeysetPage[Task]:
+    return KeysetPage[Task](
+        items=[task],
+        size=size,
+        nextCursor=encode_cursor(task.created_at, task.task_id),
+        total=None,
+    )
+
+
 @pytest.fixture
 def task_table(task: Task) -> TaskTable:
     return TaskTable(**task.model_dump())
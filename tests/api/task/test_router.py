@@ -1,13 +1,33 @@
+import json
+from datetime import datetime
+from unittest.mock import ANY
 from uuid import UUID
 
+import pytest
 import responses
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 from fastapi_pagination import Page
 from pytest_mock import MockFixture
 
-from app.api.task.models import BaseTask, Task, TaskCreate
-from app.api.task.service import TASK_NOT_FOUND
+from app.api import serialization
+from app.api.export import ExportFormat
+from app.api.pagination import INVALID_CURSOR, KeysetPage
+from app.api.task.models import (
+    BaseTask,
+    Task,
+    TaskBatchGetItem,
+    TaskBatchGetResponse,
+    TaskBulkCreateResponse,
+    TaskBulkDeleteResponse,
+    TaskCreate,
+    TaskSort,
+    TaskStats,
+    TaskUpdate,
+)
+from app.api.task import service
+from app.api.task.service import TASK_MODIFIED, TASK_NOT_FOUND
 
 
 class TestTaskRoutes:
@@ -52,6 +72,108 @@ class TestTaskRoutes:
             assert response.status_code == 422
             mock_create_task_service.assert_not_awaited()
 
+    class TestCreateTasksBulk:
+        @responses.activate
+        def test_create_tasks_bulk__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            task_create: TaskCreate,
+        ) -> None:
+            mock_create_tasks_bulk_service = mocker.patch(
+                "app.api.task.router.service.create_tasks_bulk",
+                return_value=TaskBulkCreateResponse(created=[task]),
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            response = client.post("/tasks/bulk", json=[raw_task])
+
+            assert response.status_code == 200
+            assert response.json()["created"][0]["taskId"] == str(task.task_id)
+            assert response.json()["errors"] == []
+            assert mock_create_tasks_bulk_service.call_args.args[0] == [raw_task]
+            mock_create_tasks_bulk_service.assert_awaited_once()
+
+        @responses.activate
+        def test_create_tasks_bulk__ndjson(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            task_create: TaskCreate,
+        ) -> None:
+            mock_create_tasks_bulk_service = mocker.patch(
+                "app.api.task.router.service.create_tasks_bulk",
+                return_value=TaskBulkCreateResponse(created=[task, task]),
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            response = client.post(
+                "/tasks/bulk",
+                content=f"{json.dumps(raw_task)}\n{json.dumps(raw_task)}\n",
+                headers={"content-type": "application/x-ndjson"},
+            )
+
+            assert response.status_code == 200
+            assert len(response.json()["created"]) == 2
+            assert mock_create_tasks_bulk_service.call_args.args[0] == [
+                raw_task,
+                raw_task,
+            ]
+            mock_create_tasks_bulk_service.assert_awaited_once()
+
+        @responses.activate
+        def test_create_tasks_bulk__ndjson_invalid_line(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            task_create: TaskCreate,
+        ) -> None:
+            mock_create_tasks_bulk_service = mocker.patch(
+                "app.api.task.router.service.create_tasks_bulk",
+                return_value=TaskBulkCreateResponse(created=[task]),
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            response = client.post(
+                "/tasks/bulk",
+                content=f'{{"name": \n{json.dumps(raw_task)}\n',
+                headers={"content-type": "application/x-ndjson"},
+            )
+
+            assert response.status_code == 200
+            items = mock_create_tasks_bulk_service.call_args.args[0]
+            assert isinstance(items[0], service.InvalidJson)
+            assert items[1] == raw_task
+
+        @responses.activate
+        def test_create_tasks_bulk__invalid_body(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_create_tasks_bulk_service = mocker.patch(
+                "app.api.task.router.service.create_tasks_bulk"
+            )
+            response = client.post("/tasks/bulk", json={"name": "Test name"})
+
+            assert response.status_code == 400
+            mock_create_tasks_bulk_service.assert_not_awaited()
+
+        @responses.activate
+        def test_create_tasks_bulk__too_many_items(
+            self, mocker: MockFixture, client: TestClient, task_create: TaskCreate
+        ) -> None:
+            mocker.patch(
+                "app.api.task.router.get_settings",
+                return_value=mocker.Mock(bulk_max_items=1),
+            )
+            mock_create_tasks_bulk_service = mocker.patch(
+                "app.api.task.router.service.create_tasks_bulk"
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            response = client.post("/tasks/bulk", json=[raw_task, raw_task])
+
+            assert response.status_code == 413
+            mock_create_tasks_bulk_service.assert_not_awaited()
+
     class TestGetTask:
         @responses.activate
         def test_get_task__ok(
@@ -87,6 +209,57 @@ class TestTaskRoutes:
             assert response.status_code == 404
             mock_get_task_service.assert_awaited_once()
 
+        @responses.activate
+        def test_get_task__etag(
+            self, mocker: MockFixture, client: TestClient, task: Task, task_id: UUID
+        ) -> None:
+            mocker.patch("app.api.task.router.service.get_task", return_value=task)
+            response = client.get(f"/tasks/{task_id}")
+
+            assert response.status_code == 200
+            assert response.headers["ETag"] == service.task_etag(task)
+
+        @responses.activate
+        def test_get_task__not_modified(
+            self, mocker: MockFixture, client: TestClient, task: Task, task_id: UUID
+        ) -> None:
+            etag = service.task_etag(task)
+            mock_get_task_etag_service = mocker.patch(
+                "app.api.task.router.service.get_task_etag", return_value=etag
+            )
+            mock_get_task_service = mocker.patch("app.api.task.router.service.get_task")
+            response = client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag})
+
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+            assert response.content == b""
+            mock_get_task_etag_service.assert_awaited_once()
+            mock_get_task_service.assert_not_awaited()
+
+        @responses.activate
+        def test_get_task__modified(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            updated_task: Task,
+            task_id: UUID,
+        ) -> None:
+            mocker.patch(
+                "app.api.task.router.service.get_task_etag",
+                return_value=service.task_etag(updated_task),
+            )
+            mocker.patch(
+                "app.api.task.router.service.get_task", return_value=updated_task
+            )
+            response = client.get(
+                f"/tasks/{task_id}", headers={"If-None-Match": service.task_etag(task)}
+            )
+
+            assert response.status_code == 200
+            assert response.headers["ETag"] == service.task_etag(updated_task)
+            assert response.json()["name"] == updated_task.name
+
     class TestGetTasksTask:
         @responses.activate
         def test_get_tasks__ok(
@@ -110,6 +283,215 @@ class TestTaskRoutes:
             assert response.json()["size"] == size
             mock_get_tasks_service.assert_awaited_once()
 
+        @responses.activate
+        def test_get_tasks__filters(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task_page: Page[Task],
+            user_id: UUID,
+        ) -> None:
+            mock_get_tasks_service = mocker.patch(
+                "app.api.task.router.service.get_tasks", return_value=task_page
+            )
+            response = client.get(
+                "/tasks/",
+                params={
+                    "userId": str(user_id),
+                    "createdAfter": "2023-01-01T00:00:00Z",
+                    "namePrefix": "Test",
+                    "sort": "-name",
+                },
+            )
+
+            assert response.status_code == 200
+            filters = mock_get_tasks_service.call_args.args[2]
+            assert filters.user_id == user_id
+            assert filters.created_after.year == 2023
+            assert filters.name_prefix == "Test"
+            assert filters.sort == TaskSort.NAME_DESC
+
+        @responses.activate
+        def test_get_tasks__unknown_sort(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_get_tasks_service = mocker.patch(
+                "app.api.task.router.service.get_tasks"
+            )
+            response = client.get("/tasks/", params={"sort": "description"})
+
+            assert response.status_code == 422
+            mock_get_tasks_service.assert_not_awaited()
+
+    class TestGetTasksBatch:
+        @responses.activate
+        def test_get_tasks_batch__ok(
+            self, mocker: MockFixture, client: TestClient, task: Task, task_id: UUID
+        ) -> None:
+            missing_id = UUID("00000000-0000-4000-8000-000000000000")
+            mock_get_tasks_batch_service = mocker.patch(
+                "app.api.task.router.service.get_tasks_batch",
+                return_value=TaskBatchGetResponse(
+                    items=[
+                        TaskBatchGetItem(taskId=task_id, found=True, task=task),
+                        TaskBatchGetItem(taskId=missing_id, found=False, task=None),
+                    ]
+                ),
+            )
+            response = client.post(
+                "/tasks/batch-get", json={"taskIds": [str(task_id), str(missing_id)]}
+            )
+
+            assert response.status_code == 200
+            items = response.json()["items"]
+            assert items[0]["taskId"] == str(task_id)
+            assert items[0]["task"]["taskId"] == str(task_id)
+            assert items[1] == {"taskId": str(missing_id), "found": False, "task": None}
+            mock_get_tasks_batch_service.assert_awaited_once_with(
+                [task_id, missing_id], ANY
+            )
+
+        @responses.activate
+        def test_get_tasks_batch__empty(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_get_tasks_batch_service = mocker.patch(
+                "app.api.task.router.service.get_tasks_batch"
+            )
+            response = client.post("/tasks/batch-get", json={"taskIds": []})
+
+            assert response.status_code == 422
+            mock_get_tasks_batch_service.assert_not_called()
+
+    class TestGetTaskStats:
+        @responses.activate
+        def test_get_task_stats__ok(
+            self, mocker: MockFixture, client: TestClient, created_at: datetime
+        ) -> None:
+            mock_get_task_stats_service = mocker.patch(
+                "app.api.task.router.service.get_task_stats",
+                return_value=TaskStats.model_validate(
+                    {"taskCount": 3, "lastCreatedAt": created_at}
+                ),
+            )
+            response = client.get("/tasks/stats")
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "taskCount": 3,
+                "lastCreatedAt": created_at.isoformat(),
+                "lastUpdatedAt": None,
+            }
+            mock_get_task_stats_service.assert_awaited_once()
+
+    class TestGetTasksKeyset:
+        @responses.activate
+        def test_get_tasks_keyset__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task_keyset_page: KeysetPage[Task],
+            task_id: UUID,
+            size: int,
+        ) -> None:
+            mock_get_tasks_keyset_service = mocker.patch(
+                "app.api.task.router.service.get_tasks_keyset",
+                return_value=task_keyset_page,
+            )
+            response = client.get("/tasks/keyset", params={"includeTotal": True})
+
+            assert response.status_code == 200
+            assert response.json()["items"][0]["taskId"] == str(task_id)
+            assert response.json()["nextCursor"] == task_keyset_page.next_cursor
+            assert response.json()["size"] == size
+            params = mock_get_tasks_keyset_service.call_args.args[0]
+            assert params.include_total is True
+            mock_get_tasks_keyset_service.assert_awaited_once()
+
+        @responses.activate
+        def test_get_tasks_keyset__invalid_cursor(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_get_tasks_keyset_service = mocker.patch(
+                "app.api.task.router.service.get_tasks_keyset",
+                side_effect=HTTPException(*INVALID_CURSOR),
+            )
+            response = client.get("/tasks/keyset", params={"cursor": "invalid"})
+
+            assert response.status_code == 400
+            mock_get_tasks_keyset_service.assert_awaited_once()
+
+    class TestSearchTasks:
+        @responses.activate
+        def test_search_tasks__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task_keyset_page: KeysetPage[Task],
+            task_id: UUID,
+        ) -> None:
+            mock_search_tasks_service = mocker.patch(
+                "app.api.task.router.service.search_tasks",
+                return_value=task_keyset_page,
+            )
+            response = client.get("/tasks/search", params={"q": "test name"})
+
+            assert response.status_code == 200
+            assert response.json()["items"][0]["taskId"] == str(task_id)
+            assert mock_search_tasks_service.call_args.args[0] == "test name"
+            mock_search_tasks_service.assert_awaited_once()
+
+        @responses.activate
+        def test_search_tasks__missing_query(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_search_tasks_service = mocker.patch(
+                "app.api.task.router.service.search_tasks"
+            )
+            response = client.get("/tasks/search", params={"q": ""})
+
+            assert response.status_code == 422
+            mock_search_tasks_service.assert_not_awaited()
+
+    class TestExportTasks:
+        @responses.activate
+        def test_export_tasks__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            user_id: UUID,
+        ) -> None:
+            mock_export_tasks_service = mocker.patch(
+                "app.api.task.router.service.export_tasks",
+                return_value=StreamingResponse(
+                    iter([task.model_dump_json(by_alias=True) + "\n"]),
+                    media_type="application/x-ndjson",
+                ),
+            )
+            response = client.get(
+                "/tasks/export",
+                params={"format": "csv", "userId": str(user_id)},
+            )
+
+            assert response.status_code == 200
+            assert json.loads(response.text)["taskId"] == str(task.task_id)
+            assert mock_export_tasks_service.call_args.args[0] == ExportFormat.CSV
+            assert mock_export_tasks_service.call_args.kwargs["user_id"] == user_id
+            mock_export_tasks_service.assert_awaited_once()
+
+        @responses.activate
+        def test_export_tasks__unprocessable_entity(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_export_tasks_service = mocker.patch(
+                "app.api.task.router.service.export_tasks"
+            )
+            response = client.get("/tasks/export", params={"format": "xml"})
+
+            assert response.status_code == 422
+            mock_export_tasks_service.assert_not_awaited()
+
     class TestUpdateTask:
         @responses.activate
         def test_update_task__ok(
@@ -176,6 +558,53 @@ class TestTaskRoutes:
             assert response.status_code == 404
             mock_update_task_service.assert_awaited_once()
 
+        @responses.activate
+        def test_update_task__if_match(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            task_id: UUID,
+            update_task: TaskUpdate,
+            updated_task: Task,
+        ) -> None:
+            mock_update_task_service = mocker.patch(
+                "app.api.task.router.service.update_task", return_value=updated_task
+            )
+            etag = service.task_etag(task)
+            response = client.put(
+                f"/tasks/{task_id}",
+                json=update_task.model_dump(by_alias=True),
+                headers={"If-Match": etag},
+            )
+
+            assert response.status_code == 200
+            assert response.headers["ETag"] == service.task_etag(updated_task)
+            mock_update_task_service.assert_awaited_once_with(
+                task_id=task_id, new_task=update_task, db=ANY, if_match=etag
+            )
+
+        @responses.activate
+        def test_update_task__precondition_failed(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            task: Task,
+            task_id: UUID,
+            update_task: TaskUpdate,
+        ) -> None:
+            mocker.patch(
+                "app.api.task.router.service.update_task",
+                side_effect=HTTPException(*TASK_MODIFIED),
+            )
+            response = client.put(
+                f"/tasks/{task_id}",
+                json=update_task.model_dump(by_alias=True),
+                headers={"If-Match": service.task_etag(task)},
+            )
+
+            assert response.status_code == 412
+
     class TestDeleteTask:
         @responses.activate
         def test_delete_task__ok(
@@ -211,3 +640,59 @@ class TestTaskRoutes:
 
             assert response.status_code == 404
             mock_update_task_service.assert_awaited_once()
+
+    class TestDeleteTasks:
+        @responses.activate
+        def test_delete_tasks__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_id: UUID,
+        ) -> None:
+            mock_delete_tasks_service = mocker.patch(
+                "app.api.task.router.service.delete_tasks",
+                return_value=TaskBulkDeleteResponse(deleted=3),
+            )
+            response = client.delete(
+                "/tasks/",
+                params={"userId": str(user_id), "createdBefore": "2023-01-01T00:00:00"},
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"deleted": 3}
+            assert mock_delete_tasks_service.call_args.kwargs["user_id"] == user_id
+            mock_delete_tasks_service.assert_awaited_once()
+
+    class TestFastSerialization:
+        @pytest.mark.parametrize(
+            "path, service_function, fixture",
+            [
+                ("/tasks/{task_id}", "get_task", "task"),
+                ("/tasks/", "get_tasks", "task_page"),
+                ("/tasks/keyset", "get_tasks_keyset", "task_keyset_page"),
+            ],
+        )
+        def test_fast_serialization__same_body(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            request: pytest.FixtureRequest,
+            task_id: UUID,
+            path: str,
+            service_function: str,
+            fixture: str,
+        ) -> None:
+            mocker.patch(
+                f"app.api.task.router.service.{service_function}",
+                return_value=request.getfixturevalue(fixture),
+            )
+            url = path.format(task_id=task_id)
+            mocker.patch.object(serialization.settings, "fast_serialization", False)
+            regular = client.get(url)
+            mocker.patch.object(serialization.settings, "fast_serialization", True)
+            fast = client.get(url)
+
+            assert fast.status_code == regular.status_code == 200
+            assert fast.headers["content-type"] == "application/json"
+            assert fast.json() == regular.json()
+            assert fast.headers.get("ETag") == regular.headers.get("ETag")
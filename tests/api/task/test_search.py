@@ -0,0 +1,113 @@
+from datetime import datetime
+from uuid import UUID, uuid4
+
+import pytest
+
+from app.api.pagination import KeysetParams
+from app.api.task.models import Task
+from app.api.task.search import TaskSearchIndex
+
+
+@pytest.fixture
+def search_tasks(user_id: UUID, created_at: datetime) -> list[Task]:
+    return [
+        Task(
+            taskId=uuid4(),
+            name=name,
+            description=description,
+            userId=user_id,
+            createdAt=created_at,
+            updatedAt=None,
+        )
+        for name, description in [
+            ("Deploy release", "Ship the build"),
+            ("Write notes", "Notes of the release"),
+            ("Release notes", "Release, release"),
+            ("Unrelated", "Something else"),
+        ]
+    ]
+
+
+@pytest.fixture
+def index(search_tasks: list[Task]) -> TaskSearchIndex:
+    index = TaskSearchIndex()
+    index.build(search_tasks)
+    return index
+
+
+class TestTaskSearchIndex:
+    def test_search__ranked(
+        self, index: TaskSearchIndex, search_tasks: list[Task]
+    ) -> None:
+        hits = index.search("RELEASE")
+
+        assert [task_id for _, task_id in hits] == [
+            search_tasks[2].task_id,
+            search_tasks[0].task_id,
+            search_tasks[1].task_id,
+        ]
+        assert [rank for rank, _ in hits] == pytest.approx([1.8, 1.0, 0.4])
+
+    def test_search__all_words(
+        self, index: TaskSearchIndex, search_tasks: list[Task]
+    ) -> None:
+        assert [task_id for _, task_id in index.search("notes release")] == [
+            search_tasks[2].task_id,
+            search_tasks[1].task_id,
+        ]
+        assert index.search("release missing") == []
+        assert index.search("  ") == []
+
+    def test_add__reindexes(
+        self, index: TaskSearchIndex, search_tasks: list[Task]
+    ) -> None:
+        changed = search_tasks[3].model_copy(update={"name": "Release party"})
+        index.add(changed)
+
+        assert changed.task_id in {task_id for _, task_id in index.search("release")}
+        assert index.search("unrelated") == []
+
+    def test_add__skipped_before_build(self, search_tasks: list[Task]) -> None:
+        index = TaskSearchIndex()
+        index.add(search_tasks[0])
+        index.build([])
+
+        assert index.search("release") == []
+
+    def test_build__keeps_changes_made_while_reading(
+        self, search_tasks: list[Task]
+    ) -> None:
+        index = TaskSearchIndex()
+        index.begin_build()
+        # written while the tasks are streamed, missing from or older in the snapshot
+        created = search_tasks[3].model_copy(update={"name": "Release party"})
+        index.add(created)
+        index.remove(search_tasks[0].task_id)
+        index.build(search_tasks)
+
+        assert [task_id for _, task_id in index.search("release")] == [
+            search_tasks[2].task_id,
+            created.task_id,
+            search_tasks[1].task_id,
+        ]
+        assert index.search("deploy") == []
+
+    def test_remove(self, index: TaskSearchIndex, search_tasks: list[Task]) -> None:
+        index.remove(search_tasks[0].task_id)
+
+        assert search_tasks[0].task_id not in {
+            task_id for _, task_id in index.search("release")
+        }
+        assert index.search("deploy") == []
+
+    def test_search_page__cursor(self, index: TaskSearchIndex) -> None:
+        first, cursor, total = index.search_page(
+            "release", KeysetParams.model_validate({"size": 2, "includeTotal": True})
+        )
+        second, last_cursor, _ = index.search_page(
+            "release", KeysetParams(size=2, cursor=cursor)
+        )
+
+        assert first + second == index.search("release")
+        assert total == 3
+        assert cursor is not None and last_cursor is None
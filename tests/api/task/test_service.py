@@ -1,19 +1,32 @@
-from uuid import UUID
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Sequence
+from uuid import UUID, uuid4
 
 import pytest
 from fastapi import HTTPException
 from fastapi_pagination import Page, Params
 from pytest_mock import MockFixture
-from sqlalchemy.orm import Session
 
+from app.api.export import ExportFormat
+from app.api.pagination import KeysetPage, KeysetParams
 from app.api.task import service
-from app.api.task.models import BaseTask, Task, TaskCreate, TaskUpdate
+from app.api.task.models import (
+    BaseTask,
+    Task,
+    TaskCreate,
+    TaskFilters,
+    TaskSort,
+    TaskStats,
+    TaskUpdate,
+)
 from app.api.task.service import (
     create_task,
     delete_task,
     get_task,
     get_tasks,
 )
+from app.database.database import DbSession
 from app.database.task.models import TaskTable
 
 
@@ -23,7 +36,7 @@ class TestTaskServices:
         async def test_create_task__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_create: TaskCreate,
             task_table: TaskTable,
             task: Task,
@@ -40,7 +53,7 @@ class TestTaskServices:
         async def test_create_task__common_exception(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_create: TaskCreate,
             task_table: TaskTable,
             task: Task,
@@ -54,12 +67,78 @@ class TestTaskServices:
             assert e.value.status_code == 500
             mock_create_task_crud.assert_called_once_with(task_create, db)
 
+    class TestCreateTasksBulk:
+        @pytest.mark.asyncio
+        async def test_create_tasks_bulk__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_create: TaskCreate,
+            task_table: TaskTable,
+            task: Task,
+        ) -> None:
+            mock_create_tasks_bulk_crud = mocker.patch(
+                "app.api.task.service.crud.create_tasks_bulk",
+                return_value=[task_table, None],
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            invalid_task = raw_task | {"name": "x"}
+            response = await service.create_tasks_bulk(
+                [raw_task, invalid_task, raw_task], db
+            )
+
+            assert response.created == [task]
+            assert [error.index for error in response.errors] == [1, 2]
+            assert response.errors[0].detail[0]["loc"] == ("name",)
+            assert response.errors[1].detail[0]["loc"] == ["userId"]
+            mock_create_tasks_bulk_crud.assert_called_once_with(
+                [task_create, task_create], db, batch_size=1000
+            )
+
+        @pytest.mark.asyncio
+        async def test_create_tasks_bulk__invalid_json(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_create: TaskCreate,
+            task_table: TaskTable,
+        ) -> None:
+            mocker.patch(
+                "app.api.task.service.crud.create_tasks_bulk",
+                return_value=[task_table],
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            response = await service.create_tasks_bulk(
+                [service.InvalidJson("Invalid JSON"), raw_task], db
+            )
+
+            assert len(response.created) == 1
+            assert [error.index for error in response.errors] == [0]
+            assert response.errors[0].detail[0]["type"] == "json_invalid"
+
+        @pytest.mark.asyncio
+        async def test_create_tasks_bulk__common_exception(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_create: TaskCreate,
+        ) -> None:
+            mock_create_tasks_bulk_crud = mocker.patch(
+                "app.api.task.service.crud.create_tasks_bulk", side_effect=Exception()
+            )
+            raw_task = task_create.model_dump(mode="json", by_alias=True)
+            with pytest.raises(HTTPException) as e:
+                await service.create_tasks_bulk([raw_task], db)
+
+            assert e.value.status_code == 500
+            mock_create_tasks_bulk_crud.assert_called_once()
+
     class TestGetTask:
         @pytest.mark.asyncio
         async def test_get_task__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task: Task,
             task_id: UUID,
             task_table: TaskTable,
@@ -77,7 +156,7 @@ class TestTaskServices:
         async def test_get_task__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task: Task,
             task_id: UUID,
             task_table: TaskTable,
@@ -91,12 +170,91 @@ class TestTaskServices:
             assert e.value.status_code == 404
             mock_get_task_crud.assert_called_once_with(task_id, db)
 
+        @pytest.mark.asyncio
+        async def test_get_task__cached(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_id: UUID,
+            task_table: TaskTable,
+        ) -> None:
+            mock_get_task_crud = mocker.patch(
+                "app.api.task.service.crud.get_task", return_value=[task_table]
+            )
+            await get_task(task_id, db)
+            retrieved_task = await get_task(task_id, db)
+
+            assert retrieved_task == task
+            assert service.task_cache.hits == 1
+            mock_get_task_crud.assert_called_once_with(task_id, db)
+
+        @pytest.mark.asyncio
+        async def test_get_task__not_found_cached(
+            self, mocker: MockFixture, db: DbSession, task_id: UUID
+        ) -> None:
+            mock_get_task_crud = mocker.patch(
+                "app.api.task.service.crud.get_task", return_value=None
+            )
+            for _ in range(2):
+                with pytest.raises(HTTPException) as e:
+                    await get_task(task_id, db)
+                assert e.value.status_code == 404
+
+            mock_get_task_crud.assert_called_once_with(task_id, db)
+
+    class TestGetTaskEtag:
+        @pytest.mark.asyncio
+        async def test_get_task_etag__ok(
+            self, mocker: MockFixture, db: DbSession, task: Task
+        ) -> None:
+            mock_get_task_version = mocker.patch(
+                "app.api.task.service.crud.get_task_version",
+                return_value=task.created_at,
+            )
+            mock_get_task = mocker.patch("app.api.task.service.crud.get_task")
+            etag = await service.get_task_etag(task.task_id, db)
+
+            assert etag == service.task_etag(task)
+            mock_get_task_version.assert_called_once_with(task.task_id, db)
+            mock_get_task.assert_not_called()
+
+        @pytest.mark.asyncio
+        async def test_get_task_etag__not_found(
+            self, mocker: MockFixture, db: DbSession, task_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.task.service.crud.get_task_version", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.get_task_etag(task_id, db)
+
+            assert e.value.status_code == 404
+
+        @pytest.mark.asyncio
+        async def test_get_task_etag__drops_outdated_cache(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_table: TaskTable,
+            updated_task: Task,
+        ) -> None:
+            service.task_cache.set(task.task_id, task)
+            mocker.patch(
+                "app.api.task.service.crud.get_task_version",
+                return_value=updated_task.updated_at,
+            )
+            await service.get_task_etag(task.task_id, db)
+
+            assert service.task_cache.get(task.task_id) == (False, None)
+
     class TestGetTasksTask:
         @pytest.mark.asyncio
         async def test_get_tasks__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_page: Page[Task],
             task_id: UUID,
             size: int,
@@ -109,38 +267,324 @@ class TestTaskServices:
 
             assert retrieved_tasks.items[0].task_id == task_id
             assert retrieved_tasks.size == size
-            mock_get_tasks_crud.assert_called_once_with(pagination, db)
+            mock_get_tasks_crud.assert_called_once_with(pagination, db, TaskFilters())
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__filters(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_page: Page[Task],
+            user_id: UUID,
+        ) -> None:
+            mock_estimate_tasks_scan_crud = mocker.patch(
+                "app.api.task.service.crud.estimate_tasks_scan", return_value=0.0
+            )
+            mock_get_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks", return_value=task_page
+            )
+            pagination = Params()
+            filters = TaskFilters(user_id=user_id, sort=TaskSort.NAME_DESC)
+            retrieved_tasks = await get_tasks(pagination, db, filters)
+
+            assert retrieved_tasks == task_page
+            mock_estimate_tasks_scan_crud.assert_called_once_with(
+                filters, db, min_table_rows=100_000
+            )
+            mock_get_tasks_crud.assert_called_once_with(pagination, db, filters)
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__not_selective(
+            self, mocker: MockFixture, db: DbSession, created_at: datetime
+        ) -> None:
+            mocker.patch(
+                "app.api.task.service.crud.estimate_tasks_scan", return_value=250_000.0
+            )
+            mock_get_tasks_crud = mocker.patch("app.api.task.service.crud.get_tasks")
+            filters = TaskFilters(created_after=created_at)
+            with pytest.raises(HTTPException) as e:
+                await get_tasks(Params(), db, filters)
+
+            assert e.value.status_code == 400
+            assert "250000" in e.value.detail
+            mock_get_tasks_crud.assert_not_called()
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__sort_only_not_estimated(
+            self, mocker: MockFixture, db: DbSession, task_page: Page[Task]
+        ) -> None:
+            mock_estimate_tasks_scan_crud = mocker.patch(
+                "app.api.task.service.crud.estimate_tasks_scan"
+            )
+            mocker.patch("app.api.task.service.crud.get_tasks", return_value=task_page)
+            await get_tasks(Params(), db, TaskFilters(sort=TaskSort.UPDATED_AT))
+
+            mock_estimate_tasks_scan_crud.assert_not_called()
+
+    class TestGetTasksBatch:
+        @pytest.mark.asyncio
+        async def test_get_tasks_batch__request_order(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_id: UUID,
+            task_table: TaskTable,
+        ) -> None:
+            missing_id = uuid4()
+            mock_get_tasks_by_ids_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_by_ids",
+                return_value=[task_table],
+            )
+            response = await service.get_tasks_batch(
+                [missing_id, task_id, missing_id], db
+            )
+
+            assert [item.task_id for item in response.items] == [
+                missing_id,
+                task_id,
+                missing_id,
+            ]
+            assert [item.found for item in response.items] == [False, True, False]
+            assert response.items[0].task is None
+            assert response.items[1].task == task
+            mock_get_tasks_by_ids_crud.assert_called_once_with(
+                [missing_id, task_id], db
+            )
+
+        @pytest.mark.asyncio
+        async def test_get_tasks_batch__cached(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_id: UUID,
+            task_table: TaskTable,
+        ) -> None:
+            mock_get_tasks_by_ids_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_by_ids",
+                return_value=[task_table],
+            )
+            await service.get_tasks_batch([task_id], db)
+            response = await service.get_tasks_batch([task_id], db)
+
+            assert response.items[0].task == task
+            assert service.task_cache.hits == 1
+            mock_get_tasks_by_ids_crud.assert_called_once_with([task_id], db)
+
+        @pytest.mark.asyncio
+        async def test_get_tasks_batch__too_many_ids(
+            self, mocker: MockFixture, db: DbSession
+        ) -> None:
+            mocker.patch.object(service.settings, "batch_get_max_ids", 2)
+            mock_get_tasks_by_ids_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_by_ids"
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.get_tasks_batch([uuid4() for _ in range(3)], db)
+
+            assert e.value.status_code == 413
+            mock_get_tasks_by_ids_crud.assert_not_called()
+
+    class TestGetTaskStats:
+        @pytest.mark.asyncio
+        async def test_get_task_stats__ok(
+            self, mocker: MockFixture, db: DbSession, created_at: datetime
+        ) -> None:
+            stats = TaskStats.model_validate(
+                {"taskCount": 3, "lastCreatedAt": created_at}
+            )
+            mock_get_task_stats_crud = mocker.patch(
+                "app.api.task.service.crud.get_task_stats", return_value=stats
+            )
+
+            assert await service.get_task_stats(db) == stats
+            mock_get_task_stats_crud.assert_called_once_with(db)
+
+    class TestGetTasksKeyset:
+        @pytest.mark.asyncio
+        async def test_get_tasks_keyset__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_keyset_page: KeysetPage[Task],
+            task_id: UUID,
+        ) -> None:
+            mock_get_tasks_keyset_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_keyset",
+                return_value=task_keyset_page,
+            )
+            params = KeysetParams()
+            retrieved_tasks = await service.get_tasks_keyset(params, db)
+
+            assert retrieved_tasks.items[0].task_id == task_id
+            assert retrieved_tasks.next_cursor == task_keyset_page.next_cursor
+            mock_get_tasks_keyset_crud.assert_called_once_with(params, db)
+
+        @pytest.mark.asyncio
+        async def test_get_tasks_keyset__invalid_cursor(
+            self, mocker: MockFixture, db: DbSession
+        ) -> None:
+            mock_get_tasks_keyset_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_keyset", side_effect=ValueError()
+            )
+            params = KeysetParams(cursor="invalid")
+            with pytest.raises(HTTPException) as e:
+                await service.get_tasks_keyset(params, db)
+
+            assert e.value.status_code == 400
+            mock_get_tasks_keyset_crud.assert_called_once_with(params, db)
+
+    class TestSearchTasks:
+        @pytest.mark.asyncio
+        async def test_search_tasks__postgres(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_keyset_page: KeysetPage[Task],
+        ) -> None:
+            mock_search_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.search_tasks",
+                return_value=task_keyset_page,
+            )
+            params = KeysetParams()
+            retrieved_tasks = await service.search_tasks("test", params, db)
+
+            assert retrieved_tasks == task_keyset_page
+            mock_search_tasks_crud.assert_called_once_with("test", params, db)
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__invalid_cursor(
+            self, mocker: MockFixture, db: DbSession
+        ) -> None:
+            mocker.patch(
+                "app.api.task.service.crud.search_tasks", side_effect=ValueError()
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.search_tasks("test", KeysetParams(cursor="x"), db)
+
+            assert e.value.status_code == 400
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__memory(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_table: TaskTable,
+        ) -> None:
+            async def partitions(*_: Any, **__: Any) -> AsyncIterator[Sequence[Any]]:
+                yield [task_table]
+
+            mocker.patch.object(service.settings, "search_backend", "memory")
+            mock_stream_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.stream_tasks", side_effect=partitions
+            )
+            mock_get_tasks_by_ids_crud = mocker.patch(
+                "app.api.task.service.crud.get_tasks_by_ids", return_value=[task_table]
+            )
+            mock_search_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.search_tasks"
+            )
+            found = await service.search_tasks("test NAME", KeysetParams(), db)
+            not_found = await service.search_tasks("missing", KeysetParams(), db)
+
+            assert found.items == [task]
+            mock_get_tasks_by_ids_crud.assert_any_call([task.task_id], db)
+            assert not_found.items == []
+            mock_stream_tasks_crud.assert_called_once()
+            mock_search_tasks_crud.assert_not_called()
+
+    class TestExportTasks:
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize(
+            "export_format, lines",
+            [(ExportFormat.NDJSON, 2), (ExportFormat.CSV, 3)],
+        )
+        async def test_export_tasks__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_table: TaskTable,
+            user_id: UUID,
+            export_format: ExportFormat,
+            lines: int,
+        ) -> None:
+            async def partitions(*_: Any, **__: Any) -> AsyncIterator[Sequence[Any]]:
+                yield [task_table]
+                yield [task_table]
+
+            mock_stream_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.stream_tasks", side_effect=partitions
+            )
+            response = await service.export_tasks(export_format, db, user_id=user_id)
+            body = "".join([str(chunk) async for chunk in response.body_iterator])
+
+            assert len(body.splitlines()) == lines
+            assert str(task.task_id) in body.splitlines()[-1]
+            if export_format == ExportFormat.NDJSON:
+                assert json.loads(body.splitlines()[0]) == task.model_dump(
+                    mode="json", by_alias=True
+                )
+            mock_stream_tasks_crud.assert_called_once_with(
+                db,
+                batch_size=1000,
+                user_id=user_id,
+                created_after=None,
+                created_before=None,
+            )
 
     class TestUpdateTask:
         @pytest.mark.asyncio
         async def test_update_task__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_id: UUID,
             update_task: TaskUpdate,
             updated_task: Task,
         ) -> None:
             mock_update_task_crud = mocker.patch(
-                "app.api.task.service.crud.update_task", return_value=1
-            )
-            mock_get_task = mocker.patch(
-                "app.api.task.service.crud.get_task",
-                return_value=[TaskTable(**updated_task.model_dump())],
+                "app.api.task.service.crud.update_task",
+                return_value=TaskTable(**updated_task.model_dump()),
             )
+            mock_get_task = mocker.patch("app.api.task.service.crud.get_task")
             updated_task_service = await service.update_task(task_id, update_task, db)
 
             assert updated_task_service == updated_task
             mock_update_task_crud.assert_called_once_with(
-                task_id=task_id, new_task=update_task, db=db
+                task_id=task_id, new_task=update_task, db=db, versions=None
+            )
+            mock_get_task.assert_not_called()
+
+        @pytest.mark.asyncio
+        async def test_update_task__invalidates_cache(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            task_id: UUID,
+            update_task: TaskUpdate,
+            updated_task: Task,
+        ) -> None:
+            service.task_cache.set(task_id, task)
+            mocker.patch(
+                "app.api.task.service.crud.update_task",
+                return_value=TaskTable(**updated_task.model_dump()),
             )
-            mock_get_task.assert_called_once_with(task_id, db)
+            mock_get_task = mocker.patch("app.api.task.service.crud.get_task")
+            updated_task_service = await service.update_task(task_id, update_task, db)
+
+            assert updated_task_service == updated_task
+            assert await get_task(task_id, db) == updated_task
+            mock_get_task.assert_not_called()
 
         @pytest.mark.asyncio
         async def test_update_task__common_exception(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_id: UUID,
             update_task: TaskUpdate,
         ) -> None:
@@ -152,27 +596,111 @@ class TestTaskServices:
 
             assert e.value.status_code == 500
             mock_update_task_crud.assert_called_once_with(
-                task_id=task_id, new_task=update_task, db=db
+                task_id=task_id, new_task=update_task, db=db, versions=None
             )
 
         @pytest.mark.asyncio
         async def test_update_task__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             update_task: BaseTask,
             task_id: UUID,
         ) -> None:
             mock_update_task_crud = mocker.patch(
                 "app.api.task.service.crud.update_task",
-                return_value=0,
+                return_value=None,
             )
             with pytest.raises(HTTPException) as e:
                 await service.update_task(task_id, update_task, db)
 
             assert e.value.status_code == 404
             mock_update_task_crud.assert_called_once_with(
-                task_id=task_id, new_task=update_task, db=db
+                task_id=task_id, new_task=update_task, db=db, versions=None
+            )
+
+        @pytest.mark.asyncio
+        async def test_update_task__if_match(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            update_task: TaskUpdate,
+            updated_task: Task,
+        ) -> None:
+            mock_update_task_crud = mocker.patch(
+                "app.api.task.service.crud.update_task",
+                return_value=TaskTable(**updated_task.model_dump()),
+            )
+            if_match = service.task_etag(task)
+            updated_task_service = await service.update_task(
+                task.task_id, update_task, db, if_match=if_match
+            )
+
+            assert updated_task_service == updated_task
+            mock_update_task_crud.assert_called_once_with(
+                task_id=task.task_id,
+                new_task=update_task,
+                db=db,
+                versions=[task.created_at.replace(tzinfo=timezone.utc)],
+            )
+
+        @pytest.mark.asyncio
+        async def test_update_task__precondition_failed(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            update_task: TaskUpdate,
+        ) -> None:
+            mocker.patch("app.api.task.service.crud.update_task", return_value=None)
+            mocker.patch(
+                "app.api.task.service.crud.get_task_version",
+                return_value=task.created_at + timedelta(days=1),
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.update_task(
+                    task.task_id, update_task, db, if_match=service.task_etag(task)
+                )
+
+            assert e.value.status_code == 412
+
+        @pytest.mark.asyncio
+        async def test_update_task__if_match_not_found(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task: Task,
+            update_task: TaskUpdate,
+        ) -> None:
+            mocker.patch("app.api.task.service.crud.update_task", return_value=None)
+            mocker.patch(
+                "app.api.task.service.crud.get_task_version", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.update_task(
+                    task.task_id, update_task, db, if_match=service.task_etag(task)
+                )
+
+            assert e.value.status_code == 404
+
+        @pytest.mark.asyncio
+        async def test_update_task__if_match_any_not_found(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            update_task: TaskUpdate,
+            task_id: UUID,
+        ) -> None:
+            mock_update_task_crud = mocker.patch(
+                "app.api.task.service.crud.update_task", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.update_task(task_id, update_task, db, if_match="*")
+
+            assert e.value.status_code == 412
+            mock_update_task_crud.assert_called_once_with(
+                task_id=task_id, new_task=update_task, db=db, versions=None
             )
 
     class TestDeleteTask:
@@ -180,33 +708,43 @@ class TestTaskServices:
         async def test_delete_task__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_id: UUID,
-            task_table: TaskTable,
         ) -> None:
-            mock_get_task_crud = mocker.patch(
-                "app.api.task.service.crud.get_task", return_value=[task_table]
-            )
+            mock_get_task_crud = mocker.patch("app.api.task.service.crud.get_task")
             mock_delete_task_crud = mocker.patch(
                 "app.api.task.service.crud.delete_task", return_value=task_id
             )
             deleted_task_id = await delete_task(task_id, db)
 
             assert deleted_task_id == task_id
-            mock_get_task_crud.assert_called_once_with(task_id, db)
+            mock_get_task_crud.assert_not_called()
             mock_delete_task_crud.assert_called_once_with(task_id, db)
 
         @pytest.mark.asyncio
-        async def test_delete_task__common_exception(
+        async def test_delete_task__invalidates_cache(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_id: UUID,
             task_table: TaskTable,
         ) -> None:
-            mock_get_task_crud = mocker.patch(
+            mocker.patch(
                 "app.api.task.service.crud.get_task", return_value=[task_table]
             )
+            await get_task(task_id, db)
+            mocker.patch("app.api.task.service.crud.delete_task", return_value=task_id)
+            await delete_task(task_id, db)
+
+            assert service.task_cache.get(task_id) == (False, None)
+
+        @pytest.mark.asyncio
+        async def test_delete_task__common_exception(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_id: UUID,
+        ) -> None:
             mock_delete_task_crud = mocker.patch(
                 "app.api.task.service.crud.delete_task", side_effect=Exception
             )
@@ -214,26 +752,61 @@ class TestTaskServices:
                 await delete_task(task_id, db)
 
             assert e.value.status_code == 500
-            mock_get_task_crud.assert_called_once_with(task_id, db)
             mock_delete_task_crud.assert_called_once_with(task_id, db)
 
         @pytest.mark.asyncio
         async def test_delete_task__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             task_id: UUID,
-            task_table: TaskTable,
         ) -> None:
-            mock_get_task_crud = mocker.patch(
-                "app.api.task.service.crud.get_task", return_value=[]
-            )
             mock_delete_task_crud = mocker.patch(
-                "app.api.task.service.crud.delete_task"
+                "app.api.task.service.crud.delete_task", return_value=None
             )
             with pytest.raises(HTTPException) as e:
                 await delete_task(task_id, db)
 
             assert e.value.status_code == 404
-            mock_get_task_crud.assert_called_once_with(task_id, db)
-            mock_delete_task_crud.assert_not_called()
+            mock_delete_task_crud.assert_called_once_with(task_id, db)
+
+    class TestDeleteTasks:
+        @pytest.mark.asyncio
+        async def test_delete_tasks__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            task_id: UUID,
+            task: Task,
+            user_id: UUID,
+        ) -> None:
+            other_task_id = uuid4()
+
+            async def chunks(*_: Any, **__: Any) -> AsyncIterator[Sequence[UUID]]:
+                yield [task_id]
+                yield [other_task_id]
+
+            service.task_cache.set(task_id, task)
+            mock_delete_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.delete_tasks", side_effect=chunks
+            )
+            response = await service.delete_tasks(db, user_id=user_id)
+
+            assert response.deleted == 2
+            assert service.task_cache.get(task_id) == (False, None)
+            mock_delete_tasks_crud.assert_called_once_with(
+                db, batch_size=1000, user_id=user_id, created_before=None
+            )
+
+        @pytest.mark.asyncio
+        async def test_delete_tasks__missing_filter(
+            self, mocker: MockFixture, db: DbSession
+        ) -> None:
+            mock_delete_tasks_crud = mocker.patch(
+                "app.api.task.service.crud.delete_tasks"
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.delete_tasks(db)
+
+            assert e.value.status_code == 400
+            mock_delete_tasks_crud.assert_not_called()
@@ -0,0 +1,222 @@
+import asyncio
+from datetime import datetime
+from typing import Generator
+from uuid import uuid4
+
+import pytest
+import responses
+from fastapi.testclient import TestClient
+from pytest_mock import MockFixture
+
+from app.api import admission
+from app.api.admission import (
+    OVERLOADED,
+    ConcurrencyLimit,
+    rejected_total,
+    request_class,
+)
+from app.api.task.models import TaskStats
+from app.database.pool import recent_checkout_wait
+from app.metrics import metrics
+
+
+@pytest.fixture
+def full(mocker: MockFixture) -> dict[str, ConcurrencyLimit]:
+    """
+    Read budget used up with an empty queue of one, writes still admitted.
+    """
+    limits = {"read": ConcurrencyLimit(0, 1), "write": ConcurrencyLimit(1, 1)}
+    mocker.patch.object(admission, "limits", limits)
+    mocker.patch.object(admission.settings, "admission_queue_timeout", 0.01)
+    return limits
+
+
+@pytest.fixture
+def slow_pool() -> Generator[None, None, None]:
+    recent_checkout_wait.observe(100.0)
+    yield
+    recent_checkout_wait.reset()
+
+
+class TestConcurrencyLimit:
+    @pytest.mark.asyncio
+    async def test_acquire__up_to_limit(self) -> None:
+        limit = ConcurrencyLimit(2, 0)
+
+        assert await limit.acquire(0.01)
+        assert await limit.acquire(0.01)
+        assert not await limit.acquire(0.01)
+        assert limit.active == 2
+
+    @pytest.mark.asyncio
+    async def test_release__hands_slot_to_first_waiter(self) -> None:
+        limit = ConcurrencyLimit(1, 2)
+        await limit.acquire(1.0)
+        first = asyncio.create_task(limit.acquire(1.0))
+        second = asyncio.create_task(limit.acquire(1.0))
+        await asyncio.sleep(0)
+        assert limit.waiting == 2
+
+        limit.release()
+
+        assert await first
+        assert limit.active == 1
+        assert limit.waiting == 1
+        assert not limit.try_acquire()
+        limit.release()
+        assert await second
+        limit.release()
+        assert limit.active == 0
+
+    @pytest.mark.asyncio
+    async def test_acquire__timeout_leaves_queue(self) -> None:
+        limit = ConcurrencyLimit(1, 1)
+        await limit.acquire(1.0)
+
+        assert not await limit.acquire(0.01)
+        assert limit.waiting == 0
+        limit.release()
+        assert limit.active == 0
+
+    @pytest.mark.asyncio
+    async def test_acquire__cancelled_waiter(self) -> None:
+        limit = ConcurrencyLimit(1, 1)
+        await limit.acquire(1.0)
+        waiter = asyncio.create_task(limit.acquire(1.0))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert limit.waiting == 0
+        limit.release()
+        assert limit.active == 0
+
+
+class TestRequestClass:
+    @pytest.mark.parametrize(
+        "method, path, expected",
+        [
+            ("GET", "/tasks/", "read"),
+            ("POST", "/tasks/", "write"),
+            ("DELETE", "/users/1", "write"),
+            ("POST", "/tasks/batch-get", "read"),
+        ],
+    )
+    def test_request_class(self, method: str, path: str, expected: str) -> None:
+        assert request_class({"method": method, "path": path}) == expected
+
+
+class TestAdmissionControlMiddleware:
+    @responses.activate
+    def test_request__admitted(
+        self, mocker: MockFixture, client: TestClient, created_at: datetime
+    ) -> None:
+        mocker.patch(
+            "app.api.task.router.service.get_task_stats",
+            return_value=TaskStats.model_validate(
+                {"taskCount": 1, "lastCreatedAt": created_at}
+            ),
+        )
+
+        response = client.get("/tasks/stats")
+
+        assert response.status_code == 200
+        assert admission.limits["read"].active == 0
+
+    @responses.activate
+    def test_read__queue_timeout(
+        self, mocker: MockFixture, client: TestClient, full: dict[str, ConcurrencyLimit]
+    ) -> None:
+        mock_get_task_stats_service = mocker.patch(
+            "app.api.task.router.service.get_task_stats"
+        )
+        rejected = rejected_total.labels("read", "queue_timeout")
+        before = rejected.value
+
+        response = client.get("/tasks/stats")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.json() == {"detail": OVERLOADED}
+        assert rejected.value == before + 1
+        mock_get_task_stats_service.assert_not_called()
+
+    @responses.activate
+    def test_read__queue_full(
+        self, mocker: MockFixture, client: TestClient, full: dict[str, ConcurrencyLimit]
+    ) -> None:
+        full["read"].max_queue = 0
+        rejected = rejected_total.labels("read", "queue_full")
+        before = rejected.value
+
+        response = client.get("/tasks/stats")
+
+        assert response.status_code == 503
+        assert rejected.value == before + 1
+
+    @responses.activate
+    def test_read__slow_pool_not_queued(
+        self,
+        client: TestClient,
+        full: dict[str, ConcurrencyLimit],
+        slow_pool: None,
+    ) -> None:
+        rejected = rejected_total.labels("read", "pool_wait")
+        before = rejected.value
+
+        response = client.get("/tasks/stats")
+
+        assert response.status_code == 503
+        assert rejected.value == before + 1
+
+    @responses.activate
+    def test_write__own_budget(
+        self,
+        mocker: MockFixture,
+        client: TestClient,
+        full: dict[str, ConcurrencyLimit],
+    ) -> None:
+        task_id = uuid4()
+        mocker.patch("app.api.task.router.service.delete_task", return_value=task_id)
+
+        response = client.delete(f"/tasks/{task_id}")
+
+        assert response.status_code == 200
+        assert full["write"].active == 0
+
+    @responses.activate
+    def test_metrics__exempt(
+        self, client: TestClient, full: dict[str, ConcurrencyLimit]
+    ) -> None:
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert 'admission_in_flight{class="read"}' in response.text
+
+    @responses.activate
+    def test_disabled(
+        self,
+        mocker: MockFixture,
+        client: TestClient,
+        full: dict[str, ConcurrencyLimit],
+        created_at: datetime,
+    ) -> None:
+        mocker.patch.object(admission.settings, "admission_control", False)
+        mocker.patch(
+            "app.api.task.router.service.get_task_stats",
+            return_value=TaskStats.model_validate(
+                {"taskCount": 1, "lastCreatedAt": created_at}
+            ),
+        )
+
+        assert client.get("/tasks/stats").status_code == 200
+
+    def test_metrics__in_flight_and_queued(self) -> None:
+        snapshot = metrics.snapshot()
+
+        assert {"labels": {"class": "write"}, "value": 0} in snapshot[
+            "admission_in_flight"
+        ]
+        assert {"labels": {"class": "read"}, "value": 0} in snapshot["admission_queued"]
@@ -0,0 +1,61 @@
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from pytest_mock import MockFixture
+
+from app.api.cache import EntityCache
+
+
+class TestEntityCache:
+    def test_cache__hit_and_miss(self, user_id: UUID, created_at: datetime) -> None:
+        cache: EntityCache[datetime] = EntityCache(10, ttl=60, not_found_ttl=5)
+
+        assert cache.get(user_id) == (False, None)
+        cache.set(user_id, created_at)
+
+        assert cache.get(user_id) == (True, created_at)
+        assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+    def test_cache__not_found(self, user_id: UUID) -> None:
+        cache: EntityCache[datetime] = EntityCache(10, ttl=60, not_found_ttl=5)
+        cache.set_not_found(user_id)
+
+        assert cache.get(user_id) == (True, None)
+
+    def test_cache__expired(
+        self, mocker: MockFixture, user_id: UUID, created_at: datetime
+    ) -> None:
+        cache: EntityCache[datetime] = EntityCache(10, ttl=60, not_found_ttl=5)
+        mock_monotonic = mocker.patch("app.api.cache.time.monotonic", return_value=0)
+        cache.set(user_id, created_at)
+        mock_monotonic.return_value = 61
+
+        assert cache.get(user_id) == (False, None)
+        assert cache.stats()["size"] == 0
+
+    def test_cache__lru_eviction(self, created_at: datetime) -> None:
+        cache: EntityCache[datetime] = EntityCache(2, ttl=60, not_found_ttl=5)
+        first, second, third = uuid4(), uuid4(), uuid4()
+        cache.set(first, created_at)
+        cache.set(second, created_at)
+        cache.get(first)
+        cache.set(third, created_at)
+
+        assert cache.get(second) == (False, None)
+        assert cache.get(first) == (True, created_at)
+        assert cache.evictions == 1
+
+    def test_cache__invalidate(self, user_id: UUID, created_at: datetime) -> None:
+        cache: EntityCache[datetime] = EntityCache(10, ttl=60, not_found_ttl=5)
+        cache.set(user_id, created_at)
+        cache.invalidate(user_id)
+
+        assert cache.get(user_id) == (False, None)
+
+    def test_cache__disabled(self, user_id: UUID, created_at: datetime) -> None:
+        cache: EntityCache[datetime] = EntityCache(
+            10, ttl=60, not_found_ttl=5, enabled=False
+        )
+        cache.set(user_id, created_at)
+
+        assert cache.get(user_id) == (False, None)
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+from app.api.etag import entity_etag, etag_matches, etag_versions, parse_etags
+
+
+class TestEtag:
+    def test_entity_etag__weak_and_versioned(
+        self, user_id: UUID, created_at: datetime
+    ) -> None:
+        etag = entity_etag(user_id, created_at)
+
+        assert etag.startswith('W/"') and etag.endswith('"')
+        assert entity_etag(user_id, created_at) == etag
+        assert entity_etag(user_id, created_at + timedelta(microseconds=1)) != etag
+        assert entity_etag(uuid4(), created_at) != etag
+
+    def test_entity_etag__naive_is_utc(self, user_id: UUID) -> None:
+        naive = datetime(2023, 1, 1, 12, 30, 0, 123456)
+
+        assert entity_etag(user_id, naive) == entity_etag(
+            user_id, naive.replace(tzinfo=timezone.utc)
+        )
+
+    def test_parse_etags(self) -> None:
+        assert parse_etags(' W/"a", "b" ,*') == ['"a"', '"b"', "*"]
+
+    def test_etag_matches(self, user_id: UUID, created_at: datetime) -> None:
+        etag = entity_etag(user_id, created_at)
+
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", {etag[2:]}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('W/"other"', etag)
+
+    def test_etag_versions__round_trip(self, user_id: UUID) -> None:
+        version = datetime(2023, 1, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)
+        header = f"{entity_etag(user_id, version)}, {entity_etag(uuid4(), version)}"
+
+        assert etag_versions(header, user_id) == [version]
+
+    def test_etag_versions__foreign_tags(self, user_id: UUID) -> None:
+        assert etag_versions('"abc", W/"not.an.etag"', user_id) == []
+
+    def test_etag_versions__any(self, user_id: UUID) -> None:
+        assert etag_versions("*", user_id) is None
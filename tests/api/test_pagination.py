@@ -0,0 +1,18 @@
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+
+from app.api.pagination import decode_cursor, encode_cursor
+
+
+class TestKeysetCursor:
+    def test_cursor__round_trip(self, created_at: datetime, user_id: UUID) -> None:
+        cursor = encode_cursor(created_at, user_id)
+
+        assert decode_cursor(cursor) == (created_at, user_id)
+
+    @pytest.mark.parametrize("cursor", ["invalid", "W10=", "WyJhIiwgImIiXQ=="])
+    def test_cursor__malformed(self, cursor: str) -> None:
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
@@ -0,0 +1,68 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from pytest_mock import MockFixture
+
+from app.api import serialization
+from app.api.pagination import KeysetPage
+from app.api.serialization import dump_json, fast_response, validate_rows
+from app.api.task.models import Task
+from app.database.task.models import TaskTable
+
+
+@pytest.fixture
+def task_rows() -> list[TaskTable]:
+    return [
+        TaskTable(
+            task_id=uuid4(),
+            name=f"Task {i}",
+            description="",
+            user_id=uuid4(),
+            created_at=datetime(2023, 1, 1),
+        )
+        for i in range(3)
+    ]
+
+
+class TestSerialization:
+    class TestValidateRows:
+        def test_validate_rows__orm_objects(self, task_rows: list[TaskTable]) -> None:
+            tasks = validate_rows(Task, task_rows)
+
+            assert tasks == [Task.model_validate(row) for row in task_rows]
+
+    class TestDumpJson:
+        def test_dump_json__aliases(self, task_rows: list[TaskTable]) -> None:
+            page = KeysetPage[Task](
+                items=validate_rows(Task, task_rows),
+                size=3,
+                nextCursor=None,
+                total=None,
+            )
+
+            assert (
+                dump_json(KeysetPage[Task], page)
+                == page.model_dump_json(by_alias=True).encode()
+            )
+
+    class TestFastResponse:
+        def test_fast_response__disabled(
+            self, mocker: MockFixture, task_rows: list[TaskTable]
+        ) -> None:
+            mocker.patch.object(serialization.settings, "fast_serialization", False)
+            task = Task.model_validate(task_rows[0])
+
+            assert fast_response(Task, task) is task
+
+        def test_fast_response__enabled(
+            self, mocker: MockFixture, task_rows: list[TaskTable]
+        ) -> None:
+            mocker.patch.object(serialization.settings, "fast_serialization", True)
+            task = Task.model_validate(task_rows[0])
+
+            response = fast_response(Task, task)
+
+            assert not isinstance(response, Task)
+            assert response.media_type == "application/json"
+            assert response.body == task.model_dump_json(by_alias=True).encode()
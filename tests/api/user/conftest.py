@@ -5,6 +5,7 @@ import pytest
 from fastapi_pagination import Page
 from pydantic import SecretStr
 
+from app.api.pagination import KeysetPage, encode_cursor
 from app.api.task.models import TaskWithoutUser
 from app.api.user.models import (
     BaseUser,
@@ -61,6 +62,32 @@ def user_page(page: int, size: int, user_response: User) -> Page[User]:
     return Page(page=page, total=1, size=size, pages=1, items=[user_response])
 
 
+@pytest.fixture
+def user_keyset_page(
+    size: int, user_response: UserResponse
+) -> KeysetPage[UserResponse]:
+    return KeysetPage[UserResponse](
+        items=[user_response],
+        size=size,
+        nextCursor=encode_cursor(user_response.created_at, user_response.user_id),
+        total=None,
+    )
+
+
+@pytest.fixture
+def user_tasks_keyset_page(
+    size: int, task_without_user: TaskWithoutUser
+) -> KeysetPage[TaskWithoutUser]:
+    return KeysetPage[TaskWithoutUser](
+        items=[task_without_user],
+        size=size,
+        nextCursor=encode_cursor(
+            task_without_user.created_at, task_without_user.task_id
+        ),
+        total=None,
+    )
+
+
 @pytest.fixture
 def user_table(user_response: User) -> UserTable:
     return UserTable(**user_response.model_dump())
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Generator
+
+import pytest
+
+from app.api.user.password import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher() -> Generator[PasswordHasher, None, None]:
+    hasher = PasswordHasher(workers=1, max_pending=2, n=2**10, r=8, p=1)
+    yield hasher
+    hasher.shutdown()
+
+
+class TestPasswordHasher:
+    class TestHash:
+        @pytest.mark.asyncio
+        async def test_hash__verify(self, hasher: PasswordHasher) -> None:
+            password_hash = await hasher.hash("test_password1!")
+
+            assert password_hash.startswith("scrypt$1024$8$1$")
+            assert await hasher.verify("test_password1!", password_hash)
+            assert not await hasher.verify("other_password1!", password_hash)
+
+        @pytest.mark.asyncio
+        async def test_hash__salted(self, hasher: PasswordHasher) -> None:
+            first = await hasher.hash("test_password1!")
+            second = await hasher.hash("test_password1!")
+
+            assert first != second
+
+        @pytest.mark.asyncio
+        async def test_hash__bounded(self, hasher: PasswordHasher) -> None:
+            hashes = [hasher.hash("test_password1!") for _ in range(3)]
+            results = await asyncio.gather(*hashes, return_exceptions=True)
+
+            assert [isinstance(r, PasswordHasherBusy) for r in results] == [
+                False,
+                False,
+                True,
+            ]
+            assert hasher.pending == 0
+
+        @pytest.mark.asyncio
+        async def test_hash__queue_depth(self, hasher: PasswordHasher) -> None:
+            hashes = asyncio.gather(*(hasher.hash("test_password1!") for _ in range(2)))
+            await asyncio.sleep(0)
+
+            assert hasher.pending == 2
+            assert hasher.queued == 1
+            await hashes
+
+    class TestVerify:
+        @pytest.mark.parametrize(
+            "encoded", ["", "bcrypt$1$2$3$4$5", "scrypt$x$8$1$a$b"]
+        )
+        def test_verify__malformed(self, hasher: PasswordHasher, encoded: str) -> None:
+            assert not hasher.verify_sync("test_password1!", encoded)
@@ -2,11 +2,25 @@ from uuid import UUID
 
 import responses
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 from fastapi_pagination import Page
 from pytest_mock import MockFixture
 
-from app.api.user.models import BaseUser, User, UserCreate, UserTasks
+from app.api.export import ExportFormat
+from app.api.pagination import INVALID_CURSOR, KeysetPage
+from app.api.task.models import TaskWithoutUser
+from app.api.user.models import (
+    BaseUser,
+    User,
+    UserBatchGetItem,
+    UserBatchGetResponse,
+    UserCreate,
+    UserResponse,
+    UserTasks,
+    UserTaskStats,
+)
+from app.api.user import service
 from app.api.user.service import USER_NOT_FOUND
 
 
@@ -97,6 +111,23 @@ class TestUserRoutes:
             assert response.status_code == 404
             mock_get_user_service.assert_awaited_once()
 
+        @responses.activate
+        def test_get_user__not_modified(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_response: UserResponse,
+            user_id: UUID,
+        ) -> None:
+            etag = service.user_etag(user_response)
+            mocker.patch("app.api.user.router.service.get_user_etag", return_value=etag)
+            mock_get_user_service = mocker.patch("app.api.user.router.service.get_user")
+            response = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+            mock_get_user_service.assert_not_awaited()
+
     class TestGetUserTasks:
         @responses.activate
         def test_get_user_tasks__ok(
@@ -140,6 +171,109 @@ class TestUserRoutes:
             assert response.status_code == 404
             mock_get_user_tasks_service.assert_awaited_once()
 
+    class TestGetUsersBatch:
+        @responses.activate
+        def test_get_users_batch__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_response: UserResponse,
+            user_id: UUID,
+        ) -> None:
+            mock_get_users_batch_service = mocker.patch(
+                "app.api.user.router.service.get_users_batch",
+                return_value=UserBatchGetResponse(
+                    items=[
+                        UserBatchGetItem(userId=user_id, found=True, user=user_response)
+                    ]
+                ),
+            )
+            response = client.post("/users/batch-get", json={"userIds": [str(user_id)]})
+
+            assert response.status_code == 200
+            item = response.json()["items"][0]
+            assert item["found"] is True
+            assert item["user"]["userId"] == str(user_id)
+            mock_get_users_batch_service.assert_awaited_once()
+
+        @responses.activate
+        def test_get_users_batch__invalid_id(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_get_users_batch_service = mocker.patch(
+                "app.api.user.router.service.get_users_batch"
+            )
+            response = client.post("/users/batch-get", json={"userIds": ["not-an-id"]})
+
+            assert response.status_code == 422
+            mock_get_users_batch_service.assert_not_called()
+
+    class TestGetUserTaskStats:
+        @responses.activate
+        def test_get_user_task_stats__ok(
+            self, mocker: MockFixture, client: TestClient, user_id: UUID
+        ) -> None:
+            mock_get_user_task_stats_service = mocker.patch(
+                "app.api.user.router.service.get_user_task_stats",
+                return_value=UserTaskStats.model_validate(
+                    {"userId": user_id, "taskCount": 2}
+                ),
+            )
+            response = client.get(f"/users/{user_id}/stats")
+
+            assert response.status_code == 200
+            assert response.json()["userId"] == str(user_id)
+            assert response.json()["taskCount"] == 2
+            mock_get_user_task_stats_service.assert_awaited_once()
+
+        @responses.activate
+        def test_get_user_task_stats__not_found(
+            self, mocker: MockFixture, client: TestClient, user_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.user.router.service.get_user_task_stats",
+                side_effect=HTTPException(*USER_NOT_FOUND),
+            )
+            response = client.get(f"/users/{user_id}/stats")
+
+            assert response.status_code == 404
+
+    class TestGetUserTasksKeyset:
+        @responses.activate
+        def test_get_user_tasks_keyset__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_tasks_keyset_page: KeysetPage[TaskWithoutUser],
+            user_id: UUID,
+        ) -> None:
+            mock_get_user_tasks_keyset_service = mocker.patch(
+                "app.api.user.router.service.get_user_tasks_keyset",
+                return_value=user_tasks_keyset_page,
+            )
+            response = client.get(f"/users/{user_id}/tasks", params={"size": 10})
+
+            assert response.status_code == 200
+            task = response.json()["items"][0]
+            assert task["taskId"] == str(user_tasks_keyset_page.items[0].task_id)
+            assert "userId" not in task
+            assert response.json()["nextCursor"] == user_tasks_keyset_page.next_cursor
+            mock_get_user_tasks_keyset_service.assert_awaited_once()
+            assert mock_get_user_tasks_keyset_service.call_args.args[1].size == 10
+
+        @responses.activate
+        def test_get_user_tasks_keyset__not_found(
+            self, mocker: MockFixture, client: TestClient, user_id: UUID
+        ) -> None:
+            mock_get_user_tasks_keyset_service = mocker.patch(
+                "app.api.user.router.service.get_user_tasks_keyset",
+                side_effect=HTTPException(*USER_NOT_FOUND),
+            )
+            response = client.get(f"/users/{user_id}/tasks")
+
+            assert response.status_code == 404
+            mock_get_user_tasks_keyset_service.assert_awaited_once()
+
     class TestGetUsersUser:
         @responses.activate
         def test_get_users__ok(
@@ -163,6 +297,68 @@ class TestUserRoutes:
             assert response.json()["size"] == size
             mock_get_users_service.assert_awaited_once()
 
+    class TestGetUsersKeyset:
+        @responses.activate
+        def test_get_users_keyset__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_keyset_page: KeysetPage[UserResponse],
+            user_id: UUID,
+            size: int,
+        ) -> None:
+            mock_get_users_keyset_service = mocker.patch(
+                "app.api.user.router.service.get_users_keyset",
+                return_value=user_keyset_page,
+            )
+            response = client.get("/users/keyset")
+
+            assert response.status_code == 200
+            assert response.json()["items"][0]["userId"] == str(user_id)
+            assert response.json()["nextCursor"] == user_keyset_page.next_cursor
+            assert response.json()["total"] is None
+            mock_get_users_keyset_service.assert_awaited_once()
+
+        @responses.activate
+        def test_get_users_keyset__invalid_cursor(
+            self, mocker: MockFixture, client: TestClient
+        ) -> None:
+            mock_get_users_keyset_service = mocker.patch(
+                "app.api.user.router.service.get_users_keyset",
+                side_effect=HTTPException(*INVALID_CURSOR),
+            )
+            response = client.get("/users/keyset", params={"cursor": "invalid"})
+
+            assert response.status_code == 400
+            mock_get_users_keyset_service.assert_awaited_once()
+
+    class TestExportUsers:
+        @responses.activate
+        def test_export_users__ok(
+            self,
+            mocker: MockFixture,
+            client: TestClient,
+            user_response: UserResponse,
+        ) -> None:
+            mock_export_users_service = mocker.patch(
+                "app.api.user.router.service.export_users",
+                return_value=StreamingResponse(
+                    iter([user_response.model_dump_json(by_alias=True) + "\n"]),
+                    media_type="application/x-ndjson",
+                ),
+            )
+            response = client.get(
+                "/users/export", params={"createdAfter": "2023-01-01T00:00:00"}
+            )
+
+            assert response.status_code == 200
+            assert str(user_response.user_id) in response.text
+            assert mock_export_users_service.call_args.args[0] == ExportFormat.NDJSON
+            assert mock_export_users_service.call_args.kwargs["created_after"] == (
+                user_response.created_at
+            )
+            mock_export_users_service.assert_awaited_once()
+
     class TestUpdateUser:
         @responses.activate
         def test_update_user__ok(
@@ -190,6 +386,7 @@ class TestUserRoutes:
             updated_user_response = response.json()
             assert updated_user_response["username"] == update_user.username
             assert updated_user_response["email"] == update_user.email
+            assert response.headers["ETag"] == service.user_etag(updated_user)
             mock_update_user_service.assert_awaited_once()
 
         @responses.activate
@@ -1,14 +1,27 @@
-from uuid import UUID
+from datetime import timezone
+from typing import Any, AsyncIterator, Sequence
+from unittest.mock import ANY
+from uuid import UUID, uuid4
 
 import pytest
 from fastapi import HTTPException
 from fastapi_pagination import Page, Params
 from pytest_mock import MockFixture
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
 
+from app.api.export import ExportFormat
+from app.api.pagination import KeysetPage, KeysetParams
+from app.api.task.models import TaskWithoutUser
 from app.api.user import service
-from app.api.user.models import BaseUser, User, UserCreate, UserTasks, UserUpdate
+from app.api.user.models import (
+    BaseUser,
+    User,
+    UserCreate,
+    UserResponse,
+    UserTasks,
+    UserTaskStats,
+    UserUpdate,
+)
 from app.api.user.service import (
     create_user,
     delete_user,
@@ -16,6 +29,7 @@ from app.api.user.service import (
     get_user_tasks,
     get_users,
 )
+from app.database.database import DbSession
 from app.database.user.models import UserTable
 
 
@@ -25,7 +39,7 @@ class TestUserServices:
         async def test_create_user__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_create: UserCreate,
             user_table: UserTable,
             user_response: User,
@@ -36,13 +50,38 @@ class TestUserServices:
             created_user = await create_user(user_create, db)
 
             assert created_user == user_response
-            mock_create_user_crud.assert_called_once_with(user_create, db)
+            mock_create_user_crud.assert_called_once_with(user_create, ANY, db)
+            password_hash = mock_create_user_crud.call_args.args[1]
+            assert password_hash != user_create.password.get_secret_value()
+            assert service.password_hasher.verify_sync(
+                user_create.password.get_secret_value(), password_hash
+            )
+
+        @pytest.mark.asyncio
+        async def test_create_user__hasher_busy(
+            self, mocker: MockFixture, db: DbSession, user_create: UserCreate
+        ) -> None:
+            mocker.patch.object(
+                service.password_hasher,
+                "pending",
+                service.password_hasher.max_pending,
+            )
+            mocker.patch.object(service.settings, "password_hash_retry_after", 3)
+            mock_create_user_crud = mocker.patch(
+                "app.api.user.service.crud.create_user"
+            )
+            with pytest.raises(HTTPException) as e:
+                await create_user(user_create, db)
+
+            assert e.value.status_code == 503
+            assert e.value.headers == {"Retry-After": "3"}
+            mock_create_user_crud.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_create_user__integrity_error(
         self,
         mocker: MockFixture,
-        db: Session,
+        db: DbSession,
         user_create: UserCreate,
         user_table: UserTable,
         user_response: User,
@@ -55,13 +94,13 @@ class TestUserServices:
             await create_user(user_create, db)
 
         assert e.value.status_code == 409
-        mock_create_user_crud.assert_called_once_with(user_create, db)
+        mock_create_user_crud.assert_called_once_with(user_create, ANY, db)
 
         @pytest.mark.asyncio
         async def test_create_user__common_exception(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_create: UserCreate,
             user_table: UserTable,
             user_response: User,
@@ -73,14 +112,14 @@ class TestUserServices:
                 await create_user(user_create, db)
 
             assert e.value.status_code == 500
-            mock_create_user_crud.assert_called_once_with(user_create, db)
+            mock_create_user_crud.assert_called_once_with(user_create, ANY, db)
 
     class TestGetUser:
         @pytest.mark.asyncio
         async def test_get_user__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_response: User,
             user_id: UUID,
             user_table: UserTable,
@@ -98,7 +137,7 @@ class TestUserServices:
         async def test_get_user__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_response: User,
             user_id: UUID,
             user_table: UserTable,
@@ -112,50 +151,161 @@ class TestUserServices:
             assert e.value.status_code == 404
             mock_get_user_crud.assert_called_once_with(user_id, db)
 
+        @pytest.mark.asyncio
+        async def test_get_user__cached(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_response: User,
+            user_id: UUID,
+            user_table: UserTable,
+        ) -> None:
+            mock_get_user_crud = mocker.patch(
+                "app.api.user.service.crud.get_user", return_value=[user_table]
+            )
+            await get_user(user_id, db)
+            retrieved_user = await get_user(user_id, db)
+
+            assert retrieved_user == user_response
+            assert service.user_cache.hits == 1
+            mock_get_user_crud.assert_called_once_with(user_id, db)
+
+    class TestGetUserEtag:
+        @pytest.mark.asyncio
+        async def test_get_user_etag__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_response: UserResponse,
+            user_id: UUID,
+        ) -> None:
+            mock_get_user_version = mocker.patch(
+                "app.api.user.service.crud.get_user_version",
+                return_value=user_response.created_at,
+            )
+            etag = await service.get_user_etag(user_id, db)
+
+            assert etag == service.user_etag(user_response)
+            mock_get_user_version.assert_called_once_with(user_id, db)
+
+        @pytest.mark.asyncio
+        async def test_get_user_etag__not_found(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.user.service.crud.get_user_version", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.get_user_etag(user_id, db)
+
+            assert e.value.status_code == 404
+
+    class TestGetUsersBatch:
+        @pytest.mark.asyncio
+        async def test_get_users_batch__request_order(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_response: UserResponse,
+            user_id: UUID,
+            user_table: UserTable,
+        ) -> None:
+            missing_id = uuid4()
+            mock_get_users_by_ids_crud = mocker.patch(
+                "app.api.user.service.crud.get_users_by_ids",
+                return_value=[user_table],
+            )
+            response = await service.get_users_batch([missing_id, user_id], db)
+
+            assert [item.user_id for item in response.items] == [missing_id, user_id]
+            assert [item.found for item in response.items] == [False, True]
+            assert response.items[1].user == user_response
+            mock_get_users_by_ids_crud.assert_called_once_with(
+                [missing_id, user_id], db
+            )
+
+        @pytest.mark.asyncio
+        async def test_get_users_batch__not_found_cached(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            mock_get_users_by_ids_crud = mocker.patch(
+                "app.api.user.service.crud.get_users_by_ids", return_value=[]
+            )
+            for _ in range(2):
+                response = await service.get_users_batch([user_id], db)
+                assert response.items[0].found is False
+
+            mock_get_users_by_ids_crud.assert_called_once_with([user_id], db)
+
+    class TestGetUserTaskStats:
+        @pytest.mark.asyncio
+        async def test_get_user_task_stats__ok(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            stats = UserTaskStats.model_validate({"userId": user_id, "taskCount": 0})
+            mock_get_user_task_stats_crud = mocker.patch(
+                "app.api.user.service.crud.get_user_task_stats", return_value=stats
+            )
+
+            assert await service.get_user_task_stats(user_id, db) == stats
+            mock_get_user_task_stats_crud.assert_called_once_with(user_id, db)
+
+        @pytest.mark.asyncio
+        async def test_get_user_task_stats__not_found(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.user.service.crud.get_user_task_stats", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.get_user_task_stats(user_id, db)
+
+            assert e.value.status_code == 404
+
     class TestGetUserTasks:
         @pytest.mark.asyncio
         async def test_get_user_tasks__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
             user_table_with_tasks: UserTable,
             users_tasks: UserTasks,
         ) -> None:
-            mock_get_user_crud = mocker.patch(
-                "app.api.user.service.crud.get_user",
+            mock_get_user_tasks_crud = mocker.patch(
+                "app.api.user.service.crud.get_user_tasks",
                 return_value=[user_table_with_tasks],
             )
             retrieved_user = await get_user_tasks(user_id, db)
 
             assert retrieved_user.user_id == user_id
             assert retrieved_user == users_tasks
-            mock_get_user_crud.assert_called_once_with(user_id, db)
+            mock_get_user_tasks_crud.assert_called_once_with(user_id, db)
 
         @pytest.mark.asyncio
         async def test_get_user_tasks__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_response: User,
             user_id: UUID,
             user_table: UserTable,
         ) -> None:
-            mock_get_user_crud = mocker.patch(
-                "app.api.user.service.crud.get_user", return_value=[]
+            mock_get_user_tasks_crud = mocker.patch(
+                "app.api.user.service.crud.get_user_tasks", return_value=[]
             )
             with pytest.raises(HTTPException) as e:
                 await get_user_tasks(user_id, db)
 
             assert e.value.status_code == 404
-            mock_get_user_crud.assert_called_once_with(user_id, db)
+            mock_get_user_tasks_crud.assert_called_once_with(user_id, db)
 
     class TestGetUsersUser:
         @pytest.mark.asyncio
         async def test_get_users__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_page: Page[User],
             user_id: UUID,
             size: int,
@@ -170,38 +320,170 @@ class TestUserServices:
             assert retrieved_users.size == size
             mock_get_users_crud.assert_called_once_with(pagination, db)
 
+    class TestGetUserTasksKeyset:
+        @pytest.mark.asyncio
+        async def test_get_user_tasks_keyset__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_id: UUID,
+            user_tasks_keyset_page: KeysetPage[TaskWithoutUser],
+        ) -> None:
+            mock_get_user_tasks_keyset_crud = mocker.patch(
+                "app.api.user.service.crud.get_user_tasks_keyset",
+                return_value=user_tasks_keyset_page,
+            )
+            mock_get_user_crud = mocker.patch("app.api.user.service.crud.get_user")
+            params = KeysetParams()
+            retrieved_tasks = await service.get_user_tasks_keyset(user_id, params, db)
+
+            assert retrieved_tasks == user_tasks_keyset_page
+            mock_get_user_tasks_keyset_crud.assert_called_once_with(user_id, params, db)
+            mock_get_user_crud.assert_not_called()
+
+        @pytest.mark.asyncio
+        async def test_get_user_tasks_keyset__no_tasks(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_id: UUID,
+            user_table: UserTable,
+        ) -> None:
+            mocker.patch(
+                "app.api.user.service.crud.get_user_tasks_keyset",
+                return_value=KeysetPage[TaskWithoutUser](
+                    items=[], size=50, nextCursor=None, total=None
+                ),
+            )
+            mock_get_user_crud = mocker.patch(
+                "app.api.user.service.crud.get_user", return_value=[user_table]
+            )
+            retrieved_tasks = await service.get_user_tasks_keyset(
+                user_id, KeysetParams(), db
+            )
+
+            assert retrieved_tasks.items == []
+            mock_get_user_crud.assert_called_once_with(user_id, db)
+
+        @pytest.mark.asyncio
+        async def test_get_user_tasks_keyset__not_found(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.user.service.crud.get_user_tasks_keyset",
+                return_value=KeysetPage[TaskWithoutUser](
+                    items=[], size=50, nextCursor=None, total=None
+                ),
+            )
+            mocker.patch("app.api.user.service.crud.get_user", return_value=None)
+            with pytest.raises(HTTPException) as e:
+                await service.get_user_tasks_keyset(user_id, KeysetParams(), db)
+
+            assert e.value.status_code == 404
+
+        @pytest.mark.asyncio
+        async def test_get_user_tasks_keyset__invalid_cursor(
+            self, mocker: MockFixture, db: DbSession, user_id: UUID
+        ) -> None:
+            mocker.patch(
+                "app.api.user.service.crud.get_user_tasks_keyset",
+                side_effect=ValueError(),
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.get_user_tasks_keyset(
+                    user_id, KeysetParams(cursor="invalid"), db
+                )
+
+            assert e.value.status_code == 400
+
+    class TestGetUsersKeyset:
+        @pytest.mark.asyncio
+        async def test_get_users_keyset__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_keyset_page: KeysetPage[UserResponse],
+            user_id: UUID,
+        ) -> None:
+            mock_get_users_keyset_crud = mocker.patch(
+                "app.api.user.service.crud.get_users_keyset",
+                return_value=user_keyset_page,
+            )
+            params = KeysetParams()
+            retrieved_users = await service.get_users_keyset(params, db)
+
+            assert retrieved_users.items[0].user_id == user_id
+            assert retrieved_users.next_cursor == user_keyset_page.next_cursor
+            mock_get_users_keyset_crud.assert_called_once_with(params, db)
+
+        @pytest.mark.asyncio
+        async def test_get_users_keyset__invalid_cursor(
+            self, mocker: MockFixture, db: DbSession
+        ) -> None:
+            mock_get_users_keyset_crud = mocker.patch(
+                "app.api.user.service.crud.get_users_keyset", side_effect=ValueError()
+            )
+            params = KeysetParams(cursor="invalid")
+            with pytest.raises(HTTPException) as e:
+                await service.get_users_keyset(params, db)
+
+            assert e.value.status_code == 400
+            mock_get_users_keyset_crud.assert_called_once_with(params, db)
+
+    class TestExportUsers:
+        @pytest.mark.asyncio
+        async def test_export_users__ok(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_table: UserTable,
+        ) -> None:
+            async def partitions(*_: Any, **__: Any) -> AsyncIterator[Sequence[Any]]:
+                yield [user_table]
+
+            mock_stream_users_crud = mocker.patch(
+                "app.api.user.service.crud.stream_users", side_effect=partitions
+            )
+            response = await service.export_users(ExportFormat.CSV, db)
+            body = "".join([str(chunk) async for chunk in response.body_iterator])
+
+            assert body.splitlines()[0] == "username,email,userId,createdAt,updatedAt"
+            assert body.splitlines()[1].startswith(f"{user_table.username},")
+            assert "password" not in body
+            mock_stream_users_crud.assert_called_once_with(
+                db, batch_size=1000, created_after=None, created_before=None
+            )
+
     class TestUpdateUser:
         @pytest.mark.asyncio
         async def test_update_user__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
             update_user: UserUpdate,
             updated_user: User,
         ) -> None:
             mock_update_user_crud = mocker.patch(
-                "app.api.user.service.crud.update_user", return_value=1
-            )
-            mock_get_user = mocker.patch(
-                "app.api.user.service.crud.get_user",
-                return_value=[UserTable(**updated_user.model_dump())],
+                "app.api.user.service.crud.update_user",
+                return_value=UserTable(**updated_user.model_dump()),
             )
+            mock_get_user = mocker.patch("app.api.user.service.crud.get_user")
             updated_user_service = await service.update_user(user_id, update_user, db)
 
             assert updated_user_service.model_dump() == updated_user.model_dump(
                 exclude={"tasks"}
             )
             mock_update_user_crud.assert_called_once_with(
-                user_id=user_id, new_user=update_user, db=db
+                user_id=user_id, new_user=update_user, db=db, versions=None
             )
-            mock_get_user.assert_called_once_with(user_id, db)
+            mock_get_user.assert_not_called()
 
         @pytest.mark.asyncio
         async def test_update_user__common_exception(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
             update_user: UserUpdate,
         ) -> None:
@@ -213,27 +495,76 @@ class TestUserServices:
 
             assert e.value.status_code == 500
             mock_update_user_crud.assert_called_once_with(
-                user_id=user_id, new_user=update_user, db=db
+                user_id=user_id, new_user=update_user, db=db, versions=None
             )
 
         @pytest.mark.asyncio
         async def test_update_user__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             update_user: UserUpdate,
             user_id: UUID,
         ) -> None:
             mock_update_user_crud = mocker.patch(
                 "app.api.user.service.crud.update_user",
-                return_value=0,
+                return_value=None,
             )
             with pytest.raises(HTTPException) as e:
                 await service.update_user(user_id, update_user, db)
 
             assert e.value.status_code == 404
             mock_update_user_crud.assert_called_once_with(
-                user_id=user_id, new_user=update_user, db=db
+                user_id=user_id, new_user=update_user, db=db, versions=None
+            )
+
+        @pytest.mark.asyncio
+        async def test_update_user__precondition_failed(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_response: UserResponse,
+            user_id: UUID,
+            update_user: UserUpdate,
+            updated_user: User,
+        ) -> None:
+            mock_update_user_crud = mocker.patch(
+                "app.api.user.service.crud.update_user", return_value=None
+            )
+            mocker.patch(
+                "app.api.user.service.crud.get_user_version",
+                return_value=updated_user.updated_at,
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.update_user(
+                    user_id, update_user, db, if_match=service.user_etag(user_response)
+                )
+
+            assert e.value.status_code == 412
+            mock_update_user_crud.assert_called_once_with(
+                user_id=user_id,
+                new_user=update_user,
+                db=db,
+                versions=[user_response.created_at.replace(tzinfo=timezone.utc)],
+            )
+
+        @pytest.mark.asyncio
+        async def test_update_user__if_match_any_not_found(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_id: UUID,
+            update_user: UserUpdate,
+        ) -> None:
+            mock_update_user_crud = mocker.patch(
+                "app.api.user.service.crud.update_user", return_value=None
+            )
+            with pytest.raises(HTTPException) as e:
+                await service.update_user(user_id, update_user, db, if_match="*")
+
+            assert e.value.status_code == 412
+            mock_update_user_crud.assert_called_once_with(
+                user_id=user_id, new_user=update_user, db=db, versions=None
             )
 
     class TestDeleteUser:
@@ -241,33 +572,43 @@ class TestUserServices:
         async def test_delete_user__ok(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
-            user_table: UserTable,
         ) -> None:
-            mock_get_user_crud = mocker.patch(
-                "app.api.user.service.crud.get_user", return_value=[user_table]
-            )
+            mock_get_user_crud = mocker.patch("app.api.user.service.crud.get_user")
             mock_delete_user_crud = mocker.patch(
                 "app.api.user.service.crud.delete_user", return_value=user_id
             )
             deleted_user_id = await delete_user(user_id, db)
 
             assert deleted_user_id == user_id
-            mock_get_user_crud.assert_called_once_with(user_id, db)
+            mock_get_user_crud.assert_not_called()
             mock_delete_user_crud.assert_called_once_with(user_id, db)
 
         @pytest.mark.asyncio
-        async def test_delete_user__common_exception(
+        async def test_delete_user__invalidates_cache(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
             user_table: UserTable,
         ) -> None:
-            mock_get_user_crud = mocker.patch(
+            mocker.patch(
                 "app.api.user.service.crud.get_user", return_value=[user_table]
             )
+            await get_user(user_id, db)
+            mocker.patch("app.api.user.service.crud.delete_user", return_value=user_id)
+            await delete_user(user_id, db)
+
+            assert service.user_cache.get(user_id) == (False, None)
+
+        @pytest.mark.asyncio
+        async def test_delete_user__common_exception(
+            self,
+            mocker: MockFixture,
+            db: DbSession,
+            user_id: UUID,
+        ) -> None:
             mock_delete_user_crud = mocker.patch(
                 "app.api.user.service.crud.delete_user", side_effect=Exception
             )
@@ -275,26 +616,20 @@ class TestUserServices:
                 await delete_user(user_id, db)
 
             assert e.value.status_code == 500
-            mock_get_user_crud.assert_called_once_with(user_id, db)
             mock_delete_user_crud.assert_called_once_with(user_id, db)
 
         @pytest.mark.asyncio
         async def test_delete_user__not_found(
             self,
             mocker: MockFixture,
-            db: Session,
+            db: DbSession,
             user_id: UUID,
-            user_table: UserTable,
         ) -> None:
-            mock_get_user_crud = mocker.patch(
-                "app.api.user.service.crud.get_user", return_value=[]
-            )
             mock_delete_user_crud = mocker.patch(
-                "app.api.user.service.crud.delete_user"
+                "app.api.user.service.crud.delete_user", return_value=None
             )
             with pytest.raises(HTTPException) as e:
                 await delete_user(user_id, db)
 
             assert e.value.status_code == 404
-            mock_get_user_crud.assert_called_once_with(user_id, db)
-            mock_delete_user_crud.assert_not_called()
+            mock_delete_user_crud.assert_called_once_with(user_id, db)
@@ -1,8 +1,9 @@
 import os
-from typing import Generator
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Generator, Iterator
 
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 os.environ["USE_CACHED_SETTINGS"] = "False"
 os.environ["DB_USER"] = "postgres"
@@ -10,14 +11,40 @@ os.environ["DB_PASSWORD"] = "password"
 os.environ["DB_HOST"] = "localhost"
 os.environ["DB_PORT"] = "5432"
 os.environ["DB_DATABASE"] = "test"
+os.environ["DB_POOL_PREWARM"] = "False"
+# the routes of tests/api are mocked, they run before tests/database migrates
+os.environ["DB_SCHEMA_CHECK"] = "False"
+# write log records synchronously, so they are captured by the test emitting them
+os.environ["LOG_QUEUE_SIZE"] = "0"
 
 
 @pytest.fixture
-def db() -> Generator[Session, None, None]:
+def db() -> Generator[AsyncSession, None, None]:
     db = None
     try:
-        db = Session()
+        db = AsyncSession()
         yield db
     finally:
         if db is not None:
-            db.close()
+            db.sync_session.close()
+
+
+@pytest.fixture
+def assert_statements() -> Callable[[int], ContextManager[list[str]]]:
+    """
+    Context manager asserting the exact number of SQL statements executed by the
+    app while it runs, e.g. by one request of a TestClient:
+
+        with assert_statements(1):
+            client.get(f"/tasks/{task_id}")
+    """
+    from app.database.database import async_engine, engine
+    from app.database.timing import capture_statements
+
+    @contextmanager
+    def assert_count(expected: int) -> Iterator[list[str]]:
+        with capture_statements(engine, async_engine.sync_engine) as executed:
+            yield executed
+        assert len(executed) == expected, "\n".join(executed)
+
+    return assert_count
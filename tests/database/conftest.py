@@ -0,0 +1,68 @@
+from typing import AsyncGenerator, Generator
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from app.api.task.models import Task
+from app.api.user.models import UserResponse
+from app.database import migrate
+from app.database.database import SessionLocal, ThreadedSession, engine
+from app.database.task.models import TaskTable
+from app.database.timing import capture_statements
+from app.database.user.models import UserTable
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables() -> None:
+    migrate.ensure_database(engine)
+    migrate.upgrade(engine)
+
+
+@pytest_asyncio.fixture
+async def session() -> AsyncGenerator[ThreadedSession, None]:
+    db = ThreadedSession(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+@pytest.fixture
+def statements() -> Generator[list[str], None, None]:
+    """
+    SQL statements sent to the database while the test runs.
+    """
+    with capture_statements(engine) as executed:
+        yield executed
+
+
+@pytest.fixture
+def db_user() -> Generator[UserResponse, None, None]:
+    suffix = uuid4().hex[:8]
+    with SessionLocal() as db:
+        user = UserTable(
+            username=f"user_{suffix}",
+            email=f"user_{suffix}@example.com",
+            password="test_password1!",
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        yield UserResponse.model_validate(user)
+        db.execute(delete(TaskTable).where(TaskTable.user_id == user.user_id))
+        db.execute(delete(UserTable).where(UserTable.user_id == user.user_id))
+        db.commit()
+
+
+@pytest.fixture
+def db_task(db_user: UserResponse) -> Task:
+    with SessionLocal() as db:
+        task = TaskTable(
+            name="Test name", description="Test description", user_id=db_user.user_id
+        )
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+        return Task.model_validate(task)
@@ -0,0 +1,409 @@
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi_pagination import Params
+from sqlalchemy import text
+
+from app.api.pagination import KeysetParams
+from app.api.task.models import (
+    Task,
+    TaskCreate,
+    TaskFilters,
+    TaskSort,
+    TaskUpdate,
+)
+from app.api.user.models import UserResponse
+from app.database.database import SessionLocal, ThreadedSession, engine
+from app.database.task import crud
+from app.database.user import crud as user_crud
+from app.database.task.models import TaskTable
+
+
+class TestTaskCrud:
+    class TestUpdateTask:
+        @pytest.mark.asyncio
+        async def test_update_task__single_statement(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            new_task = TaskUpdate.model_validate({"name": "Test name new"})
+            updated_task = await crud.update_task(db_task.task_id, new_task, session)
+
+            assert updated_task is not None
+            assert updated_task.name == "Test name new"
+            assert updated_task.description == db_task.description
+            assert updated_task.updated_at is not None
+            assert [s.split()[0] for s in statements] == ["UPDATE"]
+
+        @pytest.mark.asyncio
+        async def test_update_task__not_found(
+            self, session: ThreadedSession, statements: list[str]
+        ) -> None:
+            new_task = TaskUpdate.model_validate({"name": "Test name new"})
+            updated_task = await crud.update_task(uuid4(), new_task, session)
+
+            assert updated_task is None
+            assert len(statements) == 1
+
+        @pytest.mark.asyncio
+        async def test_update_task__current_version(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            new_task = TaskUpdate.model_validate({"name": "Test name new"})
+            updated_task = await crud.update_task(
+                db_task.task_id, new_task, session, versions=[db_task.created_at]
+            )
+
+            assert updated_task is not None
+            assert updated_task.name == "Test name new"
+            assert [s.split()[0] for s in statements] == ["UPDATE"]
+
+        @pytest.mark.asyncio
+        async def test_update_task__outdated_version(
+            self, session: ThreadedSession, db_task: Task
+        ) -> None:
+            new_task = TaskUpdate.model_validate({"name": "Test name new"})
+            outdated = db_task.created_at - timedelta(microseconds=1)
+            updated_task = await crud.update_task(
+                db_task.task_id, new_task, session, versions=[outdated]
+            )
+
+            assert updated_task is None
+            version = await crud.get_task_version(db_task.task_id, session)
+            assert version == db_task.created_at
+
+    class TestGetTaskVersion:
+        @pytest.mark.asyncio
+        async def test_get_task_version__updated(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            updated_task = await crud.update_task(
+                db_task.task_id,
+                TaskUpdate.model_validate({"name": "Test name new"}),
+                session,
+            )
+            statements.clear()
+
+            assert updated_task is not None
+            version = await crud.get_task_version(db_task.task_id, session)
+            assert version == updated_task.updated_at
+            assert "updated_at" in statements[0]
+            assert "description" not in statements[0]
+
+        @pytest.mark.asyncio
+        async def test_get_task_version__not_found(
+            self, session: ThreadedSession
+        ) -> None:
+            assert await crud.get_task_version(uuid4(), session) is None
+
+    class TestGetTasks:
+        @pytest.fixture
+        def db_filter_tasks(self, db_user: UserResponse) -> list[Task]:
+            tasks = [
+                TaskTable(name="b_task", description="", user_id=db_user.user_id),
+                TaskTable(name="a%task", description="", user_id=db_user.user_id),
+                TaskTable(name="abc", description="", user_id=db_user.user_id),
+            ]
+            # one transaction per task, created_at is the transaction time
+            with SessionLocal() as db:
+                for task in tasks:
+                    db.add(task)
+                    db.commit()
+                for task in tasks:
+                    db.refresh(task)
+            return [Task.model_validate(task) for task in tasks]
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__user_sorted(
+            self,
+            session: ThreadedSession,
+            db_user: UserResponse,
+            db_filter_tasks: list[Task],
+        ) -> None:
+            filters = TaskFilters(user_id=db_user.user_id, sort=TaskSort.NAME_DESC)
+            page = await crud.get_tasks(Params(), session, filters)
+
+            assert [task.name for task in page.items] == ["b_task", "abc", "a%task"]
+            assert page.total == 3
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__name_prefix_escaped(
+            self,
+            session: ThreadedSession,
+            db_user: UserResponse,
+            db_filter_tasks: list[Task],
+        ) -> None:
+            filters = TaskFilters(user_id=db_user.user_id, name_prefix="a%")
+            page = await crud.get_tasks(Params(), session, filters)
+
+            assert [task.name for task in page.items] == ["a%task"]
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__updated_since(
+            self,
+            session: ThreadedSession,
+            db_user: UserResponse,
+            db_filter_tasks: list[Task],
+        ) -> None:
+            updated_task = await crud.update_task(
+                db_filter_tasks[0].task_id,
+                TaskUpdate.model_validate({"name": "updated"}),
+                session,
+            )
+            assert updated_task is not None
+            filters = TaskFilters(
+                user_id=db_user.user_id,
+                updated_since=Task.model_validate(updated_task).updated_at,
+                sort=TaskSort.UPDATED_AT,
+            )
+            page = await crud.get_tasks(Params(), session, filters)
+
+            assert [task.name for task in page.items] == ["updated"]
+
+        @pytest.mark.asyncio
+        async def test_get_tasks__created_range(
+            self,
+            session: ThreadedSession,
+            db_user: UserResponse,
+            db_filter_tasks: list[Task],
+        ) -> None:
+            filters = TaskFilters(
+                user_id=db_user.user_id,
+                created_after=db_filter_tasks[1].created_at,
+                created_before=db_filter_tasks[2].created_at,
+            )
+            page = await crud.get_tasks(Params(), session, filters)
+
+            assert [task.name for task in page.items] == ["a%task"]
+
+    class TestEstimateTasksScan:
+        @pytest.mark.asyncio
+        async def test_estimate_tasks_scan__small_table(
+            self, session: ThreadedSession, statements: list[str]
+        ) -> None:
+            filters = TaskFilters(name_prefix="a")
+            rows = await crud.estimate_tasks_scan(filters, session, 100_000)
+
+            assert rows == 0
+            assert not any(s.startswith("EXPLAIN") for s in statements)
+
+        @pytest.mark.asyncio
+        async def test_estimate_tasks_scan__sequential_scan(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            with engine.begin() as connection:
+                connection.execute(text("ANALYZE tasks"))
+            filters = TaskFilters(name_prefix="T")
+            # tiny tables are always read sequentially
+            rows = await crud.estimate_tasks_scan(filters, session, -1)
+
+            assert rows > 0
+            assert statements[-1].startswith("EXPLAIN (FORMAT JSON) SELECT")
+
+    class TestSearchTasks:
+        @pytest.fixture
+        def db_search_tasks(self, db_user: UserResponse) -> list[TaskTable]:
+            tasks = [
+                TaskTable(name=name, description=description, user_id=db_user.user_id)
+                for name, description in [
+                    ("Deploy release", "Ship the build"),
+                    ("Write notes", "Notes of the release"),
+                    ("Releases archive", "Old releases"),
+                    ("Unrelated", "Something else"),
+                ]
+            ]
+            with SessionLocal() as db:
+                db.add_all(tasks)
+                db.commit()
+                for task in tasks:
+                    db.refresh(task)
+            return tasks
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__ranked(
+            self, session: ThreadedSession, db_search_tasks: list[TaskTable]
+        ) -> None:
+            page = await crud.search_tasks(
+                "release",
+                KeysetParams.model_validate({"size": 10, "includeTotal": True}),
+                session,
+            )
+
+            names = [task.name for task in page.items]
+            # stemmed, "releases" matches too; the name outranks the description
+            assert set(names) == {"Deploy release", "Write notes", "Releases archive"}
+            assert names[-1] == "Write notes"
+            assert page.total == 3
+            assert page.next_cursor is None
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__pages(
+            self, session: ThreadedSession, db_search_tasks: list[TaskTable]
+        ) -> None:
+            first = await crud.search_tasks("release", KeysetParams(size=2), session)
+            assert first.next_cursor is not None
+            second = await crud.search_tasks(
+                "release", KeysetParams(size=2, cursor=first.next_cursor), session
+            )
+
+            everything = await crud.search_tasks(
+                "release", KeysetParams(size=10), session
+            )
+            assert first.items + second.items == everything.items
+            assert second.next_cursor is None
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__web_search_syntax(
+            self, session: ThreadedSession, db_search_tasks: list[TaskTable]
+        ) -> None:
+            page = await crud.search_tasks(
+                "release -archive", KeysetParams(size=10), session
+            )
+
+            assert {task.name for task in page.items} == {
+                "Deploy release",
+                "Write notes",
+            }
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__invalid_cursor(
+            self, session: ThreadedSession
+        ) -> None:
+            with pytest.raises(ValueError):
+                await crud.search_tasks(
+                    "release", KeysetParams(cursor="invalid"), session
+                )
+
+    class TestCreateTasksBulk:
+        @pytest.mark.asyncio
+        async def test_create_tasks_bulk__locks_users(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            tasks = [
+                TaskCreate(name="Task", description="", userId=user_id)
+                for user_id in (db_user.user_id, uuid4())
+            ]
+
+            created = await crud.create_tasks_bulk(tasks, session, batch_size=5)
+
+            assert created[0] is not None and created[0].user_id == db_user.user_id
+            assert created[1] is None
+            assert statements[0].rstrip().endswith("FOR KEY SHARE")
+            assert [s.split()[0] for s in statements[1:]] == ["INSERT"]
+
+    class TestGetTasksByIds:
+        @pytest.mark.asyncio
+        async def test_get_tasks_by_ids__one_array_parameter(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            found = await crud.get_tasks_by_ids([db_task.task_id, uuid4()], session)
+            await crud.get_tasks_by_ids([uuid4() for _ in range(5)], session)
+
+            assert [task.task_id for task in found] == [db_task.task_id]
+            assert len(statements) == 2
+            assert "= ANY (" in statements[0]
+            # the statement doesn't grow with the number of IDs
+            assert statements[0] == statements[1]
+
+        @pytest.mark.asyncio
+        async def test_delete_task__single_statement(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            deleted_task_id = await crud.delete_task(db_task.task_id, session)
+
+            assert deleted_task_id == db_task.task_id
+            assert await crud.get_task(db_task.task_id, session) is None
+            assert [s.split()[0] for s in statements] == ["DELETE", "SELECT"]
+
+        @pytest.mark.asyncio
+        async def test_delete_task__not_found(
+            self, session: ThreadedSession, statements: list[str]
+        ) -> None:
+            assert await crud.delete_task(uuid4(), session) is None
+            assert len(statements) == 1
+
+    class TestDeleteTasks:
+        @pytest.mark.asyncio
+        async def test_delete_tasks__chunks(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            tasks = [
+                TaskCreate(name=f"Task {i}", description="", userId=db_user.user_id)
+                for i in range(5)
+            ]
+            await crud.create_tasks_bulk(tasks, session, batch_size=5)
+            statements.clear()
+
+            chunks = [
+                chunk
+                async for chunk in crud.delete_tasks(
+                    session, batch_size=2, user_id=db_user.user_id
+                )
+            ]
+
+            assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+            assert [s.split()[0] for s in statements] == ["DELETE"] * 3
+
+    class TestTaskStats:
+        @pytest.mark.asyncio
+        async def test_task_stats__follow_writes(
+            self, session: ThreadedSession, db_user: UserResponse
+        ) -> None:
+            totals = await crud.get_task_stats(session)
+            tasks = [
+                TaskCreate(name=f"Task {i}", description="", userId=db_user.user_id)
+                for i in range(3)
+            ]
+            created = await crud.create_tasks_bulk(tasks, session, batch_size=2)
+            single = Task.model_validate(await crud.create_task(tasks[0], session))
+            updated = await crud.update_task(
+                single.task_id, TaskUpdate.model_validate({"name": "Task new"}), session
+            )
+            assert updated is not None
+            # the update returns the instance loaded by create_task
+            await session.refresh(updated)
+            updated_at = updated.updated_at
+            assert updated_at is not None
+            await crud.delete_task(single.task_id, session)
+
+            stats = await user_crud.get_user_task_stats(db_user.user_id, session)
+            assert stats is not None
+            assert stats.task_count == 3
+            assert stats.last_created_at == single.created_at
+            assert stats.last_updated_at == updated_at
+            new_totals = await crud.get_task_stats(session)
+            assert new_totals.task_count == totals.task_count + 3
+            assert new_totals.last_updated_at == updated_at
+
+            async for _ in crud.delete_tasks(
+                session, batch_size=2, user_id=db_user.user_id
+            ):
+                pass
+            stats = await user_crud.get_user_task_stats(db_user.user_id, session)
+            assert stats is not None and stats.task_count == 0
+            assert (await crud.get_task_stats(session)).task_count == totals.task_count
+            assert len(created) == 3
+
+        @pytest.mark.asyncio
+        async def test_user_task_stats__lookup(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            stats = await user_crud.get_user_task_stats(db_task.user_id, session)
+
+            assert stats is not None
+            assert stats.task_count == 1
+            assert stats.last_created_at == db_task.created_at
+            assert stats.last_updated_at is None
+            assert len(statements) == 1
+            assert "FROM users LEFT OUTER JOIN user_task_stats" in statements[0]
+            assert " tasks" not in statements[0]
+
+        @pytest.mark.asyncio
+        async def test_user_task_stats__no_tasks(
+            self, session: ThreadedSession, db_user: UserResponse
+        ) -> None:
+            stats = await user_crud.get_user_task_stats(db_user.user_id, session)
+
+            assert stats is not None
+            assert (stats.user_id, stats.task_count) == (db_user.user_id, 0)
+            assert await user_crud.get_user_task_stats(uuid4(), session) is None
@@ -0,0 +1,254 @@
+from datetime import datetime
+from typing import Any, Generator
+
+import pytest
+from fastapi_pagination import Params
+from pytest_mock import MockFixture
+from sqlalchemy import event, text
+
+from app.api.pagination import KeysetParams, encode_cursor
+from app.api.task.models import Task, TaskFilters, TaskSort
+from app.api.user.models import UserResponse
+from app.database import database, migrate
+from app.database.database import ThreadedSession, engine
+from app.database.task import crud as task_crud
+from app.database.user import crud as user_crud
+
+
+@pytest.fixture
+def queries() -> Generator[list[tuple[str, Any]], None, None]:
+    """
+    SELECT statements with their parameters sent to the database while the test runs.
+    """
+    executed: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(
+        _: Any, __: Any, statement: str, parameters: Any, *args: Any
+    ) -> None:
+        if statement.lstrip().upper().startswith("SELECT"):
+            executed.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(statement: str, parameters: Any) -> str:
+    """
+    Query plan of the statement with sequential scans disabled, so the planner picks
+    an index whenever one is usable even on the tiny test tables.
+    """
+    with engine.connect() as connection:
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        plan = "\n".join(row[0] for row in rows)
+        connection.rollback()
+    return plan
+
+
+class TestMigrations:
+    class TestUpgrade:
+        def test_upgrade__all_applied(self) -> None:
+            assert migrate.upgrade(engine) == []
+
+            with engine.begin() as connection:
+                applied = migrate.applied_versions(connection)
+            assert applied == {m.version for m in migrate.load_migrations()}
+
+        def test_load_migrations__sorted(self) -> None:
+            versions = [m.version for m in migrate.load_migrations()]
+
+            assert versions[:3] == [1, 2, 3]
+            assert versions == sorted(versions)
+
+        def test_status__read_only(
+            self, mocker: MockFixture, capsys: pytest.CaptureFixture[str]
+        ) -> None:
+            mocker.patch("sys.argv", ["migrate", "status"])
+            mocker.patch("app.log.configure_logging")
+            executed: list[str] = []
+
+            def before_cursor_execute(
+                _: Any, __: Any, statement: str, *args: Any
+            ) -> None:
+                executed.append(statement)
+
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                migrate.main()
+            finally:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+            assert "0002 hot_query_indexes" in capsys.readouterr().out
+            assert not any("CREATE" in statement.upper() for statement in executed)
+
+        def test_create_index_concurrently__idempotent(self) -> None:
+            with engine.connect() as connection:
+                connection.execution_options(isolation_level="AUTOCOMMIT")
+                try:
+                    for _ in range(2):
+                        migrate.create_index_concurrently(
+                            connection, "ix_test_tasks_name", "tasks (name)"
+                        )
+                    valid = connection.execute(
+                        text(
+                            "SELECT indisvalid FROM pg_index "
+                            "WHERE indexrelid = to_regclass('ix_test_tasks_name')"
+                        )
+                    ).scalar()
+                finally:
+                    connection.execute(
+                        text("DROP INDEX CONCURRENTLY IF EXISTS ix_test_tasks_name")
+                    )
+
+            assert valid is True
+
+    class TestCheckSchema:
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize("db_async", [True, False])
+        async def test_check_schema__up_to_date(
+            self, mocker: MockFixture, db_async: bool
+        ) -> None:
+            mocker.patch.object(database.settings, "db_async", db_async)
+            # connections pooled by other tests belong to their event loops
+            await database.async_engine.dispose(close=False)
+
+            await database.check_schema()
+
+        @pytest.mark.asyncio
+        async def test_check_schema__pending(self, mocker: MockFixture) -> None:
+            mocker.patch.object(database.settings, "db_async", False)
+            pending = migrate.Migration(9999, "future", migrate)
+            mocker.patch(
+                "app.database.migrate.load_migrations",
+                return_value=migrate.load_migrations() + [pending],
+            )
+
+            with pytest.raises(RuntimeError, match="9999 future"):
+                await database.check_schema()
+
+    class TestHotQueryIndexes:
+        @pytest.mark.asyncio
+        async def test_user_tasks__uses_user_id_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            await user_crud.get_user_tasks(db_task.user_id, session)
+
+            tasks_query = next(q for q in queries if "FROM tasks" in q[0])
+            assert "ix_tasks_user_id_created_at_task_id" in explain(*tasks_query)
+
+        @pytest.mark.asyncio
+        async def test_tasks_keyset__uses_created_at_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            cursor = encode_cursor(db_task.created_at, db_task.task_id)
+            await task_crud.get_tasks_keyset(
+                KeysetParams(cursor=cursor, size=10), session
+            )
+
+            assert "ix_tasks_created_at_task_id" in explain(*queries[0])
+
+        @pytest.mark.asyncio
+        async def test_users_keyset__uses_created_at_index(
+            self,
+            session: ThreadedSession,
+            db_user: UserResponse,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            cursor = encode_cursor(db_user.created_at, db_user.user_id)
+            await user_crud.get_users_keyset(
+                KeysetParams(cursor=cursor, size=10), session
+            )
+
+            assert "ix_users_created_at_user_id" in explain(*queries[0])
+
+        @pytest.mark.asyncio
+        async def test_stream_user_tasks__uses_user_id_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            async for _ in task_crud.stream_tasks(session, 10, user_id=db_task.user_id):
+                pass
+
+            assert "ix_tasks_user_id_created_at_task_id" in explain(*queries[0])
+
+        @pytest.mark.asyncio
+        async def test_user_tasks_keyset__uses_user_id_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            await user_crud.get_user_tasks_keyset(
+                db_task.user_id, KeysetParams(size=10), session
+            )
+
+            assert "ix_tasks_user_id_created_at_task_id" in explain(*queries[0])
+
+        @pytest.mark.asyncio
+        async def test_search_tasks__uses_search_vector_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+        ) -> None:
+            await task_crud.search_tasks("test", KeysetParams(size=10), session)
+
+            assert "ix_tasks_search_vector" in explain(*queries[0])
+
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize(
+            "filters, index",
+            [
+                (TaskFilters(), "ix_tasks_created_at_task_id"),
+                (
+                    TaskFilters(sort=TaskSort.UPDATED_AT_DESC),
+                    "ix_tasks_version_task_id",
+                ),
+                (TaskFilters(sort=TaskSort.NAME), "ix_tasks_name_task_id"),
+            ],
+        )
+        async def test_get_tasks__uses_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+            filters: TaskFilters,
+            index: str,
+        ) -> None:
+            await task_crud.get_tasks(Params(size=10), session, filters)
+
+            # the last query is the page, the first one counts the tasks
+            assert index in explain(*queries[-1])
+
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize(
+            "filters, index",
+            [
+                (
+                    TaskFilters(updated_since=datetime(2023, 1, 1)),
+                    "ix_tasks_version_task_id",
+                ),
+                (TaskFilters(name_prefix="Test"), "ix_tasks_name_task_id"),
+            ],
+        )
+        async def test_get_tasks_filters__use_index(
+            self,
+            session: ThreadedSession,
+            db_task: Task,
+            queries: list[tuple[str, Any]],
+            filters: TaskFilters,
+            index: str,
+        ) -> None:
+            await task_crud.get_tasks(Params(size=10), session, filters)
+
+            # the count query, it has the predicates but no ORDER BY
+            assert index in explain(*queries[0])
@@ -0,0 +1,81 @@
+from typing import Generator
+
+import pytest
+from sqlalchemy import Engine, create_engine, exc
+
+from app.database import database, pool
+from app.database.database import engine, prewarm_pool
+from app.database.pool import (
+    RecentWait,
+    TimedQueuePool,
+    checkout_seconds,
+    checkout_timeouts,
+)
+from app.metrics import metrics
+
+
+@pytest.fixture
+def sync_mode(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    monkeypatch.setattr(database.settings, "db_async", False)
+    engine.dispose()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def small_engine() -> Generator[Engine, None, None]:
+    small_engine = create_engine(
+        engine.url,
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    yield small_engine
+    small_engine.dispose()
+
+
+class TestPool:
+    class TestPrewarm:
+        @pytest.mark.asyncio
+        async def test_prewarm_pool__opens_pool_size(self, sync_mode: None) -> None:
+            await prewarm_pool()
+
+            assert engine.pool.checkedin() == database.settings.db_pool_size  # type: ignore[attr-defined]
+            assert metrics.snapshot()["db_pool_idle"] == database.settings.db_pool_size
+
+    class TestMetrics:
+        def test_checkout__in_use_and_wait_time(self, sync_mode: None) -> None:
+            checkouts = checkout_seconds.count
+            with engine.connect():
+                assert metrics.snapshot()["db_pool_in_use"] == 1
+
+            assert checkout_seconds.count == checkouts + 1
+            assert metrics.snapshot()["db_pool_in_use"] == 0
+
+        def test_checkout__timeout(self, small_engine: Engine) -> None:
+            timeouts = checkout_timeouts.value
+            with small_engine.connect():
+                with pytest.raises(exc.TimeoutError):
+                    small_engine.connect()
+
+            assert checkout_timeouts.value == timeouts + 1
+
+    class TestRecentWait:
+        def test_observe__weighted_average(self) -> None:
+            recent = RecentWait(weight=0.5, half_life=3600)
+            recent.observe(1.0)
+            recent.observe(1.0)
+
+            assert recent.value == pytest.approx(0.75, rel=1e-3)
+
+        def test_value__decays_without_checkouts(
+            self, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            now = [100.0]
+            monkeypatch.setattr(pool.time, "monotonic", lambda: now[0])
+            recent = RecentWait(weight=1.0, half_life=1.0)
+            recent.observe(0.8)
+
+            now[0] += 2
+            assert recent.value == pytest.approx(0.2)
@@ -0,0 +1,260 @@
+import time
+from typing import Generator
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api import read_your_writes
+from app.api.task.models import Task
+from app.api.task.service import task_cache
+from app.api.user.service import user_cache
+from app.database import database
+from app.database.database import async_engine, engine
+from app.database.replicas import (
+    PRIMARY_COOKIE,
+    ReplicaSet,
+    Selection,
+    pinned_to_primary,
+)
+from app.database.timing import QueryStats, capture_statements, request_queries
+from app.main import app
+from app.metrics import metrics
+
+# the test database plays the replica, reads through it are told apart from reads
+# of the primary by the engine executing them
+REPLICA_URL = engine.url.render_as_string(hide_password=False)
+
+
+def replica_set(count: int, selection: Selection = "round_robin") -> ReplicaSet:
+    return database.create_replicas(
+        [REPLICA_URL] * count, selection, pool_size=2, max_overflow=0
+    )
+
+
+@pytest.fixture
+def replicas(monkeypatch: pytest.MonkeyPatch) -> Generator[ReplicaSet, None, None]:
+    replicas = replica_set(1)
+    monkeypatch.setattr(database, "replicas", replicas)
+    yield replicas
+    for replica_engine in replicas.engines:
+        replica_engine.dispose()
+
+
+@pytest.fixture
+def client(replicas: ReplicaSet) -> Generator[TestClient, None, None]:
+    task_cache.clear()
+    user_cache.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+class TestReplicaSet:
+    def test_replica_set__engines_per_url(self) -> None:
+        replicas = replica_set(2)
+
+        assert len(replicas) == 2
+        assert replicas.engines[0].url.drivername == "postgresql"
+        assert replicas.async_engines[0].url.drivername == "postgresql+asyncpg"
+        assert replicas.engines[0].url.database == engine.url.database
+
+    def test_replica_set__statements_timed(self) -> None:
+        replicas = replica_set(1)
+        stats = QueryStats()
+        token = request_queries.set(stats)
+        try:
+            with replicas.engines[0].connect() as connection:
+                connection.execute(text("SELECT 1"))
+        finally:
+            request_queries.reset(token)
+            replicas.engines[0].dispose()
+
+        assert stats.statements == 1
+
+    def test_replica_set__pool_metrics_per_replica(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", False)
+        replicas = replica_set(2)
+        try:
+            with replicas.engines[1].connect():
+                in_use = metrics.snapshot()["db_replica_pool_in_use"]
+        finally:
+            for replica_engine in replicas.engines:
+                replica_engine.dispose()
+
+        assert {"labels": {"replica": "0"}, "value": 0} in in_use
+        assert {"labels": {"replica": "1"}, "value": 1} in in_use
+        assert metrics.snapshot()["db_pool_in_use"] == 0
+
+    def test_choose__round_robin(self) -> None:
+        replicas = replica_set(3)
+
+        assert [replicas.choose(False) for _ in range(4)] == [0, 1, 2, 0]
+
+    def test_choose__least_connections(self) -> None:
+        replicas = replica_set(2, "least_connections")
+        try:
+            with replicas.engines[0].connect():
+                assert [replicas.choose(False) for _ in range(3)] == [1, 1, 1]
+            assert [replicas.choose(False) for _ in range(2)] == [1, 0]
+        finally:
+            for replica_engine in replicas.engines:
+                replica_engine.dispose()
+
+
+class TestPinnedToPrimary:
+    @pytest.mark.parametrize(
+        "cookie, expected",
+        [
+            (None, False),
+            ("", False),
+            ("not a time", False),
+            (str(time.time() - 1), False),
+            (str(time.time() + 60), True),
+        ],
+    )
+    def test_pinned_to_primary(self, cookie: str | None, expected: bool) -> None:
+        assert pinned_to_primary(cookie) is expected
+
+
+class TestGetReadDb:
+    def test_get_read_db__without_replicas_reads_primary(self, db_task: Task) -> None:
+        task_cache.clear()
+        with TestClient(app) as client:
+            with capture_statements(engine, async_engine.sync_engine) as primary:
+                response = client.get("/tasks/stats")
+
+        assert response.status_code == 200
+        assert len(primary) == 1
+
+    @pytest.mark.parametrize("db_async", [True, False])
+    def test_get_read_db__reads_replica(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        replicas: ReplicaSet,
+        db_task: Task,
+        db_async: bool,
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", db_async)
+        replica_engine = (
+            replicas.async_engines[0].sync_engine if db_async else replicas.engines[0]
+        )
+
+        with capture_statements(engine, async_engine.sync_engine) as primary:
+            with capture_statements(replica_engine) as replica:
+                response = client.get(f"/tasks/{db_task.task_id}")
+
+        assert response.status_code == 200
+        assert response.json()["taskId"] == str(db_task.task_id)
+        assert len(replica) == 1
+        assert primary == []
+
+    @pytest.mark.parametrize("db_async", [True, False])
+    def test_get_read_db__replica_reads_not_cached(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        db_task: Task,
+        db_async: bool,
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", db_async)
+        missing_id = uuid4()
+
+        assert client.get(f"/tasks/{db_task.task_id}").status_code == 200
+        assert client.get(f"/tasks/{missing_id}").status_code == 404
+        response = client.post(
+            "/users/batch-get", json={"userIds": [str(db_task.user_id)]}
+        )
+
+        assert response.json()["items"][0]["found"] is True
+        # a lagging replica would otherwise be served to clients pinned to the primary
+        assert task_cache.get(db_task.task_id) == (False, None)
+        assert task_cache.get(missing_id) == (False, None)
+        assert user_cache.get(db_task.user_id) == (False, None)
+
+    def test_get_read_db__pinned_reads_cached(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        db_task: Task,
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", False)
+        client.cookies.set(PRIMARY_COOKIE, str(time.time() + 60))
+
+        response = client.get(f"/tasks/{db_task.task_id}")
+
+        assert response.status_code == 200
+        assert task_cache.get(db_task.task_id) == (True, db_task)
+
+    def test_get_read_db__pinned_client_reads_primary(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        replicas: ReplicaSet,
+        db_task: Task,
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", False)
+        client.cookies.set(PRIMARY_COOKIE, str(time.time() + 60))
+
+        with capture_statements(replicas.engines[0]) as replica:
+            response = client.get(f"/users/{db_task.user_id}/stats")
+
+        assert response.status_code == 200
+        assert replica == []
+
+
+class TestReadYourWritesMiddleware:
+    def test_write__pins_client_to_primary(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        replicas: ReplicaSet,
+        db_task: Task,
+    ) -> None:
+        monkeypatch.setattr(database.settings, "db_async", False)
+
+        response = client.put(f"/tasks/{db_task.task_id}", json={"name": "Changed"})
+        with capture_statements(replicas.engines[0]) as replica:
+            read = client.get(f"/users/{db_task.user_id}/tasks")
+
+        assert response.status_code == 200
+        assert "Max-Age=5" in response.headers["set-cookie"]
+        assert pinned_to_primary(client.cookies[PRIMARY_COOKIE])
+        assert read.json()["items"][0]["name"] == "Changed"
+        assert replica == []
+
+    def test_write__disabled(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        client: TestClient,
+        db_task: Task,
+    ) -> None:
+        monkeypatch.setattr(read_your_writes.settings, "db_read_your_writes_seconds", 0)
+
+        response = client.put(f"/tasks/{db_task.task_id}", json={"name": "Changed"})
+
+        assert response.status_code == 200
+        assert "set-cookie" not in response.headers
+
+    def test_failed_write__no_cookie(self, client: TestClient, db_task: Task) -> None:
+        response = client.put(f"/tasks/{db_task.user_id}", json={"name": "Changed"})
+
+        assert response.status_code == 404
+        assert "set-cookie" not in response.headers
+
+    def test_read__no_cookie(self, client: TestClient, db_task: Task) -> None:
+        response = client.get(f"/tasks/{db_task.task_id}")
+
+        assert response.status_code == 200
+        assert "set-cookie" not in response.headers
+
+    def test_batch_get__no_cookie(self, client: TestClient, db_task: Task) -> None:
+        response = client.post(
+            "/tasks/batch-get", json={"taskIds": [str(db_task.task_id)]}
+        )
+
+        assert response.status_code == 200
+        assert "set-cookie" not in response.headers
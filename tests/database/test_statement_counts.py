@@ -0,0 +1,96 @@
+from typing import Any, Callable, ContextManager, Generator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.task.models import Task
+from app.api.task.service import task_cache
+from app.api.user.service import user_cache
+from app.main import app
+
+
+@pytest.fixture
+def client() -> Generator[TestClient, None, None]:
+    task_cache.clear()
+    user_cache.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+class TestStatementCounts:
+    """
+    SQL statements per request of the routes, a change executing more of them is
+    a regression unless the expected count is updated on purpose.
+    """
+
+    @pytest.mark.parametrize(
+        "method, path, body, expected",
+        [
+            ("GET", "/tasks/{task_id}", None, 1),
+            ("GET", "/tasks/", None, 2),
+            ("GET", "/tasks/keyset", None, 1),
+            ("GET", "/tasks/stats", None, 1),
+            ("POST", "/tasks/", {"name": "New task", "description": "d"}, 2),
+            ("PUT", "/tasks/{task_id}", {"name": "Changed"}, 1),
+            ("DELETE", "/tasks/{task_id}", None, 1),
+            ("GET", "/users/{user_id}", None, 1),
+            ("GET", "/users/", None, 2),
+            ("GET", "/users/{user_id}/tasks", None, 1),
+            ("GET", "/users/{user_id}/stats", None, 1),
+            ("GET", "/users/tasks/{user_id}", None, 2),
+            ("PUT", "/users/{user_id}", {"username": "changed_name"}, 1),
+        ],
+    )
+    def test_route__statements(
+        self,
+        client: TestClient,
+        db_task: Task,
+        assert_statements: Callable[[int], ContextManager[list[str]]],
+        method: str,
+        path: str,
+        body: dict[str, Any] | None,
+        expected: int,
+    ) -> None:
+        url = path.format(task_id=db_task.task_id, user_id=db_task.user_id)
+        if method == "POST" and body is not None:
+            body = body | {"userId": str(db_task.user_id)}
+
+        with assert_statements(expected):
+            response = client.request(method, url, json=body)
+
+        assert response.status_code == 200
+
+    def test_get_task__cached_no_statements(
+        self,
+        client: TestClient,
+        db_task: Task,
+        assert_statements: Callable[[int], ContextManager[list[str]]],
+    ) -> None:
+        client.get(f"/tasks/{db_task.task_id}")
+
+        with assert_statements(0):
+            response = client.get(f"/tasks/{db_task.task_id}")
+
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize(
+        "path, key", [("/tasks/batch-get", "taskIds"), ("/users/batch-get", "userIds")]
+    )
+    def test_batch_get__one_statement(
+        self,
+        client: TestClient,
+        db_task: Task,
+        assert_statements: Callable[[int], ContextManager[list[str]]],
+        path: str,
+        key: str,
+    ) -> None:
+        ids = [str(db_task.task_id), str(db_task.user_id)] * 50
+
+        with assert_statements(1):
+            response = client.post(path, json={key: ids})
+
+        assert response.status_code == 200
+        assert [item["found"] for item in response.json()["items"][:2]] in (
+            [True, False],
+            [False, True],
+        )
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import text
+
+from app.database.database import ThreadedSession
+from app.database.timing import QueryStats, request_queries
+
+
+class TestTiming:
+    @pytest.mark.asyncio
+    async def test_time_queries__summed_in_request(
+        self, session: ThreadedSession
+    ) -> None:
+        queries = QueryStats()
+        token = request_queries.set(queries)
+        try:
+            await session.execute(text("SELECT pg_sleep(0.01)"))
+            await session.execute(text("SELECT pg_sleep(0.01)"))
+        finally:
+            request_queries.reset(token)
+
+        assert queries.seconds >= 0.02
+        assert queries.statements == 2
+        assert queries.most_repeated() == ("SELECT pg_sleep(0.01)", 2)
+
+    @pytest.mark.asyncio
+    async def test_time_queries__outside_request(
+        self, session: ThreadedSession
+    ) -> None:
+        await session.execute(text("SELECT 1"))
+
+        assert request_queries.get() is None
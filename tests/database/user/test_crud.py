@@ -0,0 +1,112 @@
+from uuid import uuid4
+
+import pytest
+
+from sqlalchemy.exc import InvalidRequestError
+
+from app.api.pagination import KeysetParams
+from app.api.task.models import Task, TaskWithoutUser
+from app.api.user.models import UserResponse, UserUpdate
+from app.database.database import ThreadedSession
+from app.database.user import crud
+from app.database.task.models import TaskTable
+
+
+class TestUserCrud:
+    class TestGetUser:
+        @pytest.mark.asyncio
+        async def test_get_user__tasks_not_loaded(
+            self, session: ThreadedSession, db_task: Task, statements: list[str]
+        ) -> None:
+            row = await crud.get_user(db_task.user_id, session)
+
+            assert row is not None
+            assert UserResponse.model_validate(row[0]).user_id == db_task.user_id
+            assert len(statements) == 1
+            with pytest.raises(InvalidRequestError):
+                row[0].tasks
+
+    class TestGetUsersByIds:
+        @pytest.mark.asyncio
+        async def test_get_users_by_ids__found(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            users = await crud.get_users_by_ids([uuid4(), db_user.user_id], session)
+
+            assert [user.user_id for user in users] == [db_user.user_id]
+            assert len(statements) == 1
+            assert await crud.get_users_by_ids([], session) == []
+            assert len(statements) == 1
+
+        @pytest.mark.asyncio
+        async def test_get_user_tasks_keyset__pages(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            tasks = [
+                TaskTable(name=f"Task {i}", description="", user_id=db_user.user_id)
+                for i in range(3)
+            ]
+            session.add_all(tasks)
+            await session.commit()
+            statements.clear()
+
+            first = await crud.get_user_tasks_keyset(
+                db_user.user_id, KeysetParams(size=2), session
+            )
+            second = await crud.get_user_tasks_keyset(
+                db_user.user_id, KeysetParams(cursor=first.next_cursor, size=2), session
+            )
+
+            assert [t.task_id for t in first.items + second.items] == [
+                t.task_id
+                for t in sorted(tasks, key=lambda t: (t.created_at, t.task_id))
+            ]
+            assert second.next_cursor is None
+            assert all(isinstance(t, TaskWithoutUser) for t in first.items)
+            assert len(statements) == 2
+            assert "users" not in " ".join(statements)
+
+    class TestUpdateUser:
+        @pytest.mark.asyncio
+        async def test_update_user__single_statement(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            new_user = UserUpdate.model_validate(
+                {"username": f"user_{uuid4().hex[:8]}"}
+            )
+            updated_user = await crud.update_user(db_user.user_id, new_user, session)
+
+            assert updated_user is not None
+            assert updated_user.username == new_user.username
+            assert updated_user.email == db_user.email
+            assert updated_user.updated_at is not None
+            assert [s.split()[0] for s in statements] == ["UPDATE"]
+
+        @pytest.mark.asyncio
+        async def test_update_user__not_found(
+            self, session: ThreadedSession, statements: list[str]
+        ) -> None:
+            new_user = UserUpdate.model_validate(
+                {"username": f"user_{uuid4().hex[:8]}"}
+            )
+            updated_user = await crud.update_user(uuid4(), new_user, session)
+
+            assert updated_user is None
+            assert len(statements) == 1
+
+    class TestDeleteUser:
+        @pytest.mark.asyncio
+        async def test_delete_user__single_statement(
+            self, session: ThreadedSession, db_user: UserResponse, statements: list[str]
+        ) -> None:
+            deleted_user_id = await crud.delete_user(db_user.user_id, session)
+
+            assert deleted_user_id == db_user.user_id
+            assert [s.split()[0] for s in statements] == ["DELETE"]
+
+        @pytest.mark.asyncio
+        async def test_delete_user__not_found(
+            self, session: ThreadedSession, statements: list[str]
+        ) -> None:
+            assert await crud.delete_user(uuid4(), session) is None
+            assert len(statements) == 1
@@ -0,0 +1,71 @@
+import logging
+import queue
+from typing import Generator
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import log
+from app.config import get_settings
+from app.log import DroppingQueueHandler, configure_logging, sample_sql, stop_logging
+
+
+@pytest.fixture
+def restore_logging() -> Generator[None, None, None]:
+    yield
+    configure_logging(get_settings())
+    logging.getLogger("app.test").setLevel(logging.NOTSET)
+
+
+class TestLog:
+    class TestConfigureLogging:
+        def test_configure_logging__queue(
+            self, restore_logging: None, capsys: pytest.CaptureFixture[str]
+        ) -> None:
+            settings = get_settings().model_copy(
+                update={"log_queue_size": 10, "log_levels": {"app.test": "WARNING"}}
+            )
+            configure_logging(settings)
+            logger = logging.getLogger("app.test")
+            logger.warning("written %s", "lazily")
+            logger.info("filtered out")
+            stop_logging()
+
+            err = capsys.readouterr().err
+            assert "WARNING app.test: written lazily" in err
+            assert "filtered out" not in err
+
+    class TestDroppingQueueHandler:
+        def test_prepare__not_formatted(self) -> None:
+            handler = DroppingQueueHandler(queue.Queue())
+            record = logging.LogRecord("app", logging.INFO, "", 0, "%s", ("x",), None)
+
+            prepared = handler.prepare(record)
+
+            assert prepared.msg == "%s"
+            assert prepared.args == ("x",)
+
+        def test_enqueue__full(self) -> None:
+            dropped = log.dropped_records.value
+            handler = DroppingQueueHandler(queue.Queue(1))
+            for _ in range(3):
+                handler.emit(logging.makeLogRecord({"msg": "record"}))
+
+            assert log.dropped_records.value == dropped + 2
+
+    class TestSampleSql:
+        @pytest.mark.parametrize("sample_rate, logged", [(1.0, 2), (0.0, 0)])
+        def test_sample_sql(
+            self,
+            caplog: pytest.LogCaptureFixture,
+            sample_rate: float,
+            logged: int,
+        ) -> None:
+            engine = create_engine("sqlite://")
+            sample_sql(engine, sample_rate)
+            with caplog.at_level(logging.INFO, logger="app.sql"):
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    connection.execute(text("SELECT :x"), {"x": 2})
+
+            assert len([r for r in caplog.records if r.name == "app.sql"]) == logged
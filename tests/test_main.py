@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+
+class TestMain:
+    def test_import__without_database(self) -> None:
+        env = os.environ | {"DB_HOST": "database.invalid", "LOG_LEVEL": "WARNING"}
+
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.main"],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,131 @@
+import pytest
+
+from app.metrics import Counter, Gauge, Histogram, LabeledMetric, MetricsRegistry
+
+
+class TestMetrics:
+    class TestCounter:
+        def test_inc(self) -> None:
+            counter = Counter("requests_total", "")
+            counter.inc()
+            counter.inc(2)
+
+            assert counter.value == 3
+
+    class TestGauge:
+        def test_set_inc_dec(self) -> None:
+            gauge = Gauge("in_flight", "")
+            gauge.set(5)
+            gauge.inc()
+            gauge.dec(3)
+
+            assert gauge.value == 3
+
+        def test_callback(self) -> None:
+            values = [1.0, 2.0]
+            gauge = Gauge("in_use", "", callback=values.pop)
+
+            assert gauge.value == 2
+            assert gauge.value == 1
+
+    class TestHistogram:
+        def test_observe__cumulative_buckets(self) -> None:
+            histogram = Histogram("latency", "", buckets=(0.1, 1.0))
+            for value in (0.05, 0.5, 0.7, 5.0):
+                histogram.observe(value)
+
+            assert histogram.snapshot() == {
+                "count": 4,
+                "sum": pytest.approx(6.25),
+                "max": 5.0,
+                "buckets": {"0.1": 1, "1.0": 3},
+            }
+
+    class TestLabeledMetric:
+        def test_labels__child_per_values(self) -> None:
+            requests = LabeledMetric(
+                "requests_total", "", ("route",), lambda: Counter("requests_total", "")
+            )
+            requests.labels("/tasks").inc()
+            requests.labels("/tasks").inc()
+            requests.labels("/users").inc()
+
+            assert requests.snapshot() == [
+                {"labels": {"route": "/tasks"}, "value": 2},
+                {"labels": {"route": "/users"}, "value": 1},
+            ]
+
+        def test_labels__wrong_count(self) -> None:
+            requests = LabeledMetric(
+                "requests_total", "", ("route",), lambda: Counter("requests_total", "")
+            )
+
+            with pytest.raises(ValueError):
+                requests.labels("GET", "/tasks")
+
+        def test_labeled_gauge__callback(self) -> None:
+            registry = MetricsRegistry()
+            in_flight = registry.labeled_gauge("in_flight", "In flight", ("class",))
+            in_flight.labels("read").callback = lambda: 4
+            in_flight.labels("write").set(1)
+
+            assert registry.exposition() == (
+                "# HELP in_flight In flight\n"
+                "# TYPE in_flight gauge\n"
+                'in_flight{class="read"} 4.0\n'
+                'in_flight{class="write"} 1.0\n'
+            )
+
+    class TestMetricsRegistry:
+        def test_register__same_name_same_metric(self) -> None:
+            registry = MetricsRegistry()
+            counter = registry.counter("requests_total", "")
+            counter.inc()
+
+            assert registry.counter("requests_total", "") is counter
+            assert registry.snapshot() == {"requests_total": 1}
+
+        def test_register__type_mismatch(self) -> None:
+            registry = MetricsRegistry()
+            registry.counter("requests_total", "")
+
+            with pytest.raises(ValueError):
+                registry.gauge("requests_total", "")
+
+        def test_register__labeled_type_mismatch(self) -> None:
+            registry = MetricsRegistry()
+            registry.labeled_counter("requests_total", "", ("route",))
+
+            with pytest.raises(ValueError):
+                registry.labeled_histogram("requests_total", "", ("route",))
+
+        def test_exposition(self) -> None:
+            registry = MetricsRegistry()
+            registry.counter("timeouts_total", "Pool timeouts").inc(2)
+            registry.gauge("in_use", "Checked out\nconnections").set(3)
+            registry.labeled_counter(
+                "requests_total", "Requests", ("route", "status")
+            ).labels('/tasks/{task_id}"', "200").inc()
+            latency = registry.labeled_histogram(
+                "latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)
+            )
+            latency.labels("/tasks").observe(0.5)
+
+            assert registry.exposition().splitlines() == [
+                "# HELP timeouts_total Pool timeouts",
+                "# TYPE timeouts_total counter",
+                "timeouts_total 2.0",
+                "# HELP in_use Checked out\\nconnections",
+                "# TYPE in_use gauge",
+                "in_use 3.0",
+                "# HELP requests_total Requests",
+                "# TYPE requests_total counter",
+                'requests_total{route="/tasks/{task_id}\\"",status="200"} 1.0',
+                "# HELP latency_seconds Latency",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{route="/tasks",le="0.1"} 0',
+                'latency_seconds_bucket{route="/tasks",le="1.0"} 1',
+                'latency_seconds_bucket{route="/tasks",le="+Inf"} 1',
+                'latency_seconds_sum{route="/tasks"} 0.5',
+                'latency_seconds_count{route="/tasks"} 1',
+            ]
@@ -0,0 +1,133 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Generator
+
+import httpx
+import pytest
+
+from app.config import get_settings
+from app.server import Supervisor, pool_sizes, worker_count
+
+
+@pytest.fixture
+def port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def start_server(port: int, env: dict[str, str]) -> subprocess.Popen[str]:
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1"]
+        + ["--port", str(port), "--workers", "2"],
+        env=os.environ | {"LOG_LEVEL": "WARNING"} | env,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+@pytest.fixture
+def server(port: int) -> Generator[subprocess.Popen[str], None, None]:
+    process = start_server(
+        port,
+        {
+            # serves /openapi.json only, no database needed
+            "DB_SCHEMA_CHECK": "False",
+            "SERVER_MAX_REQUESTS": "2",
+            "SERVER_GRACEFUL_TIMEOUT": "5",
+        },
+    )
+    yield process
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+class TestServer:
+    def test_worker_count(self) -> None:
+        assert worker_count(3) == 3
+        assert worker_count(0) >= 1
+
+    @pytest.mark.parametrize(
+        "workers, connections, expected",
+        [(1, 80, (10, 20)), (4, 80, (10, 10)), (8, 40, (5, 0)), (4, 6, (1, 0))],
+    )
+    def test_pool_sizes__total_within_connections(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        workers: int,
+        connections: int,
+        expected: tuple[int, int],
+    ) -> None:
+        monkeypatch.setenv("SERVER_DB_CONNECTIONS", str(connections))
+        settings = get_settings()
+
+        assert pool_sizes(settings, workers) == expected
+        assert workers * sum(expected) <= connections
+
+    def test_pool_sizes__too_many_workers(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("SERVER_DB_CONNECTIONS", "3")
+
+        with pytest.raises(ValueError):
+            pool_sizes(get_settings(), 4)
+
+    @pytest.mark.parametrize(
+        "workers, cache_enabled, expected",
+        [(1, None, None), (4, None, "false"), (4, "true", None)],
+    )
+    def test_supervisor__cache_off_with_many_workers(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        workers: int,
+        cache_enabled: str | None,
+        expected: str | None,
+    ) -> None:
+        if cache_enabled is None:
+            monkeypatch.delenv("CACHE_ENABLED", raising=False)
+        else:
+            monkeypatch.setenv("CACHE_ENABLED", cache_enabled)
+
+        supervisor = Supervisor(get_settings(), "127.0.0.1", 8000, workers)
+
+        assert supervisor.env.get("CACHE_ENABLED") == expected
+
+    def test_server__recycles_workers_and_drains(
+        self, server: subprocess.Popen[str], port: int
+    ) -> None:
+        url = f"http://127.0.0.1:{port}/openapi.json"
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(url).raise_for_status()
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.1)
+
+        # a worker stops accepting at its 2nd request and answers it with
+        # Connection: close, the next connection waits on the shared socket for
+        # the other worker or the replacement; none of them is dropped
+        with httpx.Client(timeout=30) as client:
+            responses = [client.get(url) for _ in range(5)]
+        server.send_signal(signal.SIGTERM)
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert "close" in [response.headers.get("connection") for response in responses]
+        assert server.wait(timeout=20) == 0
+
+    def test_server__startup_failure(self, port: int) -> None:
+        process = start_server(
+            port, {"DB_HOST": "database.invalid", "DB_SCHEMA_CHECK": "True"}
+        )
+        try:
+            assert process.wait(timeout=60) == 3
+        finally:
+            if process.poll() is None:
+                process.kill()